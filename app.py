@@ -2,10 +2,12 @@ import eventlet
 eventlet.monkey_patch()
 
 from flask import Flask, render_template, request, jsonify
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 import os
 import pdfkit
 from code_agent.code_agent import CodeAgent
+from code_agent.agent_run_budget import parse_budget_limit
+from params import PARAMS
 from deep_search.planner import DeepSearchAgentPlanner
 import logging
 import traceback
@@ -72,6 +74,11 @@ def call_test_model():
 @socketio.on('run_agent')
 def handle_run_agent(data):
     session_id = data.get('session_id')
+    if session_id:
+        join_room(session_id)  # Subtask progress events are sent to the session's room.
+    # The function library and plan cache are scoped by the Socket.IO connection id, assigned by the server:
+    # the user_id and session_id of the payload are sent by the client and cannot be trusted.
+    memory_scope = request.sid
 
     def background_task(data, session_id):
         try:
@@ -117,7 +124,10 @@ def handle_run_agent(data):
                     tools=CUSTOM_TOOLS,
                     use_default_tools=True,
                     session_id=session_id,
-                    socketio=socketio
+                    memory_scope=memory_scope,
+                    socketio=socketio,
+                    time_budget=parse_budget_limit(data.get('time_budget'), PARAMS["RUN_TIME_BUDGET_MAX_SECONDS"]),
+                    token_budget=parse_budget_limit(data.get('token_budget'), PARAMS["RUN_TOKEN_BUDGET_MAX"], integer=True)
                 )
                 final_answer = code_agent.run_agent()
                 socketio.emit('agent_response', {"session_id": session_id, "assistant": final_answer})
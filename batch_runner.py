@@ -0,0 +1,174 @@
+"""
+Offline batch runner: runs CodeAgent or DeepSearchAgentPlanner over the requests of a JSONL file,
+without going through the Socket.IO interface.
+
+Each input line is a JSON object:
+    {"id": "report-1", "prompt": "...", "mode": "code_agent"}
+or with a full conversation instead of a prompt:
+    {"id": "report-2", "chat_history": [{"role": "user", "content": "..."}], "mode": "deep_search", "depth": 2}
+
+Optional keys: "mode" ("code_agent" or "deep_search", default --mode), "depth" (deep search),
+"time_budget", "token_budget" and "memory_scope" (code agent, the scope of the function library and plan cache:
+the batch file is written by the operator, so it is trusted). Lines without an id are identified by their line number.
+
+Each output line holds the id, status ("ok" or "error"), answer or error, start time and duration.
+Results are appended as soon as each request finishes, so an interrupted batch is resumed by running
+the same command again: requests already in the output file are skipped (failed ones too,
+unless --retry-failed is set).
+
+Usage:
+    python batch_runner.py requests.jsonl results.jsonl --concurrency 4
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+MODES = ("code_agent", "deep_search")
+
+
+def load_requests(input_path, default_mode):
+    requests = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            request["id"] = str(request.get("id", line_number))
+            request["mode"] = request.get("mode", default_mode)
+            if request["mode"] not in MODES:
+                raise ValueError(f"Line {line_number}: unknown mode '{request['mode']}', expected one of {MODES}.")
+            if not request.get("chat_history") and not request.get("prompt"):
+                raise ValueError(f"Line {line_number}: a 'prompt' or a 'chat_history' is required.")
+            requests.append(request)
+    return requests
+
+
+def load_completed_ids(output_path, retry_failed):
+    """
+    Returns the ids of the requests already in the output file (only the successful ones if retry_failed).
+    A truncated last line, left by an interrupted run, is ignored.
+    """
+    completed_ids = set()
+    try:
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if record.get("status") == "ok" or not retry_failed:
+                    completed_ids.add(str(record.get("id")))
+    except FileNotFoundError:
+        pass
+    return completed_ids
+
+
+def run_request(request):
+    """
+    Runs a single request and returns its answer.
+    """
+    chat_history = request.get("chat_history") or [{"role": "user", "content": request["prompt"]}]
+    session_id = f"batch-{request['id']}-{uuid.uuid4().hex[:8]}"
+
+    if request["mode"] == "deep_search":
+        from deep_search.planner import DeepSearchAgentPlanner
+        planner = DeepSearchAgentPlanner(
+            chat_history,
+            is_interactive=False,
+            session_id=session_id,
+            depth=request.get("depth", 1),
+            data_sources=request.get("data_sources", ["websearch"]),
+            delete_graph=True
+        )
+        planner.run_planner()
+        return planner.data.final_answer
+
+    from code_agent.code_agent import CodeAgent
+    from code_agent.agent_run_budget import parse_budget_limit
+    from tools.custom_tools import CUSTOM_TOOLS
+    from params import PARAMS
+    code_agent = CodeAgent(
+        chat_history=chat_history,
+        tools=CUSTOM_TOOLS,
+        use_default_tools=True,
+        session_id=session_id,
+        memory_scope=request.get("memory_scope"),
+        time_budget=parse_budget_limit(request.get("time_budget"), PARAMS["RUN_TIME_BUDGET_MAX_SECONDS"]),
+        token_budget=parse_budget_limit(request.get("token_budget"), PARAMS["RUN_TOKEN_BUDGET_MAX"], integer=True)
+    )
+    return code_agent.run_agent()
+
+
+def run_batch(input_path, output_path, concurrency=1, default_mode="code_agent", retry_failed=False):
+    """
+    Runs the requests of input_path not yet in output_path, concurrency at a time,
+    appending one result line per request to output_path.
+
+    :return: A tuple (number of successful requests, number of failed requests).
+    """
+    requests = load_requests(input_path, default_mode)
+    completed_ids = load_completed_ids(output_path, retry_failed)
+    pending = [request for request in requests if request["id"] not in completed_ids]
+    logger.info(
+        "Batch: %d requests, %d already completed, %d to run with concurrency %d.",
+        len(requests), len(requests) - len(pending), len(pending), concurrency
+    )
+
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "error": 0}
+
+    def run_and_record(request):
+        started_at = time.time()
+        start = time.perf_counter()
+        record = {"id": request["id"], "mode": request["mode"]}
+        try:
+            answer = run_request(request)
+            if answer is None:
+                # CodeAgent.run_agent logs its errors and returns None.
+                raise RuntimeError("The agent returned no answer, see the logs for details.")
+            record["answer"] = answer
+            record["status"] = "ok"
+        except Exception as e:
+            logger.warning("Request %s failed:\n%s", request["id"], traceback.format_exc())
+            record["status"] = "error"
+            record["error"] = str(e)
+        record["started_at"] = started_at
+        record["duration_seconds"] = round(time.perf_counter() - start, 3)
+        with write_lock:
+            with open(output_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, default=str) + "\n")
+                f.flush()
+            counts[record["status"]] += 1
+        logger.info("Request %s: %s in %.1fs.", request["id"], record["status"], record["duration_seconds"])
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for future in as_completed([executor.submit(run_and_record, request) for request in pending]):
+            future.result()
+
+    return counts["ok"], counts["error"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run CodeAgent or DeepSearch over the requests of a JSONL file.")
+    parser.add_argument("input", help="JSONL file of requests.")
+    parser.add_argument("output", help="JSONL file the results are appended to (also used to resume).")
+    parser.add_argument("--concurrency", type=int, default=1, help="Number of requests run in parallel.")
+    parser.add_argument("--mode", choices=MODES, default="code_agent", help="Default mode of the requests without one.")
+    parser.add_argument("--retry-failed", action="store_true", help="Run again the requests that failed in a previous run.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s %(threadName)s : %(message)s')
+    succeeded, failed = run_batch(args.input, args.output, args.concurrency, args.mode, args.retry_failed)
+    logger.info("Batch finished: %d succeeded, %d failed.", succeeded, failed)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import redis
+import pickle
+import hashlib
+import json
+import threading
+import logging
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointManager:
+    def __init__(self, redis_host='redis', redis_port=6379, db=0, ttl=86400):
+        """
+        Stores the progress of a CodeAgent run in Redis, so that a run interrupted by a process
+        restart can continue from the last completed subtask instead of starting over.
+
+        :param ttl: Seconds after which an abandoned checkpoint expires.
+        """
+        self.redis = redis.StrictRedis(host=redis_host, port=redis_port, db=db)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+    def get_checkpoint_key(self, session_id):
+        return f"code_agent_checkpoint:{session_id}"
+
+    @staticmethod
+    def fingerprint(chat_history) -> str:
+        """
+        Identifies the request a checkpoint belongs to, so a new message in the same session
+        does not resume the plan of a previous request.
+        """
+        return hashlib.sha256(json.dumps(chat_history, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def save(self, session_id, chat_history, checkpoint: dict):
+        """
+        Serialize (pickle) the checkpoint and store it in Redis.
+        Failures are logged and ignored: checkpointing must never break a run.
+        """
+        with self.lock:
+            try:
+                checkpoint = dict(checkpoint, fingerprint=self.fingerprint(chat_history))
+                self.redis.set(self.get_checkpoint_key(session_id), pickle.dumps(checkpoint), ex=self.ttl)
+            except Exception:
+                logger.warning("Error saving checkpoint for session_id %s:\n%s", session_id, traceback.format_exc())
+
+    def load(self, session_id, chat_history):
+        """
+        Load (unpickle) the checkpoint of the session, if it belongs to the same request.
+
+        :return: The checkpoint dictionary, or None.
+        """
+        with self.lock:
+            try:
+                serialized_data = self.redis.get(self.get_checkpoint_key(session_id))
+                if not serialized_data:
+                    return None
+                checkpoint = pickle.loads(serialized_data)
+            except Exception:
+                logger.warning("Error loading checkpoint for session_id %s:\n%s", session_id, traceback.format_exc())
+                return None
+        if checkpoint.get("fingerprint") != self.fingerprint(chat_history):
+            logger.info(f"Ignoring checkpoint of a previous request for session_id: {session_id}")
+            return None
+        return checkpoint
+
+    def delete(self, session_id):
+        with self.lock:
+            try:
+                self.redis.delete(self.get_checkpoint_key(session_id))
+            except Exception:
+                logger.warning("Error deleting checkpoint for session_id %s:\n%s", session_id, traceback.format_exc())
@@ -0,0 +1,126 @@
+import re
+import json
+import hashlib
+import logging
+import traceback
+import chromadb
+from models.models import create_embeddings
+from .tool_generator import contains_secret
+
+logger = logging.getLogger(__name__)
+
+
+class FunctionLibrary:
+    def __init__(self, embedding_model, db_path, scope, collection_name="subtask_function_library", max_distance=0.2):
+        """
+        Persistent library of subtask functions that validated and executed successfully,
+        indexed in Chroma by an embedding of their description and tool, so that the planner
+        can reuse proven code instead of generating it again.
+        The code of a function can hold the data of the request it solved (addresses, queries...),
+        so functions are only stored, searched and read within their scope.
+
+        :param embedding_model: Model used to embed the descriptions and the requests.
+        :param db_path: Path of the persistent Chroma database.
+        :param scope: The identity, established by the server, whose functions this library holds.
+        :param max_distance: Maximum cosine distance of a function returned by search().
+        """
+        if not scope:
+            raise ValueError("The function library needs a scope.")
+        self.embedding_model = embedding_model
+        self.scope = str(scope)
+        self.max_distance = max_distance
+        client = chromadb.PersistentClient(path=db_path)
+        self.collection = client.get_or_create_collection(name=collection_name, metadata={"hnsw:space": "cosine"})
+
+    def get_function_id(self, code) -> str:
+        return hashlib.sha256(f"{self.scope}\n{code.strip()}".encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def describe(subtask) -> str:
+        return (
+            f"{subtask.get('description', '')}\n"
+            f"Tool: {subtask.get('chosen_tool', '')}\n"
+            f"Imports: {', '.join(subtask.get('imports') or [])}"
+        )
+
+    def store(self, subtasks):
+        """
+        Adds (or refreshes) the given successful subtasks, embedding them in a single request.
+        Subtasks whose code holds a credential substituted into a tool are not stored.
+        Failures are logged and ignored: the library must never break a run.
+        """
+        subtasks = [subtask for subtask in subtasks if subtask.get("code")]
+        secret_subtasks = [subtask["subtask_name"] for subtask in subtasks if contains_secret(subtask["code"])]
+        if secret_subtasks:
+            logger.info(f"Not storing subtasks holding credentials in the library: {secret_subtasks}")
+            subtasks = [subtask for subtask in subtasks if subtask["subtask_name"] not in secret_subtasks]
+        if not subtasks:
+            return
+        try:
+            documents = [self.describe(subtask) for subtask in subtasks]
+            self.collection.upsert(
+                ids=[self.get_function_id(subtask["code"]) for subtask in subtasks],
+                embeddings=create_embeddings(documents, model=self.embedding_model),
+                documents=documents,
+                metadatas=[{
+                    "scope": self.scope,
+                    "subtask_name": subtask["subtask_name"],
+                    "chosen_tool": subtask.get("chosen_tool", ""),
+                    "imports": json.dumps(subtask.get("imports") or []),
+                    "code": subtask["code"]
+                } for subtask in subtasks]
+            )
+        except Exception:
+            logger.warning("Error storing subtask functions in the library:\n%s", traceback.format_exc())
+
+    def search(self, query, tool_names, k=3):
+        """
+        Returns the proven functions of the scope closest to the query that only use the available tools.
+
+        :return: A list of {"library_function_id", "description", "chosen_tool", "imports", "code"}.
+        """
+        try:
+            if self.collection.count() == 0:
+                return []
+            results = self.collection.query(
+                query_embeddings=create_embeddings([query], model=self.embedding_model),
+                n_results=min(k, self.collection.count()),
+                where={"$and": [{"scope": self.scope}, {"chosen_tool": {"$in": list(tool_names)}}]},
+                include=["documents", "metadatas", "distances"]
+            )
+        except Exception:
+            logger.warning("Error searching the subtask function library:\n%s", traceback.format_exc())
+            return []
+
+        functions = []
+        for function_id, document, metadata, distance in zip(
+            results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+        ):
+            if distance > self.max_distance:
+                continue
+            functions.append({
+                "library_function_id": function_id,
+                "description": document.split("\n")[0],
+                "chosen_tool": metadata["chosen_tool"],
+                "imports": json.loads(metadata["imports"]),
+                "code": metadata["code"]
+            })
+        return functions
+
+    def get(self, function_id):
+        try:
+            result = self.collection.get(ids=[function_id], include=["metadatas"])
+        except Exception:
+            logger.warning("Error reading the subtask function library:\n%s", traceback.format_exc())
+            return None
+        if not result["ids"] or result["metadatas"][0].get("scope") != self.scope:
+            return None
+        metadata = result["metadatas"][0]
+        return {"chosen_tool": metadata["chosen_tool"], "imports": json.loads(metadata["imports"]), "code": metadata["code"]}
+
+    @staticmethod
+    def rename_function(code, subtask_name) -> str:
+        """
+        Renames the library function to the subtask name the executor looks up.
+        """
+        return re.sub(r"^def\s+\w+\s*\(", f"def {subtask_name}(", code.strip(), count=1, flags=re.MULTILINE)
@@ -0,0 +1,128 @@
+import json
+import hashlib
+import threading
+import logging
+import traceback
+import redis
+from models.models import call_model
+from .prompts import SUMMARIZE_HISTORY_PROMPT
+from .utils import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryManager:
+    def __init__(self, summary_model, token_budget=4000, recent_messages=6,
+                 redis_host='redis', redis_port=6379, db=0, ttl=86400):
+        """
+        Compacts the conversation history passed to the planner: the most recent messages are kept
+        verbatim, older ones are folded into a running summary cached per session in Redis
+        (so each message is summarized only once), and the result fits within a token budget.
+
+        :param summary_model: Model used to summarize the older messages.
+        :param token_budget: Approximate maximum number of tokens of the compacted history.
+        :param recent_messages: Number of most recent messages kept verbatim, budget permitting.
+        :param ttl: Seconds after which the cached summary of an inactive session expires.
+        """
+        self.summary_model = summary_model
+        self.token_budget = token_budget
+        self.recent_messages = recent_messages
+        self.redis = redis.StrictRedis(host=redis_host, port=redis_port, db=db)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+
+    def get_summary_key(self, session_id):
+        return f"conversation_summary:{session_id}"
+
+    @staticmethod
+    def fingerprint(messages) -> str:
+        return hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def compact(self, session_id, chat_history):
+        """
+        :return: The compacted history: an optional summary message followed by the recent messages.
+        """
+        if estimate_tokens(json.dumps(chat_history)) <= self.token_budget:
+            return chat_history
+
+        # Keep as many recent messages as the budget allows, leaving room for the summary.
+        recent_count = min(self.recent_messages, len(chat_history))
+        summary_budget = self.token_budget // 4
+        while recent_count > 1 and \
+                estimate_tokens(json.dumps(chat_history[-recent_count:])) > self.token_budget - summary_budget:
+            recent_count -= 1
+        older, recent = chat_history[:-recent_count], chat_history[-recent_count:]
+
+        compacted = []
+        if older:
+            summary = self.summarize(session_id, older)
+            compacted.append({"role": "system", "content": f"Summary of the earlier conversation: {summary}"})
+
+        # A single oversized message (e.g. a pasted document) is truncated, keeping its beginning.
+        remaining_budget = self.token_budget - estimate_tokens(json.dumps(compacted))
+        for message in recent[:-1]:
+            remaining_budget -= estimate_tokens(json.dumps(message))
+        last_message = recent[-1]
+        if estimate_tokens(json.dumps(last_message)) > remaining_budget:
+            last_message = dict(last_message, content=truncate_to_tokens(str(last_message.get("content", "")), max(remaining_budget, 0)))
+        return compacted + recent[:-1] + [last_message]
+
+    def summarize(self, session_id, older_messages):
+        """
+        Returns the summary of older_messages, extending the cached summary of the session
+        with the messages it does not cover yet.
+        """
+        cached = self._load(session_id)
+        summarized_count = 0
+        summary = ""
+        if cached and cached["summarized_count"] <= len(older_messages) \
+                and cached["fingerprint"] == self.fingerprint(older_messages[:cached["summarized_count"]]):
+            summarized_count = cached["summarized_count"]
+            summary = cached["summary"]
+
+        new_messages = older_messages[summarized_count:]
+        if not new_messages:
+            return summary
+
+        try:
+            summary = call_model(
+                chat_history=[{"role": "user", "content": SUMMARIZE_HISTORY_PROMPT.substitute(
+                    summary=summary or "(empty)",
+                    messages="\n".join(f"{m.get('role')}: {m.get('content')}" for m in new_messages)
+                )}],
+                model=self.summary_model
+            )
+        except Exception:
+            logger.warning("Error summarizing the conversation history:\n%s", traceback.format_exc())
+            # Fall back to the truncated older messages.
+            return truncate_to_tokens(
+                "\n".join(f"{m.get('role')}: {m.get('content')}" for m in older_messages),
+                self.token_budget // 4, keep="tail"
+            )
+
+        self._save(session_id, {
+            "summarized_count": len(older_messages),
+            "fingerprint": self.fingerprint(older_messages),
+            "summary": summary
+        })
+        return summary
+
+    def _load(self, session_id):
+        if not session_id:
+            return None
+        with self.lock:
+            try:
+                serialized_data = self.redis.get(self.get_summary_key(session_id))
+                return json.loads(serialized_data) if serialized_data else None
+            except Exception:
+                logger.warning("Error loading conversation summary for session_id %s:\n%s", session_id, traceback.format_exc())
+                return None
+
+    def _save(self, session_id, data):
+        if not session_id:
+            return
+        with self.lock:
+            try:
+                self.redis.set(self.get_summary_key(session_id), json.dumps(data), ex=self.ttl)
+            except Exception:
+                logger.warning("Error saving conversation summary for session_id %s:\n%s", session_id, traceback.format_exc())
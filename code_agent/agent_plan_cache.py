@@ -0,0 +1,104 @@
+import json
+import hashlib
+import logging
+import threading
+import traceback
+import chromadb
+from models.models import create_embeddings
+from .tool_generator import contains_secret
+
+logger = logging.getLogger(__name__)
+
+
+class PlanCacheStats:
+    """
+    Process-wide counters of the plan cache: lookups, close matches found, and plans
+    actually reused after adaptation.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {"lookups": 0, "matches": 0, "reused": 0}
+
+    def record(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def report(self) -> str:
+        with self.lock:
+            counters = dict(self.counters)
+        hit_rate = counters["reused"] / counters["lookups"] if counters["lookups"] else 0.0
+        return (
+            f"{counters['lookups']} lookups, {counters['matches']} close matches, "
+            f"{counters['reused']} plans reused ({hit_rate:.1%} hit rate)"
+        )
+
+
+plan_cache_stats = PlanCacheStats()
+
+
+class PlanCache:
+    def __init__(self, embedding_model, db_path, scope, collection_name="json_plan_cache", similarity_threshold=0.92):
+        """
+        Persistent cache of JSON plans that solved a request satisfactorily, indexed in Chroma
+        by an embedding of the request, so that near-duplicate requests can reuse them.
+        A plan holds the data of its request (queries, addresses...), so plans are only stored and
+        looked up within their scope. Only the embedding of the request is kept, not its text.
+
+        :param embedding_model: Model used to embed the requests.
+        :param db_path: Path of the persistent Chroma database.
+        :param scope: The identity, established by the server, whose plans this cache holds.
+        :param similarity_threshold: Minimum cosine similarity between two requests for a plan to be reused.
+        """
+        if not scope:
+            raise ValueError("The plan cache needs a scope.")
+        self.embedding_model = embedding_model
+        self.scope = str(scope)
+        self.similarity_threshold = similarity_threshold
+        client = chromadb.PersistentClient(path=db_path)
+        self.collection = client.get_or_create_collection(name=collection_name, metadata={"hnsw:space": "cosine"})
+
+    def lookup(self, request_text, tool_names):
+        """
+        :return: A tuple (json_plan, similarity) of the closest cached plan of the scope above the
+                 similarity threshold that only uses the available tools, or None.
+        """
+        plan_cache_stats.record("lookups")
+        try:
+            if self.collection.count() == 0:
+                return None
+            results = self.collection.query(
+                query_embeddings=create_embeddings([request_text], model=self.embedding_model),
+                n_results=1,
+                where={"scope": self.scope},
+                include=["metadatas", "distances"]
+            )
+        except Exception:
+            logger.warning("Error looking up the plan cache:\n%s", traceback.format_exc())
+            return None
+        if not results["ids"][0]:
+            return None
+
+        similarity = 1 - results["distances"][0][0]
+        json_plan = json.loads(results["metadatas"][0][0]["json_plan"])
+        chosen_tools = {subtask.get("chosen_tool") for subtask in json_plan.get("subtasks", [])}
+        if similarity < self.similarity_threshold or not chosen_tools.issubset(tool_names):
+            return None
+        plan_cache_stats.record("matches")
+        return json_plan, similarity
+
+    def store(self, request_text, json_plan):
+        """
+        Plans holding a credential substituted into a tool are not stored.
+        Failures are logged and ignored: the cache must never break a run.
+        """
+        if contains_secret(json.dumps(json_plan)):
+            logger.info("Not storing a JSON plan holding credentials in the plan cache.")
+            return
+        try:
+            self.collection.upsert(
+                ids=[hashlib.sha256(f"{self.scope}\n{request_text}".encode("utf-8")).hexdigest()[:16]],
+                embeddings=create_embeddings([request_text], model=self.embedding_model),
+                metadatas=[{"scope": self.scope, "json_plan": json.dumps(json_plan)}]
+            )
+        except Exception:
+            logger.warning("Error storing the JSON plan in the plan cache:\n%s", traceback.format_exc())
@@ -1,7 +1,10 @@
 import json
-from .prompts import EVALUATION_AGENT_PROMPT
+from .prompts import EVALUATION_AGENT_PROMPT, FINAL_EVALUATION_INSTRUCTION
+from .schemas import EVALUATION_RESPONSE_SCHEMA
 from models.models import call_model
-from .utils import sanitize_gpt_response
+from models.json_repair import parse_json_response
+from .agent_plan_generator import is_complete_plan
+from params import PARAMS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,7 +16,7 @@ class PlanEvaluator:
         """
         self.evaluation_model = evaluation_model
 
-    def evaluate(self, agent_prompt, json_plan, iteration, max_iterations, logs):
+    def evaluate(self, agent_prompt, json_plan, iteration, max_iterations, logs, final_evaluation=False):
         """
         Evaluates the current plan and execution logs.
 
@@ -22,20 +25,36 @@ class PlanEvaluator:
         :param iteration: The current iteration count.
         :param max_iterations: Maximum allowed iterations.
         :param logs: Execution logs to include in the evaluation.
+        :param final_evaluation: Whether no further iteration may follow (e.g. the run budget is nearly exhausted),
+                                 so the evaluation must give a final answer.
         :return: A dictionary with evaluation results.
+        :raises ValueError: If every evaluation asked for a new plan that was truncated or incomplete.
         """
         evaluation_prompt = EVALUATION_AGENT_PROMPT.substitute(
             original_prompt=agent_prompt,
             original_json_plan=json.dumps(json_plan, indent=4),
             max_iterations=max_iterations,
             iteration=iteration,
-            logs=logs
+            logs=logs,
+            final_evaluation_instruction=FINAL_EVALUATION_INSTRUCTION if final_evaluation else ""
         )
 
-        evaluation_output_str = call_model(
-            chat_history=[{"role": "user", "content": evaluation_prompt}],
-            model=self.evaluation_model
-        )
-        evaluation_output_str = sanitize_gpt_response(evaluation_output_str)
-        evaluation_output = json.loads(evaluation_output_str)
-        return evaluation_output
+        max_attempts = PARAMS["JSON_PLAN_MAX_ATTEMPTS"]
+        for attempt in range(1, max_attempts + 1):
+            evaluation_output_str = call_model(
+                chat_history=[{"role": "user", "content": evaluation_prompt}],
+                model=self.evaluation_model,
+                call_site="plan_evaluator",
+                response_schema=EVALUATION_RESPONSE_SCHEMA
+            )
+            try:
+                evaluation_output = parse_json_response(evaluation_output_str, allow_truncated=False)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Unusable evaluation (attempt {attempt}/{max_attempts}): {e}")
+                continue
+            # The new plan replaces the current one, so it must be complete unless the run ends here.
+            if final_evaluation or evaluation_output.get("satisfactory", False) or evaluation_output.get("max_iterations_reached", False) \
+                    or is_complete_plan(evaluation_output.get("new_json_plan")):
+                return evaluation_output
+            logger.warning(f"Incomplete new JSON plan in the evaluation (attempt {attempt}/{max_attempts}).")
+        raise ValueError(f"No usable evaluation in {max_attempts} attempts.")
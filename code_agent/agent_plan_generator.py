@@ -1,34 +1,153 @@
 import json
-from .prompts import CODE_SYSTEM_PROMPT
+import logging
+from .prompts import CODE_SYSTEM_PROMPT, ADAPT_PLAN_PROMPT
+from .schemas import JSON_PLAN_RESPONSE_SCHEMA
 from models.models import call_model
-from .utils import sanitize_gpt_response
+from models.json_repair import parse_json_response
+from .agent_plan_cache import plan_cache_stats
+from params import PARAMS
+
+logger = logging.getLogger(__name__)
+
+
+def is_complete_plan(json_plan):
+    """
+    Whether a JSON plan has subtasks and none of them lost its name or its code, e.g. to a truncated model response.
+    A subtask may instead reuse a library function or invoke a tool, whose code is built before execution.
+    """
+    if not isinstance(json_plan, dict):
+        return False
+    subtasks = json_plan.get("subtasks")
+    if not isinstance(subtasks, list) or not subtasks:
+        return False
+    return all(
+        isinstance(subtask, dict) and subtask.get("subtask_name")
+        and (subtask.get("code") or subtask.get("library_function_id") or subtask.get("tool_invocation"))
+        for subtask in subtasks
+    )
+
 
 class PlanGenerator:
-    def __init__(self, chat_history, tools, json_plan_model):
+    def __init__(self, chat_history, tools, json_plan_model, function_library=None, plan_cache=None):
         """
         :param chat_history: List of dictionaries representing the conversation history.
         :param tools: List of tool names available.
         :param json_plan_model: The model identifier to generate the JSON plan.
+        :param function_library: Optional FunctionLibrary of proven subtask functions offered to the planner.
+        :param plan_cache: Optional PlanCache of plans that solved similar requests.
         """
         self.chat_history = chat_history
         self.tools = tools
         self.json_plan_model = json_plan_model
+        self.function_library = function_library
+        self.plan_cache = plan_cache
+
+    def get_request_text(self):
+        """
+        The latest user message, used to look up similar past work.
+        """
+        for message in reversed(self.chat_history):
+            if message.get("role") == "user":
+                return str(message.get("content", ""))
+        return json.dumps(self.chat_history)
+
+    def get_conversation_text(self):
+        """
+        All the user messages of the conversation, used as the key of the plan cache.
+        """
+        return "\n".join(str(message.get("content", "")) for message in self.chat_history if message.get("role") == "user")
+
+    def find_proven_functions(self):
+        if not self.function_library:
+            return []
+        return self.function_library.search(
+            self.get_request_text(),
+            [tool["tool_name"] for tool in self.tools],
+            k=PARAMS["FUNCTION_LIBRARY_TOP_K"]
+        )
 
-    def generate_plan(self):
+    def generate_plan(self, conversation_history=None):
         """
         Generates a JSON plan for the agent by substituting conversation history and tools into the prompt.
-        
+        If a plan solved a near-duplicate request, only its parameter values are adapted instead.
+        A truncated or incomplete plan is regenerated, up to JSON_PLAN_MAX_ATTEMPTS attempts.
+
+        :param conversation_history: The (compacted) history to put in the prompt, defaults to the full chat history.
         :return: A tuple (json_plan, agent_prompt)
+        :raises ValueError: If no complete plan was generated.
         """
+        cached_plan = self.adapt_cached_plan()
         agent_prompt = CODE_SYSTEM_PROMPT.substitute(
-            conversation_history=self.chat_history,
-            tools=self.tools 
-        )
-        agent_output_str = call_model(
-            chat_history=[{"role": "user", "content": agent_prompt}],
-            model=self.json_plan_model,
-            output_format="json_object"
+            conversation_history=conversation_history or self.chat_history,
+            tools=self.tools,
+            proven_functions=json.dumps(self.find_proven_functions() if cached_plan is None else [], indent=4)
         )
-        agent_output_str = sanitize_gpt_response(agent_output_str)
-        json_plan = json.loads(agent_output_str)
-        return json_plan, agent_prompt
+        if cached_plan is not None:
+            return cached_plan, agent_prompt
+
+        max_attempts = PARAMS["JSON_PLAN_MAX_ATTEMPTS"]
+        for attempt in range(1, max_attempts + 1):
+            agent_output_str = call_model(
+                chat_history=[{"role": "user", "content": agent_prompt}],
+                model=self.json_plan_model,
+                output_format="json_object",
+                call_site="json_plan",
+                response_schema=JSON_PLAN_RESPONSE_SCHEMA
+            )
+            try:
+                json_plan = parse_json_response(agent_output_str, allow_truncated=False)
+            except json.JSONDecodeError as e:
+                logger.warning(f"Unusable JSON plan (attempt {attempt}/{max_attempts}): {e}")
+                continue
+            if is_complete_plan(json_plan):
+                return json_plan, agent_prompt
+            logger.warning(f"Incomplete JSON plan, a subtask has no name or code (attempt {attempt}/{max_attempts}).")
+        raise ValueError(f"No complete JSON plan generated in {max_attempts} attempts.")
+
+    def adapt_cached_plan(self):
+        """
+        Looks up the plan cache and asks the model to adapt the parameter values of the closest plan.
+        The adapted plan is rejected if its structure (subtask names, tools and inputs) changed.
+
+        :return: The adapted JSON plan, or None to fall back to full generation.
+        """
+        if not self.plan_cache:
+            return None
+        match = self.plan_cache.lookup(self.get_conversation_text(), {tool["tool_name"] for tool in self.tools})
+        if match is None:
+            return None
+        cached_plan, similarity = match
+        try:
+            adapted_output_str = call_model(
+                chat_history=[{"role": "user", "content": ADAPT_PLAN_PROMPT.substitute(
+                    json_plan=json.dumps(cached_plan, indent=4),
+                    request=self.get_conversation_text()
+                )}],
+                model=self.json_plan_model,
+                output_format="json_object"
+            )
+            adapted_plan = parse_json_response(adapted_output_str, allow_truncated=False)
+        except Exception:
+            logger.warning("Error adapting the cached JSON plan, generating a new one.", exc_info=True)
+            return None
+
+        def structure(plan):
+            return [
+                (subtask.get("subtask_name"), subtask.get("chosen_tool"), subtask.get("input_from_subtask"))
+                for subtask in plan.get("subtasks", [])
+            ]
+
+        if not is_complete_plan(adapted_plan) or adapted_plan.get("reusable") is False \
+                or structure(adapted_plan) != structure(cached_plan):
+            logger.info(f"Cached JSON plan (similarity {similarity:.3f}) not reusable for this request.")
+            return None
+        plan_cache_stats.record("reused")
+        logger.info(f"Reusing a cached JSON plan (similarity {similarity:.3f}) with adapted parameters.")
+        return adapted_plan
+
+    def remember_plan(self, json_plan):
+        """
+        Stores a plan that solved the request satisfactorily in the plan cache.
+        """
+        if self.plan_cache:
+            self.plan_cache.store(self.get_conversation_text(), json_plan)
@@ -0,0 +1,91 @@
+import json
+import time
+import threading
+
+
+class ProgressEmitter:
+    def __init__(self, socketio, session_id, min_interval=1.0, preview_chars=300):
+        """
+        Streams structured subtask progress events to the session's Socket.IO room.
+        Events are buffered and sent as one 'subtask_progress' message at most every
+        min_interval seconds, so chatty runs don't flood the socket. Buffered events are sent
+        by a trailing flush at the end of the interval, without waiting for the next event.
+
+        :param socketio: The Socket.IO server instance, or None to disable the events.
+        :param session_id: The session id, also used as the Socket.IO room name.
+        :param min_interval: Minimum number of seconds between two messages.
+        :param preview_chars: Maximum length of the output preview attached to finished subtasks.
+        """
+        self.socketio = socketio
+        self.session_id = session_id
+        self.min_interval = min_interval
+        self.preview_chars = preview_chars
+        self.buffer = []
+        self.last_sent = 0.0
+        self.flush_scheduled = False
+        self.lock = threading.Lock()
+
+    def preview(self, output) -> str:
+        try:
+            preview = json.dumps(output, default=str)
+        except (TypeError, ValueError):
+            preview = str(output)
+        if len(preview) > self.preview_chars:
+            preview = preview[:self.preview_chars] + "... [truncated]"
+        return preview
+
+    def subtask_started(self, subtask_name, index, total):
+        self.emit({"event": "subtask_started", "subtask_name": subtask_name, "index": index, "total": total})
+
+    def subtask_finished(self, subtask_name, index, total, duration, output):
+        self.emit({
+            "event": "subtask_finished",
+            "subtask_name": subtask_name,
+            "index": index,
+            "total": total,
+            "duration_seconds": round(duration, 3),
+            "output_preview": self.preview(output)
+        })
+
+    def emit(self, event: dict):
+        if not self.socketio:
+            return
+        with self.lock:
+            self.buffer.append(event)
+            wait = self.min_interval - (time.monotonic() - self.last_sent)
+            if wait > 0:
+                if self.flush_scheduled:
+                    return
+                self.flush_scheduled = True
+            else:
+                events, self.buffer = self.buffer, []
+                self.last_sent = time.monotonic()
+        if wait > 0:
+            self.socketio.start_background_task(self._trailing_flush, wait)
+        else:
+            self._send(events)
+
+    def _trailing_flush(self, delay):
+        self.socketio.sleep(delay)
+        self.flush()
+
+    def flush(self):
+        """
+        Sends the buffered events, regardless of the throttling interval.
+        """
+        if not self.socketio:
+            return
+        with self.lock:
+            events, self.buffer = self.buffer, []
+            self.flush_scheduled = False
+            if events:
+                self.last_sent = time.monotonic()
+        if events:
+            self._send(events)
+
+    def _send(self, events):
+        self.socketio.emit(
+            'subtask_progress',
+            {"session_id": self.session_id, "events": events},
+            to=self.session_id
+        )
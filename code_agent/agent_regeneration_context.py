@@ -0,0 +1,87 @@
+import json
+from .prompts import REGENERATE_SUBTASK_PROMPT
+from .utils import estimate_tokens, truncate_to_tokens
+
+
+class RegenerationContextBuilder:
+    def __init__(self, json_plan, tools, allowed_lib_names, token_budget):
+        """
+        :param json_plan: The current JSON plan.
+        :param tools: List of tool dictionaries available to the agent.
+        :param allowed_lib_names: List of library names the subtask code may import.
+        :param token_budget: Approximate maximum number of tokens of the regeneration prompt.
+        """
+        self.json_plan = json_plan
+        self.tools = tools
+        self.allowed_lib_names = sorted(set(allowed_lib_names))
+        self.token_budget = token_budget
+
+    @staticmethod
+    def describe_output_schema(previous_output, preview_chars=80):
+        """
+        Describes the keys of the upstream output with their types and a short preview of their values.
+        """
+        if not previous_output:
+            return "{} (the subtask receives no upstream data)"
+        schema = {}
+        for key, value in previous_output.items():
+            preview = repr(value)
+            if len(preview) > preview_chars:
+                preview = preview[:preview_chars] + "..."
+            schema[key] = f"{type(value).__name__}: {preview}"
+        return json.dumps(schema, indent=4)
+
+    def select_tools(self, subtask):
+        """
+        Returns the tools relevant to the subtask: the chosen tool first, then the tools
+        providing any of the imported libraries.
+        """
+        chosen_tool = subtask.get("chosen_tool", "")
+        imports = set(subtask.get("imports") or [])
+        chosen, related = [], []
+        for tool in self.tools:
+            if tool.get("tool_name") == chosen_tool:
+                chosen.append(tool)
+            elif imports.intersection(tool.get("lib_names", [])):
+                related.append(tool)
+        return chosen + related
+
+    def build(self, subtask, subtask_errors, previous_output=None):
+        """
+        Builds the regeneration prompt for the failing subtask within the token budget.
+        The subtask, the upstream schema and the chosen tool are always kept; related tools
+        are dropped and then the errors are truncated (keeping their tail) if the budget is exceeded.
+
+        :return: The regeneration prompt (a string).
+        """
+        subtasks = self.json_plan.get("subtasks", [])
+        position = next(
+            (i + 1 for i, s in enumerate(subtasks) if s.get("subtask_name") == subtask.get("subtask_name")),
+            1
+        )
+        if not isinstance(subtask_errors, str):
+            subtask_errors = "\n".join(str(error) for error in subtask_errors)
+
+        prompt_fields = {
+            "main_task": self.json_plan.get("main_task", ""),
+            "subtask_position": position,
+            "total_subtasks": len(subtasks),
+            "subtask": json.dumps(subtask, indent=4),
+            "upstream_schema": self.describe_output_schema(previous_output),
+            "allowed_lib_names": self.allowed_lib_names,
+            "subtask_errors": subtask_errors,
+        }
+
+        tools = self.select_tools(subtask)
+        prompt_fields["tools"] = json.dumps(tools, indent=4)
+        while len(tools) > 1 and estimate_tokens(REGENERATE_SUBTASK_PROMPT.substitute(prompt_fields)) > self.token_budget:
+            tools = tools[:-1]
+            prompt_fields["tools"] = json.dumps(tools, indent=4)
+
+        overflow = estimate_tokens(REGENERATE_SUBTASK_PROMPT.substitute(prompt_fields)) - self.token_budget
+        if overflow > 0:
+            prompt_fields["subtask_errors"] = truncate_to_tokens(
+                subtask_errors, estimate_tokens(subtask_errors) - overflow, keep="tail"
+            )
+
+        return REGENERATE_SUBTASK_PROMPT.substitute(prompt_fields)
@@ -0,0 +1,170 @@
+import time
+import threading
+import tracemalloc
+from models.models import usage_tracker
+
+
+class ActiveMeasurements:
+    """
+    Process-wide bookkeeping of the subtask measurements in progress, shared by every run of the process.
+    Memory tracing is started by the first measurement that needs it and stopped when the last one ends,
+    and its peak is only reset when no other measurement is in progress.
+    The CPU time of a thread and the tracemalloc peak are process (or thread) wide, so the figures of
+    measurements that overlap another one are approximate.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.starts = 0
+        self.tracing = 0
+        self.started_tracing = False
+
+    def begin(self, trace_memory):
+        """
+        :return: A tuple (overlapped, starts, memory_start, peak_start) of the new measurement.
+        """
+        with self.lock:
+            overlapped = self.active > 0
+            self.active += 1
+            self.starts += 1
+            memory_start = peak_start = 0
+            if trace_memory:
+                if self.tracing == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    self.started_tracing = True
+                self.tracing += 1
+                if not overlapped:
+                    tracemalloc.reset_peak()
+                memory_start, peak_start = tracemalloc.get_traced_memory()
+            return overlapped, self.starts, memory_start, peak_start
+
+    def end(self, trace_memory, starts):
+        """
+        :return: A tuple (overlapped, memory_end, peak_end) since the matching begin().
+        """
+        with self.lock:
+            # Other measurements started or still running during this one
+            overlapped = self.active > 1 or self.starts != starts
+            self.active -= 1
+            memory_end = peak_end = 0
+            if trace_memory:
+                memory_end, peak_end = tracemalloc.get_traced_memory()
+                self.tracing -= 1
+                if self.tracing == 0 and self.started_tracing:
+                    tracemalloc.stop()
+                    self.started_tracing = False
+            return overlapped, memory_end, peak_end
+
+
+active_measurements = ActiveMeasurements()
+
+
+class ResourceMonitor:
+    def __init__(self, trace_memory=True):
+        """
+        Measures the resources consumed by each subtask: wall time, CPU time of the executing thread,
+        peak memory allocated (tracemalloc) and LLM tokens recorded by the models module.
+        While other subtasks run in the same process (concurrent runs share it), the CPU time also
+        counts the greenlets of the same thread and the peak memory cannot be isolated: such records
+        are marked approximate.
+
+        :param trace_memory: Whether to measure the peak memory with tracemalloc, which slows down allocations.
+        """
+        self.trace_memory = trace_memory
+        self.records = []
+        self.active = None
+
+    def start(self, subtask_name, tool_name, iteration):
+        self.close()
+        overlapped, starts, memory_start, peak_start = active_measurements.begin(self.trace_memory)
+        self.active = {
+            "record": {"subtask_name": subtask_name, "tool_name": tool_name or "unknown", "iteration": iteration},
+            "usage": usage_tracker.begin_scope(),
+            "overlapped": overlapped,
+            "starts": starts,
+            "memory_start": memory_start,
+            "peak_start": peak_start,
+            "wall_start": time.perf_counter(),
+            "cpu_start": time.thread_time()
+        }
+
+    def stop(self, **extra):
+        """
+        Ends the measurement started by start() and stores its record.
+
+        :param extra: Additional fields of the record (e.g. regeneration attempts).
+        :return: The record, or None if no measurement is active.
+        """
+        if not self.active:
+            return None
+        active, self.active = self.active, None
+        record = active["record"]
+        usage = usage_tracker.end_scope(active["usage"])
+        cpu_seconds = time.thread_time() - active["cpu_start"]
+        overlapped, memory_end, peak_end = active_measurements.end(self.trace_memory, active["starts"])
+        record.update({
+            "wall_seconds": round(time.perf_counter() - active["wall_start"], 3),
+            "cpu_seconds": round(cpu_seconds, 3),
+            "peak_memory_mb": None,
+            "approximate": active["overlapped"] or overlapped,
+            "llm_calls": usage["calls"],
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"]
+        })
+        if self.trace_memory:
+            # A peak older than the subtask (not reset because of another measurement) is not its own:
+            # only the memory still allocated at its end is then known to be.
+            peak = peak_end if peak_end > active["peak_start"] or not active["overlapped"] else memory_end
+            record["peak_memory_mb"] = round(max(0, peak - active["memory_start"]) / (1024 * 1024), 2)
+        record.update(extra)
+        self.records.append(record)
+        return record
+
+    def close(self):
+        """
+        Ends a measurement left open by a failed subtask.
+        """
+        if self.active:
+            self.stop(failed=True)
+
+    def tool_statistics(self):
+        """
+        Aggregates the records per tool.
+
+        :return: A dictionary {tool_name: {subtasks, wall_seconds, cpu_seconds, max_peak_memory_mb, prompt_tokens, completion_tokens, approximate}}.
+        """
+        statistics = {}
+        for record in self.records:
+            tool_stats = statistics.setdefault(record["tool_name"], {
+                "subtasks": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "max_peak_memory_mb": None, "prompt_tokens": 0, "completion_tokens": 0, "approximate": False
+            })
+            tool_stats["subtasks"] += 1
+            tool_stats["approximate"] = tool_stats["approximate"] or record.get("approximate", False)
+            tool_stats["wall_seconds"] = round(tool_stats["wall_seconds"] + record["wall_seconds"], 3)
+            tool_stats["cpu_seconds"] = round(tool_stats["cpu_seconds"] + record["cpu_seconds"], 3)
+            tool_stats["prompt_tokens"] += record["prompt_tokens"]
+            tool_stats["completion_tokens"] += record["completion_tokens"]
+            if record["peak_memory_mb"] is not None:
+                tool_stats["max_peak_memory_mb"] = max(tool_stats["max_peak_memory_mb"] or 0, record["peak_memory_mb"])
+        return statistics
+
+    @staticmethod
+    def format_record(record) -> str:
+        memory = f"{record['peak_memory_mb']} MB" if record["peak_memory_mb"] is not None else "n/a"
+        approximate = " (cpu and memory approximate: concurrent subtasks)" if record.get("approximate") else ""
+        return (
+            f"wall {record['wall_seconds']}s, cpu {record['cpu_seconds']}s, peak memory {memory}{approximate}, "
+            f"{record['llm_calls']} LLM calls ({record['prompt_tokens']} prompt + {record['completion_tokens']} completion tokens)"
+        )
+
+    def summary(self) -> str:
+        lines = ["Per subtask:"]
+        for record in self.records:
+            lines.append(f"  [{record['iteration']}] {record['subtask_name']} ({record['tool_name']}): {self.format_record(record)}")
+        lines.append("Per tool:")
+        for tool_name, tool_stats in sorted(
+            self.tool_statistics().items(), key=lambda item: item[1]["wall_seconds"], reverse=True
+        ):
+            lines.append(f"  {tool_name}: {tool_stats}")
+        return "\n".join(lines)
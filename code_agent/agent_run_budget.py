@@ -0,0 +1,100 @@
+import math
+import time
+import threading
+from models.models import usage_tracker
+
+_local = threading.local()
+
+
+class RunBudget:
+    def __init__(self, max_seconds=None, max_tokens=None, degrade_ratio=0.8, degraded_top_k_ratio=0.5):
+        """
+        Time and token budget of a single agent run. Tokens are counted over every model call
+        made by the run's thread (planning, execution, regeneration and evaluation). Once the
+        consumption reaches degrade_ratio of either limit the run degrades: no more evaluation
+        iterations or subtask regenerations, and fewer documents retrieved by the RAG tools.
+
+        :param max_seconds: Maximum wall-clock seconds of the run, None for no limit.
+        :param max_tokens: Maximum prompt + completion tokens of the run, None for no limit.
+        :param degrade_ratio: Fraction of the budget after which the run degrades.
+        :param degraded_top_k_ratio: Factor applied to the RAG top_k of a degraded run.
+        """
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.degrade_ratio = degrade_ratio
+        self.degraded_top_k_ratio = degraded_top_k_ratio
+        self.start_time = None
+        self.scope = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.scope = usage_tracker.begin_scope()
+        _local.budget = self
+
+    def stop(self):
+        if self.scope is not None:
+            usage_tracker.end_scope(self.scope)
+        if getattr(_local, "budget", None) is self:
+            _local.budget = None
+
+    def seconds_elapsed(self) -> float:
+        return time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+
+    def tokens_used(self) -> int:
+        return self.scope["prompt_tokens"] + self.scope["completion_tokens"] if self.scope else 0
+
+    def usage_ratio(self) -> float:
+        """
+        Returns the consumed fraction of the most constrained limit (0.0 without limits).
+        """
+        ratios = [0.0]
+        if self.max_seconds:
+            ratios.append(self.seconds_elapsed() / self.max_seconds)
+        if self.max_tokens:
+            ratios.append(self.tokens_used() / self.max_tokens)
+        return max(ratios)
+
+    def is_degraded(self) -> bool:
+        return self.usage_ratio() >= self.degrade_ratio
+
+    def report(self) -> str:
+        return (
+            f"{self.seconds_elapsed():.1f}s of {self.max_seconds or 'unlimited'}s, "
+            f"{self.tokens_used()} of {self.max_tokens or 'unlimited'} tokens "
+            f"({self.usage_ratio():.0%} of the budget)"
+        )
+
+
+def parse_budget_limit(value, maximum, integer=False):
+    """
+    Converts a budget limit received from a client to a number within (0, maximum].
+
+    :param value: The requested limit, e.g. a number or a numeric string.
+    :param maximum: The largest limit accepted, None for no upper bound.
+    :param integer: Whether the limit is a whole number (tokens).
+    :return: The limit, or None (default budget) if value is missing, not a number or not positive.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        limit = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(limit) or limit <= 0:
+        return None
+    if maximum is not None:
+        limit = min(limit, maximum)
+    if integer:
+        return int(limit) or None
+    return limit
+
+
+def scaled_top_k(top_k: int) -> int:
+    """
+    Used by the RAG tools: returns top_k, reduced if the budget of the agent run executing
+    in the current thread is nearly exhausted.
+    """
+    budget = getattr(_local, "budget", None)
+    if budget is None or not budget.is_degraded():
+        return top_k
+    return max(1, int(top_k * budget.degraded_top_k_ratio))
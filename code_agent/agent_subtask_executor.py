@@ -1,10 +1,22 @@
+import os
 import json
 import re
+import time
 import inspect
-from .function_validator import FunctionValidator
+from .function_validator import FunctionValidator, PlanDataflowValidator
 from models.models import call_model
-from .utils import sanitize_gpt_response
-from .prompts import REGENERATE_SUBTASK_PROMPT, CODE_SYSTEM_PROMPT
+from .utils import estimate_tokens
+from .schemas import REGENERATION_RESPONSE_SCHEMA
+from models.json_repair import parse_json_response
+from .agent_regeneration_context import RegenerationContextBuilder
+from .agent_progress_emitter import ProgressEmitter
+from .agent_tool_cache import ToolCache, tool_cache_stats
+from .agent_resource_monitor import ResourceMonitor
+from .agent_tool_invocation import ToolInvocationBuilder
+from .agent_function_library import FunctionLibrary
+from .langchain_tool_registry import get_langchain_tool
+from models.deadline import check_deadline
+from params import PARAMS
 
 class SubtaskExecutor:
     def __init__(self, agent):
@@ -18,31 +30,103 @@ class SubtaskExecutor:
         self.allowed_lib_names = [
             lib_name for tool in self.agent.tools for lib_name in tool["lib_names"]
         ]
+        self.tool_cache_configs = {
+            tool["tool_name"]: tool["cache"] for tool in self.agent.tools if tool.get("cache")
+        }
+        self.tool_cache = None
+        if PARAMS["TOOL_CACHE_BACKEND"] and self.tool_cache_configs:
+            self.tool_cache = ToolCache(
+                backend=PARAMS["TOOL_CACHE_BACKEND"],
+                redis_host=os.getenv("REDIS_HOST", "redis"),
+                redis_port=int(os.getenv("REDIS_PORT", 6379)),
+                db=int(os.getenv("REDIS_DB", 0)),
+                cache_dir=PARAMS["TOOL_CACHE_DIR"]
+            )
+        self.tool_invocation_builder = ToolInvocationBuilder(self.agent.tools)
+        self.reference_errors = {}  # Subtasks whose tool invocation or library function could not be resolved.
+        self.resource_monitor = ResourceMonitor(trace_memory=PARAMS["SUBTASK_TRACEMALLOC_ENABLED"])
+        self.progress = ProgressEmitter(
+            self.agent.socketio,
+            self.agent.session_id,
+            min_interval=PARAMS["SUBTASK_PROGRESS_MIN_INTERVAL"],
+            preview_chars=PARAMS["SUBTASK_PROGRESS_PREVIEW_CHARS"]
+        )
 
 
  
-    def execute_subtasks(self):
+    def execute_subtasks(self, resume_results=None, resume_index=0):
             """
             Iterates over the subtasks in the JSON plan, validates each subtask’s code,
             executes it (with regeneration on error based on in-memory log inspection),
             and then calls the subtask function.
+            A checkpoint is saved after each successful subtask, and progress events are streamed
+            to the session's Socket.IO room when each subtask starts and finishes.
 
+            :param resume_results: Results of the subtasks already completed in a previous run, if resuming.
+            :param resume_index: Number of subtasks already completed, which are skipped.
             :return: A dictionary with the results of the executed subtasks.
             """
-            results = {}
+            results = dict(resume_results or {})
             subtasks = self.agent.json_plan.get("subtasks", [])
 
             error_pattern = re.compile(r"\[ERROR\]")
 
+            # --- Deterministic tool invocations and proven library functions replace generated code ---
+            self.reference_errors = {}
+            for i, subtask in enumerate(subtasks):
+                try:
+                    if ToolInvocationBuilder.is_invocation(subtask):
+                        subtasks[i] = self.tool_invocation_builder.build(subtask)
+                    elif subtask.get("library_function_id") and not subtask.get("code"):
+                        subtasks[i] = self._load_library_function(subtask)
+                except ValueError as e:
+                    self.reference_errors[subtask.get("subtask_name", "")] = str(e)
+                    subtasks[i] = dict(subtask, code=subtask.get("code", ""))
+            successful_subtasks = []
+
+            # --- Step 0: Static dataflow check of updated_dict keys over the whole plan ---
+            dataflow_errors = PlanDataflowValidator(subtasks).analyze()
+            if dataflow_errors:
+                self.agent.logger.info(
+                    self.agent.enrich_log(
+                        f"🔎 Dataflow issues found in the JSON plan before execution:\n"
+                        f"{json.dumps(dataflow_errors, indent=4)}",
+                        "add_red_divider"
+                    ),
+                    extra={'no_memory': True}
+                )
+
             for index, subtask in enumerate(subtasks):
-                # --- Step 1: Validate subtask code ---
-                output_validator, subtask = self._validate_subtask_code(subtask, index, results)
-                code_string = output_validator["code_string"]
+                if index < resume_index:
+                    continue
+
+                check_deadline(f"subtask '{subtask.get('subtask_name', '')}'")
+                subtask_start = time.perf_counter()
+                self.progress.subtask_started(subtask.get("subtask_name", ""), index + 1, len(subtasks))
+                self.resource_monitor.start(subtask.get("subtask_name", ""), subtask.get("chosen_tool", ""), self.agent.iteration)
+
+                # --- Step 1: Validate subtask code (vetted tool invocations are not validated) ---
+                if ToolInvocationBuilder.is_invocation(subtask) and subtask.get("subtask_name") not in self.reference_errors:
+                    self.agent.logger.info(
+                        self.agent.enrich_log(
+                            f"🧩 Subtask '{subtask['subtask_name']}' invokes the tool '{subtask['chosen_tool']}' directly with its code example.",
+                            "add_green_divider"
+                        ),
+                        extra={'no_memory': True}
+                    )
+                    code_string = subtask["code"]
+                else:
+                    output_validator, subtask, regeneration_skipped = self._validate_subtask_code(subtask, index, results)
+                    if regeneration_skipped:
+                        self._skip_subtask(subtask, index, len(subtasks), results, subtask_start, output_validator["errors_for_regeneration"])
+                        continue
+                    code_string = output_validator["code_string"]
 
                 subtask_name = subtask["subtask_name"]
                 input_tool_name = subtask.get("input_from_subtask", "")
                 attempts = 0
                 success = False
+                regeneration_skipped = False
 
                 # Regeneration loop for execution errors (based on log inspection)
                 while attempts < self.execution_max_regeneration_attempts and not success:
@@ -62,9 +146,24 @@ class SubtaskExecutor:
 
                     log_start_index = len(self.agent.execution_logs)
 
-                    # --- Step 3: Call the subtask function ---
+                    # --- Step 3: Call the subtask function (or reuse a cached output of a pure tool) ---
+                    previous_result = results.get(input_tool_name, {}) if index > 0 else {}
+                    chosen_tool = subtask.get("chosen_tool", "")
+                    cache_config = self.tool_cache_configs.get(chosen_tool) if self.tool_cache else None
+                    cached_output = None
+                    if cache_config and isinstance(previous_result, dict):
+                        cached_output = self.tool_cache.get(chosen_tool, code_string, previous_result)
+                    if cached_output is not None:
+                        # Kept in memory so that the evaluator sees the output the tool did not log this time.
+                        self.agent.logger.info(
+                            f"♻️ Cached output of tool '{chosen_tool}' reused for subtask '{subtask_name}': "
+                            f"{self.progress.preview(cached_output)}"
+                        )
+                        results[subtask_name] = {**previous_result, **cached_output}
+                        success = True
+                        break
+
                     if index > 0:
-                        previous_result = results.get(input_tool_name, {})
                         result = tool_func(previous_result)
                     else:
                         if "previous_output" in sig.parameters:
@@ -85,16 +184,27 @@ class SubtaskExecutor:
                             ),
                             extra={'no_memory': True} 
                         )
+                        if self.agent.run_budget.is_degraded():
+                            # The failed output is kept, the evaluator will see the errors in the logs.
+                            self.agent.logger.warning(
+                                f"💸 Run budget nearly exhausted ({self.agent.run_budget.report()}): "
+                                f"subtask '{subtask_name}' is not regenerated.",
+                                extra={'no_memory': True}
+                            )
+                            regeneration_skipped = True
+                            break
                         # Regenerate the subtask code based on the error logs.
-                        regen_subtask = self.regenerate_subtask(error_message, subtask)
+                        regen_subtask = self.regenerate_subtask(error_message, subtask, previous_output=results.get(input_tool_name, {}) if index > 0 else {})
                         self._update_subtask_in_plan(subtask_name, regen_subtask)
                         subtask = regen_subtask
                         code_string = subtask["code"]
                         attempts += 1
                     else:
                         success = True
+                        if cache_config and isinstance(previous_result, dict):
+                            self.tool_cache.set(chosen_tool, cache_config, code_string, previous_result, result)
 
-                if not success:
+                if not success and not regeneration_skipped:
                     error_msg = (
                         f"❌❌❌ Subtask '{subtask_name}' still fails after {attempts} execution regeneration attempts."
                     )
@@ -102,8 +212,18 @@ class SubtaskExecutor:
                         self.agent.enrich_log(error_msg, "add_red_divider"),
                         extra={'no_memory': True}
                     )
+                    self.resource_monitor.close()
+                    self.progress.flush()
                     raise Exception(error_msg)
 
+                if success and not ToolInvocationBuilder.is_invocation(subtask):
+                    successful_subtasks.append(dict(subtask, code=code_string))
+                resources = self.resource_monitor.stop(regeneration_attempts=attempts, cached=cached_output is not None)
+                self.agent.save_checkpoint(results, index + 1)
+                self.progress.subtask_finished(
+                    subtask_name, index + 1, len(subtasks), time.perf_counter() - subtask_start, results[subtask_name]
+                )
+
                 # --- Logging the successful execution ---
                 results_str = json.dumps(results, indent=4)
                 if index == len(subtasks) - 1:
@@ -115,7 +235,8 @@ class SubtaskExecutor:
 
                 self.agent.logger.info(
                     self.agent.enrich_log(
-                        f"📌 Subtask nr.{index + 1} executed: {subtask_name}.\n\n"
+                        f"📌 Subtask nr.{index + 1} executed: {subtask_name}.\n"
+                        f"⏱️ Resources: {ResourceMonitor.format_record(resources)}\n\n"
                         f"🧠 Updated memory logs:\n{self.agent.execution_logs}\n\n"
                         f"📤 Task output:\n{results_str}",
                         "add_green_divider"
@@ -123,9 +244,38 @@ class SubtaskExecutor:
                     extra={'no_memory': True}
                 )
 
+            if self.agent.function_library:
+                self.agent.function_library.store(successful_subtasks)
+            if self.tool_cache:
+                self.agent.logger.info(
+                    f"📦 Tool cache hit rates since process start:\n{tool_cache_stats.report()}",
+                    extra={'no_memory': True}
+                )
+            self.progress.flush()
             return results
 
 
+    def _load_library_function(self, subtask):
+        """
+        Replaces the library_function_id of the subtask with the proven code from the function library.
+
+        :raises ValueError: If the function is not in the library.
+        """
+        function_id = subtask["library_function_id"]
+        library_function = self.agent.function_library.get(function_id) if self.agent.function_library else None
+        if library_function is None:
+            raise ValueError(f"library_function_id '{function_id}' was not found in the function library. Write the subtask code instead.")
+        self.agent.logger.info(
+            self.agent.enrich_log(f"📚 Subtask '{subtask['subtask_name']}' reuses the library function {function_id}.", "add_green_divider"),
+            extra={'no_memory': True}
+        )
+        return dict(
+            subtask,
+            chosen_tool=subtask.get("chosen_tool") or library_function["chosen_tool"],
+            imports=library_function["imports"],
+            code=FunctionLibrary.rename_function(library_function["code"], subtask["subtask_name"])
+        )
+
     def _update_subtask_in_plan(self, subtask_name, new_subtask):
         """
         Updates the JSON plan with the regenerated subtask.
@@ -146,7 +296,9 @@ class SubtaskExecutor:
         :param subtask: The current subtask (a dict) to validate.
         :param index: The index of the current subtask.
         :param results: Dictionary of previously computed subtask results.
-        :return: A tuple of (output_validator, subtask). The output_validator contains the validated code string.
+        :return: A tuple of (output_validator, subtask, regeneration_skipped). The output_validator contains the
+                 validated code string. regeneration_skipped is True if the code still has errors but was not
+                 regenerated because the run budget is nearly exhausted.
         :raises Exception: If the subtask still contains errors after the maximum regeneration attempts.
         """
         attempts = 0
@@ -156,6 +308,11 @@ class SubtaskExecutor:
             index,
             len(self.agent.json_plan.get("subtasks", []))
         ).validate(subtask["code"])
+        # Recomputed on the current plan, so earlier regenerations are taken into account.
+        dataflow_errors = PlanDataflowValidator(self.agent.json_plan.get("subtasks", [])).analyze()
+        output_validator["errors_for_regeneration"].extend(dataflow_errors.get(subtask["subtask_name"], []))
+        if subtask["subtask_name"] in self.reference_errors:
+            output_validator["errors_for_regeneration"].append(self.reference_errors[subtask["subtask_name"]])
 
         if not output_validator["errors_for_regeneration"]:
             self.agent.logger.info(
@@ -168,6 +325,13 @@ class SubtaskExecutor:
             )
 
         while output_validator["errors_for_regeneration"] and attempts < self.validator_max_regeneration_attempts:
+            if self.agent.run_budget.is_degraded():
+                self.agent.logger.warning(
+                    f"💸 Run budget nearly exhausted ({self.agent.run_budget.report()}): "
+                    f"subtask '{subtask['subtask_name']}' is not regenerated.",
+                    extra={'no_memory': True}
+                )
+                return output_validator, subtask, True
             self.agent.logger.info(
                 self.agent.enrich_log(
                     f"🔄 Regenerating subtask: {subtask['subtask_name']} "
@@ -178,7 +342,8 @@ class SubtaskExecutor:
                 extra={'no_memory': True}
             )
 
-            regen_subtask = self.regenerate_subtask(output_validator["errors_for_regeneration"], subtask)
+            previous_result = results.get(subtask.get("input_from_subtask", ""), {}) if index > 0 else {}
+            regen_subtask = self.regenerate_subtask(output_validator["errors_for_regeneration"], subtask, previous_output=previous_result)
             # Update the JSON plan and the local subtask with the regenerated version.
             self._update_subtask_in_plan(subtask["subtask_name"], regen_subtask) 
             subtask = regen_subtask
@@ -215,10 +380,33 @@ class SubtaskExecutor:
             )
             raise Exception(error_msg)
 
-        return output_validator, subtask
+        return output_validator, subtask, False
+
+    def _skip_subtask(self, subtask, index, total_subtasks, results, subtask_start, errors):
+        """
+        Skips a subtask whose code is invalid in a degraded run: its input is passed on unchanged
+        to the next subtasks, and the skip is logged to memory so that the evaluator sees it.
+        """
+        subtask_name = subtask["subtask_name"]
+        self.agent.logger.error(
+            f"Subtask '{subtask_name}' was skipped because its code is invalid and the run budget is "
+            f"nearly exhausted. Validation errors: {errors}"
+        )
+        previous_result = results.get(subtask.get("input_from_subtask", ""), {}) if index > 0 else {}
+        results[subtask_name] = dict(previous_result) if isinstance(previous_result, dict) else previous_result
+        self.resource_monitor.stop(regeneration_attempts=0, cached=False)
+        self.agent.save_checkpoint(results, index + 1)
+        self.progress.subtask_finished(
+            subtask_name, index + 1, total_subtasks, time.perf_counter() - subtask_start, results[subtask_name]
+        )
 
     def _execute_subtask_code(self, subtask, code_string, index):
-        temp_namespace = {"logger": self.agent.logger, "session_id": self.agent.session_id, "socketio": self.agent.socketio}
+        temp_namespace = {
+            "logger": self.agent.logger,
+            "session_id": self.agent.session_id,
+            "socketio": self.agent.socketio,
+            "get_langchain_tool": get_langchain_tool
+        }
         self.agent.logger.info(
             self.agent.enrich_log(
                 f"⌛ Executing subtask nr.{index + 1} of {len(self.agent.json_plan.get('subtasks', []))}: {subtask['subtask_name']}",
@@ -231,34 +419,41 @@ class SubtaskExecutor:
         return temp_namespace, code_string
 
 
-    def regenerate_subtask(self, subtask_errors, subtask):
+    def regenerate_subtask(self, subtask_errors, subtask, previous_output=None):
         """
         Uses the LLM to regenerate the subtask based on the errors encountered.
-        Also records the regeneration attempt.
+        Only the failing subtask, the schema of its upstream output, the relevant tools and
+        the errors are sent, within the REGENERATION_PROMPT_TOKEN_BUDGET.
+        Also records the regeneration attempt with its prompt size and latency.
 
         :param subtask_errors: The error message or validation errors that triggered regeneration.
         :param subtask: The original subtask (a dict) that needs to be regenerated.
+        :param previous_output: The dictionary the subtask receives as previous_output, if already computed.
         :return: The regenerated subtask (a dict) as provided by the LLM.
         """
-        regen_prompt = REGENERATE_SUBTASK_PROMPT.substitute(
-            agent_initial_prompt=CODE_SYSTEM_PROMPT,
-            conversation_history=self.agent.chat_history,
-            json_plan=self.agent.json_plan,
-            tools=self.agent.tools,
-            subtask_name=subtask["subtask_name"],
-            subtask_errors=subtask_errors
+        context_builder = RegenerationContextBuilder(
+            self.agent.json_plan,
+            self.agent.tools,
+            self.allowed_lib_names,
+            PARAMS["REGENERATION_PROMPT_TOKEN_BUDGET"]
         )
+        regen_prompt = context_builder.build(subtask, subtask_errors, previous_output)
+        prompt_tokens = estimate_tokens(regen_prompt)
+
+        start_time = time.perf_counter()
         llm_output_str = call_model(
             chat_history=[{"role": "user", "content": regen_prompt}],
             model=self.agent.models["JSON_PLAN_MODEL"],
-            output_format="json_object"
+            output_format="json_object",
+            response_schema=REGENERATION_RESPONSE_SCHEMA
         )
+        latency = time.perf_counter() - start_time
 
-        llm_output_str = sanitize_gpt_response(llm_output_str)
-        llm_output_json = json.loads(llm_output_str)
+        llm_output_json = parse_json_response(llm_output_str)
         self.agent.logger.info(
             self.agent.enrich_log(
-                f"🤖 LLM output for subtask regeneration: {llm_output_str}",
+                f"🤖 LLM output for subtask regeneration: {llm_output_str}\n"
+                f"⏱️ Regeneration took {latency:.2f}s with a prompt of ~{prompt_tokens} tokens.",
                 "add_green_divider"
             ),
             extra={'no_memory': True}
@@ -271,7 +466,9 @@ class SubtaskExecutor:
             "original_subtask": subtask,
             "errors": subtask_errors,
             "reasoning": llm_output_json["reasoning"],
-            "corrected_subtask": corrected_subtask
+            "corrected_subtask": corrected_subtask,
+            "prompt_tokens": prompt_tokens,
+            "latency_seconds": round(latency, 3)
         })
 
         return corrected_subtask
@@ -0,0 +1,145 @@
+import os
+import ast
+import json
+import time
+import pickle
+import hashlib
+import threading
+import logging
+import traceback
+from collections import defaultdict
+from .function_validator import UpdatedDictReadVisitor
+
+logger = logging.getLogger(__name__)
+
+
+class ToolCacheStats:
+    def __init__(self):
+        """
+        Process-wide hit/miss counters of the tool result cache, per tool.
+        """
+        self.lock = threading.Lock()
+        self.counters = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    def record(self, tool_name, hit: bool):
+        with self.lock:
+            self.counters[tool_name]["hits" if hit else "misses"] += 1
+
+    def hit_rate(self, tool_name) -> float:
+        with self.lock:
+            counters = self.counters.get(tool_name)
+            if not counters:
+                return 0.0
+            total = counters["hits"] + counters["misses"]
+            return counters["hits"] / total if total else 0.0
+
+    def report(self) -> str:
+        with self.lock:
+            snapshot = {tool: dict(counters) for tool, counters in self.counters.items()}
+        lines = []
+        for tool_name, counters in sorted(snapshot.items()):
+            total = counters["hits"] + counters["misses"]
+            lines.append(
+                f"{tool_name}: {counters['hits']}/{total} hits ({counters['hits'] / total:.1%})"
+            )
+        return "\n".join(lines) or "no cacheable tool calls"
+
+
+tool_cache_stats = ToolCacheStats()
+
+
+class ToolCache:
+    def __init__(self, backend='redis', redis_host='redis', redis_port=6379, db=0, cache_dir='/tmp/tool_cache'):
+        """
+        Caches the output of subtasks implemented with a pure tool, across sessions.
+        A tool opts in with a "cache" annotation in its definition, e.g. {"ttl": 3600}: the cache
+        key is the tool name, the subtask code and the values of every input key the code reads
+        (the whole subtask input if they can't be determined statically).
+
+        :param backend: 'redis' or 'disk'.
+        :param cache_dir: Directory of the cache entries when the backend is 'disk'.
+        """
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.redis = None
+        if backend == 'redis':
+            import redis
+            self.redis = redis.StrictRedis(host=redis_host, port=redis_port, db=db)
+        else:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def read_input_keys(code_string):
+        """
+        :return: The sorted keys of previous_output read by the subtask code, or None if the code
+                 may read any key.
+        """
+        try:
+            tree = ast.parse(code_string)
+        except SyntaxError:
+            return None
+        read_visitor = UpdatedDictReadVisitor()
+        read_visitor.visit(tree)
+        return None if read_visitor.is_open else sorted(read_visitor.read_keys)
+
+    @classmethod
+    def get_cache_key(cls, tool_name, code_string, previous_output) -> str:
+        key_fields = cls.read_input_keys(code_string)
+        if key_fields is None:
+            key_fields = sorted(previous_output)
+        key_data = {
+            "code": code_string.strip(),
+            "inputs": {field: previous_output.get(field) for field in key_fields}
+        }
+        digest = hashlib.sha256(json.dumps(key_data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"tool_cache:{tool_name}:{digest}"
+
+    def get(self, tool_name, code_string, previous_output):
+        """
+        :return: The keys added or changed by the cached subtask output, or None on a miss.
+        """
+        key = self.get_cache_key(tool_name, code_string, previous_output)
+        try:
+            if self.redis is not None:
+                serialized_data = self.redis.get(key)
+                value = pickle.loads(serialized_data) if serialized_data else None
+            else:
+                value = self._read_disk_entry(key)
+        except Exception:
+            logger.warning("Error reading tool cache for %s:\n%s", tool_name, traceback.format_exc())
+            value = None
+        tool_cache_stats.record(tool_name, value is not None)
+        return value
+
+    def set(self, tool_name, cache_config, code_string, previous_output, output):
+        """
+        Stores only the keys the subtask added or changed, so that a hit never restores stale
+        values of the input fields the subtask does not read.
+        """
+        if not isinstance(output, dict):
+            return
+        delta = {k: v for k, v in output.items() if k not in previous_output or previous_output[k] != v}
+        key = self.get_cache_key(tool_name, code_string, previous_output)
+        ttl = cache_config.get("ttl", 3600)
+        try:
+            if self.redis is not None:
+                self.redis.set(key, pickle.dumps(delta), ex=ttl)
+            else:
+                with open(self._disk_path(key), "wb") as f:
+                    pickle.dump({"expires_at": time.time() + ttl, "value": delta}, f)
+        except Exception:
+            logger.warning("Error writing tool cache for %s:\n%s", tool_name, traceback.format_exc())
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key.replace(":", "_") + ".pkl")
+
+    def _read_disk_entry(self, key):
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+        if entry["expires_at"] < time.time():
+            os.remove(path)
+            return None
+        return entry["value"]
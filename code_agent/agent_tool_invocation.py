@@ -0,0 +1,73 @@
+import ast
+
+INVOKED_TOOL_FUNCTION = "_invoked_tool"
+
+
+class ToolInvocationBuilder:
+    def __init__(self, tools):
+        """
+        Turns the subtasks of the JSON plan that reference a tool by name ("tool_invocation")
+        into code, using the vetted code_example of the tool instead of LLM generated code.
+        Only tools with use_exactly_code_example and invocation_inputs can be invoked this way.
+
+        :param tools: List of tool dictionaries available to the agent.
+        """
+        self.invocable_tools = {
+            tool["tool_name"]: tool for tool in tools
+            if tool.get("use_exactly_code_example") and tool.get("invocation_inputs")
+        }
+
+    @staticmethod
+    def is_invocation(subtask) -> bool:
+        return bool(subtask.get("tool_invocation"))
+
+    def build(self, subtask):
+        """
+        Builds the subtask code: a function named after the subtask that sets the invocation inputs
+        in a copy of previous_output and calls the tool's code_example function.
+
+        :return: The subtask updated with chosen_tool, imports and code.
+        :raises ValueError: If the tool cannot be invoked or an invocation input is not set.
+        """
+        invocation = subtask["tool_invocation"]
+        tool_name = invocation.get("tool_name") or subtask.get("chosen_tool", "")
+        tool = self.invocable_tools.get(tool_name)
+        if tool is None:
+            raise ValueError(
+                f"Tool '{tool_name}' cannot be used with tool_invocation; "
+                f"invocable tools: {sorted(self.invocable_tools)}. Write the subtask code instead."
+            )
+
+        inputs = invocation.get("inputs") or {}
+        input_mapping = invocation.get("input_mapping") or {}
+        missing_inputs = [key for key in tool["invocation_inputs"] if key not in inputs and key not in input_mapping]
+        if missing_inputs:
+            raise ValueError(
+                f"tool_invocation of '{tool_name}' does not set the inputs {missing_inputs} "
+                f"in inputs or input_mapping."
+            )
+
+        tool_code = self._rename_tool_function(tool["code_example"])
+        wrapper_code = (
+            f"def {subtask['subtask_name']}(previous_output):\n"
+            f"    updated_dict = previous_output.copy()\n"
+            f"    updated_dict.update({inputs!r})\n"
+            f"    for tool_input, previous_key in {input_mapping!r}.items():\n"
+            f"        updated_dict[tool_input] = previous_output.get(previous_key)\n"
+            f"    return {INVOKED_TOOL_FUNCTION}(updated_dict)\n"
+        )
+        return dict(
+            subtask,
+            chosen_tool=tool_name,
+            imports=list(tool["lib_names"]),
+            code=wrapper_code + "\n" + tool_code
+        )
+
+    @staticmethod
+    def _rename_tool_function(code_example):
+        """
+        Renames the code_example function, so that it can't clash with the subtask name.
+        """
+        tree = ast.parse(code_example)
+        function_name = next(node.name for node in tree.body if isinstance(node, ast.FunctionDef))
+        return code_example.replace(f"def {function_name}(", f"def {INVOKED_TOOL_FUNCTION}(", 1)
@@ -0,0 +1,160 @@
+"""
+Benchmark of the subtask regeneration prompt.
+
+    python -m code_agent.benchmark_regeneration [--model gpt-4o] [--repeats 3] [--dry-run]
+
+Regenerates the same failing subtask with the former prompt (the whole conversation, JSON plan and tool
+list) and with the prompt of RegenerationContextBuilder, and reports for each the prompt tokens counted by
+the model provider, the completion tokens and the median latency of the model call. With --dry-run, no
+model is called and only the estimated prompt tokens are reported.
+"""
+import json
+import time
+import argparse
+import statistics
+from string import Template
+from models.models import call_model, usage_tracker
+from params import PARAMS
+from .prompts import CODE_SYSTEM_PROMPT
+from .schemas import REGENERATION_RESPONSE_SCHEMA
+from .tool_generator import generate_tools
+from .agent_regeneration_context import RegenerationContextBuilder
+from .utils import estimate_tokens
+
+# The former REGENERATE_SUBTASK_PROMPT, kept as the baseline.
+LEGACY_REGENERATE_SUBTASK_PROMPT = Template("""
+<agentInitialPrompt>
+$agent_initial_prompt
+</agentInitialPrompt>
+
+Below is the conversation history that led to the current JSON plan:
+$conversation_history
+
+The following JSON plan represents the current set of subtasks:
+$json_plan
+
+The subtask_to_regenerate that generated errors is: $subtask_name
+And the errors are: $subtask_errors
+
+Your task is to analyze these errors and produce a corrected version of the **subtask_to_regenerate**. Please output **only** a single JSON object with the following top-level keys:
+- "reasoning": A detailed explanation of the corrective steps taken and why the new subtask was generated in the chosen manner.
+- "corrected_subtask": A JSON object representing the corrected subtask_to_regenerate. This JSON object must follow the exact format as specified in the original instructions, including the following fields:
+    - "subtask_name"
+    - "chosen_tool"
+    - "input_from_subtask"
+    - "description"
+    - "imports"
+    - "thought"
+    - "code"
+
+**Requirements:**
+- The new subtask must directly address the issues highlighted in `$subtask_errors`.
+- Ensure that the Python code in the "code" field is valid, adheres to proper error handling, logging conventions, and uses only the libraries allowed (as detailed in the original prompt).
+- Maintain consistency with the structure and style defined in the original `agentInitialPrompt`.
+- Output **only** the JSON object corresponding to the corrected subtask along with the overall reasoning, and nothing else.
+""")
+
+CHAT_HISTORY = [
+    {"role": "user", "content": "Find the three most recent reviews of the Lisbon hotel 'Casa do Rio' and tell me their average rating."},
+    {"role": "assistant", "content": "I will search the web for the reviews and compute their average rating."},
+    {"role": "user", "content": "Please also summarize the main complaints."}
+]
+
+JSON_PLAN = {
+    "main_task": "Find the three most recent reviews of the hotel 'Casa do Rio' in Lisbon, average their ratings and summarize the complaints.",
+    "subtasks": [
+        {
+            "subtask_name": "search_reviews",
+            "chosen_tool": "web_search",
+            "input_from_subtask": "",
+            "description": "Searches the web for recent reviews of the hotel.",
+            "imports": ["duckduckgo_search"],
+            "thought": "A web search returns review snippets with their ratings.",
+            "code": "def search_reviews() -> dict:\n    updated_dict = {\"reviews\": \"4/5 Great view. 2/5 Noisy street. 3/5 Small room.\"}\n    logger.info(\"<executionLog>The function search_reviews executed successfully</executionLog>\")\n    return updated_dict"
+        },
+        {
+            "subtask_name": "average_rating",
+            "chosen_tool": "helper_model",
+            "input_from_subtask": "search_reviews",
+            "description": "Extracts the ratings of the reviews and computes their average.",
+            "imports": [],
+            "thought": "The ratings are embedded in an unstructured string.",
+            "code": "def average_rating(previous_output: dict) -> dict:\n    updated_dict = previous_output.copy()\n    ratings = updated_dict[\"ratings\"]\n    updated_dict[\"average_rating\"] = sum(ratings) / len(ratings)\n    return updated_dict"
+        },
+        {
+            "subtask_name": "summarize_complaints",
+            "chosen_tool": "helper_model",
+            "input_from_subtask": "average_rating",
+            "description": "Summarizes the main complaints of the reviews.",
+            "imports": [],
+            "thought": "A model summarizes the negative points of the reviews.",
+            "code": "def summarize_complaints(previous_output: dict) -> dict:\n    updated_dict = previous_output.copy()\n    updated_dict[\"complaints\"] = \"Noise and room size.\"\n    return updated_dict"
+        }
+    ]
+}
+
+SUBTASK_ERRORS = "KeyError: 'ratings' in average_rating: previous_output has no key 'ratings'."
+PREVIOUS_OUTPUT = {"reviews": "4/5 Great view. 2/5 Noisy street. 3/5 Small room."}
+
+
+def build_prompts(tools):
+    """
+    :return: A dictionary {prompt name: prompt} of the former and the current regeneration prompts.
+    """
+    subtask = JSON_PLAN["subtasks"][1]
+    legacy_prompt = LEGACY_REGENERATE_SUBTASK_PROMPT.substitute(
+        # The former code substituted the Template object itself, i.e. its repr.
+        agent_initial_prompt=CODE_SYSTEM_PROMPT,
+        conversation_history=CHAT_HISTORY,
+        json_plan=JSON_PLAN,
+        tools=tools,
+        subtask_name=subtask["subtask_name"],
+        subtask_errors=SUBTASK_ERRORS
+    )
+    allowed_lib_names = [lib_name for tool in tools for lib_name in tool.get("lib_names", [])]
+    current_prompt = RegenerationContextBuilder(
+        JSON_PLAN, tools, allowed_lib_names, PARAMS["REGENERATION_PROMPT_TOKEN_BUDGET"]
+    ).build(subtask, SUBTASK_ERRORS, PREVIOUS_OUTPUT)
+    return {"former": legacy_prompt, "current": current_prompt}
+
+
+def benchmark_regeneration(model, repeats, dry_run=False):
+    prompts = build_prompts(generate_tools([], use_default_tools=True))
+    if dry_run:
+        print(f"{'prompt':>8} {'est. tokens':>12}")
+        for name, prompt in prompts.items():
+            print(f"{name:>8} {estimate_tokens(prompt):>12}")
+        return
+
+    print(f"{'prompt':>8} {'est. tokens':>12} {'prompt tokens':>14} {'completion':>11} {'median latency':>15}")
+    for name, prompt in prompts.items():
+        latencies = []
+        scope = usage_tracker.begin_scope()
+        for _ in range(repeats):
+            start = time.perf_counter()
+            answer = call_model(
+                chat_history=[{"role": "user", "content": prompt}],
+                model=model,
+                output_format="json_object",
+                response_schema=REGENERATION_RESPONSE_SCHEMA
+            )
+            latencies.append(time.perf_counter() - start)
+            json.loads(answer)  # Both prompts must give a parseable regeneration.
+        usage = usage_tracker.end_scope(scope)
+        print(
+            f"{name:>8} {estimate_tokens(prompt):>12} {usage['prompt_tokens'] // repeats:>14} "
+            f"{usage['completion_tokens'] // repeats:>11} {statistics.median(latencies):>14.2f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=PARAMS["JSON_PLAN_MODEL"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--dry-run", action="store_true", help="Only estimate the prompt tokens, without calling the model.")
+    args = parser.parse_args()
+    benchmark_regeneration(args.model, args.repeats, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,39 @@
 import json
+import os
 from typing import List, Dict
 from .tool_generator import generate_tools
 from .logging_handler import LoggingConfigurator
 from .agent_plan_generator import PlanGenerator
 from .agent_plan_evaluator import PlanEvaluator
 from .agent_subtask_executor import SubtaskExecutor
-from .utils import transform_final_answer
+from .agent_checkpoint_manager import CheckpointManager
+from .agent_function_library import FunctionLibrary
+from .agent_plan_cache import PlanCache, plan_cache_stats
+from .agent_history_manager import HistoryManager
+from .agent_run_budget import RunBudget
+from .utils import transform_final_answer, estimate_tokens
+from models.models import usage_tracker, cascade_stats, hedge_stats
+from models.deadline import deadline_scope, DeadlineExceeded
 from params import PARAMS
 
 class CodeAgent:
-    def __init__(self, chat_history: List[Dict], tools: List[str], session_id: str, use_default_tools: bool = True, socketio: any = None): 
+    def __init__(self, chat_history: List[Dict], tools: List[str], session_id: str, use_default_tools: bool = True, socketio: any = None,
+                 time_budget: float = None, token_budget: int = None, memory_scope: str = None): 
         """
         Initializes the CodeAgent with conversation history and a list of tool names. 
         Additional default tools are appended automatically.
+        The run degrades gracefully when close to its time (seconds) or token budget,
+        which default to RUN_TIME_BUDGET_SECONDS and RUN_TOKEN_BUDGET.
+        The function library and the plan cache only hold the work of the memory_scope, an identity established
+        by the server (never a value sent by the client); without one they are not used.
         """
         self.chat_history = chat_history
         self.session_id = session_id
+        self.memory_scope = memory_scope
         self.socketio = socketio
         self.tools = generate_tools(tools, use_default_tools)
         self.execution_logs = []  # This list will collect logs (excluding those with 'no_memory' extra).
-        self.logger = LoggingConfigurator.configure_logger(self.execution_logs)
+        self.logger = LoggingConfigurator.configure_logger(self.execution_logs, self.session_id)
         self.enrich_log = LoggingConfigurator.enrich_log
         self.models = {  
             "TOOL_HELPER_MODEL": PARAMS["TOOL_HELPER_MODEL"], 
@@ -29,46 +43,176 @@ class CodeAgent:
             "SIMPLE_RAG_EMBEDDING_MODEL": PARAMS["SIMPLE_RAG_EMBEDDING_MODEL"]
         }
         # Instantiate helper components.
-        self.plan_generator = PlanGenerator(self.chat_history, self.tools, self.models["JSON_PLAN_MODEL"])
+        self.function_library = None
+        if PARAMS["FUNCTION_LIBRARY_ENABLED"] and self.memory_scope:
+            try:
+                self.function_library = FunctionLibrary(
+                    self.models["SIMPLE_RAG_EMBEDDING_MODEL"],
+                    PARAMS["CHROMA_DB_PATH"],
+                    self.memory_scope,
+                    max_distance=PARAMS["FUNCTION_LIBRARY_MAX_DISTANCE"]
+                )
+            except Exception:
+                self.logger.warning("Subtask function library unavailable.", exc_info=True, extra={'no_memory': True})
+        self.plan_cache = None
+        if PARAMS["PLAN_CACHE_ENABLED"] and self.memory_scope:
+            try:
+                self.plan_cache = PlanCache(
+                    self.models["SIMPLE_RAG_EMBEDDING_MODEL"],
+                    PARAMS["CHROMA_DB_PATH"],
+                    self.memory_scope,
+                    similarity_threshold=PARAMS["PLAN_CACHE_SIMILARITY_THRESHOLD"]
+                )
+            except Exception:
+                self.logger.warning("JSON plan cache unavailable.", exc_info=True, extra={'no_memory': True})
+        self.plan_generator = PlanGenerator(
+            self.chat_history, self.tools, self.models["JSON_PLAN_MODEL"], self.function_library, self.plan_cache
+        )
         self.plan_evaluator = PlanEvaluator(self.models["EVALUATION_MODEL"])
         self.json_plan = None
         self.subtask_executor = SubtaskExecutor(self) 
         self.user_qa = None
+        self.checkpoint_manager = None
+        if PARAMS["CODE_AGENT_CHECKPOINT_ENABLED"] and self.session_id:
+            self.checkpoint_manager = CheckpointManager(
+                redis_host=os.getenv("REDIS_HOST", "redis"),
+                redis_port=int(os.getenv("REDIS_PORT", 6379)),
+                db=int(os.getenv("REDIS_DB", 0)),
+                ttl=PARAMS["CODE_AGENT_CHECKPOINT_TTL"]
+            )
+        self.history_manager = None
+        if PARAMS["HISTORY_COMPACTION_ENABLED"]:
+            self.history_manager = HistoryManager(
+                PARAMS["HISTORY_SUMMARY_MODEL"],
+                token_budget=PARAMS["HISTORY_TOKEN_BUDGET"],
+                recent_messages=PARAMS["HISTORY_RECENT_MESSAGES"],
+                redis_host=os.getenv("REDIS_HOST", "redis"),
+                redis_port=int(os.getenv("REDIS_PORT", 6379)),
+                db=int(os.getenv("REDIS_DB", 0))
+            )
+        self.run_budget = RunBudget(
+            max_seconds=time_budget if time_budget is not None else PARAMS["RUN_TIME_BUDGET_SECONDS"],
+            max_tokens=token_budget if token_budget is not None else PARAMS["RUN_TOKEN_BUDGET"],
+            degrade_ratio=PARAMS["RUN_BUDGET_DEGRADE_RATIO"],
+            degraded_top_k_ratio=PARAMS["RUN_BUDGET_DEGRADED_TOP_K_RATIO"]
+        )
+        self.agent_prompt = None
+        self.iteration = 0
+
+    def get_conversation_history(self):
+        """
+        The conversation history sent to the planner: recent messages verbatim and older ones
+        summarized, within HISTORY_TOKEN_BUDGET.
+        """
+        if not self.history_manager:
+            return self.chat_history
+        conversation_history = self.history_manager.compact(self.session_id, self.chat_history)
+        if conversation_history is not self.chat_history:
+            self.logger.info(
+                f"🗜️ Conversation history compacted from ~{estimate_tokens(json.dumps(self.chat_history))} "
+                f"to ~{estimate_tokens(json.dumps(conversation_history))} tokens.",
+                extra={'no_memory': True}
+            )
+        return conversation_history
+
+    def save_checkpoint(self, results: Dict, completed_subtasks: int):
+        """
+        Stores the JSON plan, the results of the completed subtasks and the iteration counter,
+        so that an interrupted run can be resumed from the last completed subtask.
+        """
+        if not self.checkpoint_manager:
+            return
+        self.checkpoint_manager.save(self.session_id, self.chat_history, {
+            "json_plan": self.json_plan,
+            "agent_prompt": self.agent_prompt,
+            "iteration": self.iteration,
+            "completed_subtasks": completed_subtasks,
+            "results": results,
+            "execution_logs": list(self.execution_logs)
+        })
+
+    def clear_checkpoint(self):
+        if self.checkpoint_manager:
+            self.checkpoint_manager.delete(self.session_id)
        
     def run_agent(self):
         """
         Orchestrates the agent's execution: generating a plan, executing subtasks,
         and evaluating the output iteratively.
+        The run has a CODE_AGENT_DEADLINE_SECONDS deadline, which bounds every external call.
         """  
+        with deadline_scope(PARAMS["CODE_AGENT_DEADLINE_SECONDS"], "the agent run"):
+            return self._run_agent()
+
+    def _run_agent(self):
  
+        self.run_budget.start()
         try:  
             self.logger.info(
                 self.enrich_log(f"🚀 Starting agent with request: {json.dumps(self.chat_history, indent=4)}", "add_green_divider"),
                 extra={'no_memory': True}
             )
-            self.json_plan, agent_prompt = self.plan_generator.generate_plan()
-            self.logger.info(
-                self.enrich_log(f"💡 JSON plan: {json.dumps(self.json_plan, indent=4)}", "add_green_divider"),
-                extra={'no_memory': True}
-            )
+            checkpoint = self.checkpoint_manager.load(self.session_id, self.chat_history) if self.checkpoint_manager else None
+            if checkpoint:
+                self.json_plan = checkpoint["json_plan"]
+                self.agent_prompt = checkpoint["agent_prompt"]
+                self.execution_logs.extend(checkpoint["execution_logs"])
+                resume_results = checkpoint["results"]
+                resume_index = checkpoint["completed_subtasks"]
+                iteration = checkpoint["iteration"] - 1
+                self.logger.info(
+                    self.enrich_log(
+                        f"♻️ Resuming from checkpoint: iteration nr. {checkpoint['iteration']}, "
+                        f"{resume_index} subtask(s) already completed.",
+                        "add_green_divider"
+                    ),
+                    extra={'no_memory': True}
+                )
+            else:
+                self.json_plan, self.agent_prompt = self.plan_generator.generate_plan(self.get_conversation_history())
+                self.logger.info(
+                    self.enrich_log(f"💡 JSON plan: {json.dumps(self.json_plan, indent=4)}", "add_green_divider"),
+                    extra={'no_memory': True}
+                )
+                resume_results, resume_index = {}, 0
+                iteration = 0
+                self.iteration = 1
+                self.save_checkpoint({}, 0)
 
+            agent_prompt = self.agent_prompt
             max_iterations = PARAMS["MAX_ITERATIONS_AFTER_EVALUATION"]
-            iteration = 0
 
             while iteration <= max_iterations:
                 iteration += 1
+                self.iteration = iteration
                 self.logger.info(f"Iteration nr. {iteration}", extra={'no_memory': True})
-                self.subtask_executor.execute_subtasks()
+                self.subtask_executor.execute_subtasks(resume_results, resume_index)
+                resume_results, resume_index = {}, 0
 
+                # Close to the budget, this evaluation is the last one: it must give a final answer.
+                budget_degraded = self.run_budget.is_degraded()
                 evaluation_output = self.plan_evaluator.evaluate(
-                    agent_prompt, self.json_plan, iteration, max_iterations, self.execution_logs
+                    agent_prompt, self.json_plan, iteration, max_iterations, self.execution_logs,
+                    final_evaluation=budget_degraded
                 )
 
+                if budget_degraded and not evaluation_output.get("satisfactory", False):
+                    self.logger.warning(
+                        f"💸 Run budget nearly exhausted ({self.run_budget.report()}): no further evaluation iteration.",
+                        extra={'no_memory': True}
+                    )
+                    final = evaluation_output.get("final_answer", "")
+                    final = transform_final_answer(final)
+                    self.clear_checkpoint()
+                    return final
+
                 if iteration < max_iterations + 1:
                     if evaluation_output.get("satisfactory", False):
                         final = evaluation_output.get("final_answer", "")
                         # Transform audio snippet if necessary.
                         final = transform_final_answer(final)
+                        self.plan_generator.remember_plan(self.json_plan)
+                        self.clear_checkpoint()
                         self.logger.info(
                             self.enrich_log(f"✅ Evaluation satisfactory. Final answer: {final}", "add_green_divider"),  
                             extra={'no_memory': True}
@@ -82,16 +226,41 @@ class CodeAgent:
                             )
                             self.json_plan = evaluation_output.get("new_json_plan", {})
                             self.logger.info(f"New JSON plan: {json.dumps(self.json_plan, indent=4)}")
+                            self.iteration = iteration + 1
+                            self.save_checkpoint({}, 0)
                         elif evaluation_output.get("max_iterations_reached", False):
                             self.logger.warning("Max iterations reached without satisfactory evaluation.")
                             final = evaluation_output.get("final_answer", "")
                             final = transform_final_answer(final)
+                            self.clear_checkpoint()
                             return final
                 else:
                     self.logger.warning("🔴 Max iterations reached without satisfactory evaluation.", extra={'no_memory': True})
                     final = evaluation_output.get("final_answer", "")
                     final = transform_final_answer(final)
+                    self.clear_checkpoint()
                     return final 
                     
+        except DeadlineExceeded as e:
+            self.logger.error(self.enrich_log(f"⏰ {e}", "add_red_divider"), extra={'no_memory': True})
         except Exception as e: 
-            self.logger.error("Error running agent:", exc_info=True)  
+            self.logger.error("Error running agent:", exc_info=True)
+        finally:
+            self.run_budget.stop()
+            self.subtask_executor.resource_monitor.close()
+            self.logger.info(
+                self.enrich_log(
+                    f"⏱️ Subtask resource usage:\n{self.subtask_executor.resource_monitor.summary()}",
+                    "add_green_divider"
+                ),
+                extra={'no_memory': True}
+            )
+            self.logger.info(
+                f"📊 Model token usage since process start (cached prompt tokens ratio: "
+                f"{usage_tracker.cached_token_ratio():.1%}):\n{usage_tracker.report()}\n"
+                f"Cascade escalations per call site:\n{cascade_stats.report() or 'none'}\n"
+                f"Hedged requests per call site:\n{hedge_stats.report() or 'none'}\n"
+                f"JSON plan cache: {plan_cache_stats.report()}\n"
+                f"Run budget: {self.run_budget.report()}",
+                extra={'no_memory': True}
+            )  
@@ -56,6 +56,7 @@ def call_helper_model(previous_output):
 This tool combines the helper model with web search functionality to provide more comprehensive and up-to-date information. 
 Don't create loops, just use the LLM to elaborate the output for a single step.""",
         "use_exactly_code_example": True,
+        "cache": {"ttl": 3600},
         "code_example": """
 def call_helper_model_web_search(previous_output):
     from models.models import call_model
@@ -87,6 +88,7 @@ def call_helper_model_web_search(previous_output):
         "lib_names": ["tools.rag.simple_rag.ingest"],
         "instructions": "This is a simple RAG ingestion tool. Ingest the text into the vector database.",
         "use_exactly_code_example": True,
+        "invocation_inputs": ["text"],
         "code_example": """
 def ingest_rag_db(previous_output):
     from tools.rag.simple_rag.ingest import ingest_texts
@@ -108,6 +110,7 @@ def ingest_rag_db(previous_output):
         "instructions": ("This is a simple RAG extraction tool. Extract only the information and provide a straightforward response "
                          "with the acquired information. Do not create additional tools unless necessary. Retrieve the text from the vector database."),
         "use_exactly_code_example": True,
+        "invocation_inputs": ["query"],
         "code_example": """
 def retrieve_rag_db(previous_output):
     try:
@@ -128,6 +131,7 @@ def retrieve_rag_db(previous_output):
         "lib_names": ["tools.rag.hybrid_vector_graph_rag.engine"],
         "instructions": "This is an Hybrid Vector Graph RAG ingestion tool. Ingest the text into the vector and graph database.",
         "use_exactly_code_example": True,
+        "invocation_inputs": ["text"],
         "code_example": """
 def ingest_hybrid_vector_graph_rag_db(previous_output):
     from tools.rag.hybrid_vector_graph_rag.engine import HybridVectorGraphRag
@@ -151,6 +155,7 @@ def ingest_hybrid_vector_graph_rag_db(previous_output):
                          "with the acquired information. Do not create additional tools unless necessary. Retrieve the text from the vector database. "
                          "Activate this tool when the client explicitly requests to retrieve the text from a database."),
         "use_exactly_code_example": True,
+        "invocation_inputs": ["query"],
         "code_example": """
 def retrieve_hybrid_vector_graph_rag_db(previous_output):
     from tools.rag.hybrid_vector_graph_rag.engine import HybridVectorGraphRag
@@ -172,6 +177,7 @@ def retrieve_hybrid_vector_graph_rag_db(previous_output):
     "lib_names": ["tools.rag.llama_index.ingest"],
     "instructions": "This tool ingests text into the LlamaIndex vector database.",
     "use_exactly_code_example": True,
+    "invocation_inputs": ["text"],
     "code_example": """
 def ingest_llama_index(previous_output): 
     from tools.rag.llama_index.ingest import ingest_texts
@@ -195,6 +201,7 @@ def ingest_llama_index(previous_output):
     "lib_names": ["tools.rag.llama_index.retrieve"],
     "instructions": ("This tool retrieves documents from a persisted LlamaIndex index."),
     "use_exactly_code_example": True,
+    "invocation_inputs": ["query"],
     "code_example": """
 def retrieve_llama_index(previous_output):
     from tools.rag.llama_index.retrieve import retrieve_documents
@@ -217,6 +224,7 @@ def retrieve_llama_index(previous_output):
     "lib_names": ["tools.rag.llama_index_context_window.retrieve"],
     "instructions": ("This tool retrieves documents from a persisted LlamaIndex index with context window."),
     "use_exactly_code_example": True,
+    "invocation_inputs": ["query"],
     "code_example": """
 def retrieve_llama_index_context_window(previous_output):
     from tools.rag.llama_index_context_window.retrieve import retrieve_documents
@@ -239,6 +247,7 @@ def retrieve_llama_index_context_window(previous_output):
     "lib_names": ["tools.rag.hyde_rag.retrieve"],
     "instructions": ("This tool retrieves documents from vector database using the hyde rag technique."),
     "use_exactly_code_example": True,
+    "invocation_inputs": ["query"],
     "code_example": """
 def retrieve_hyde_rag(previous_output): 
     from tools.rag.hyde_rag.retrieve import retrieve_hyde_documents
@@ -261,6 +270,7 @@ def retrieve_hyde_rag(previous_output):
     "lib_names": ["tools.rag.adaptive_rag.retrieve"],
     "instructions": ("This tool retrieves documents from vector database using the adaptive rag technique."),
     "use_exactly_code_example": True,
+    "invocation_inputs": ["query"],
     "code_example": """
 def retrieve_adaptive_rag(previous_output): 
     from tools.rag.adaptive_rag.retrieve import AdaptiveRAG
@@ -283,6 +293,7 @@ def retrieve_adaptive_rag(previous_output):
     "lib_names": ["tools.rag.rl_meta_rag.rl_meta_rag_retrieve"],
     "instructions": ("This tool retrieves documents from vector database using the rl meta rag technique."),
     "use_exactly_code_example": True,
+    "invocation_inputs": ["query"],
     "code_example": """
 def retrieve_rl_meta_rag(previous_output): 
     from tools.rag.rl_meta_rag.rl_meta_rag_retrieve import RlMetaRag
@@ -306,6 +317,8 @@ def retrieve_rl_meta_rag(previous_output):
         "instructions": ("A library to scrape the web. Never use the regex or other specific method to extract the data, always output the whole page. "
                          "The data must be extracted or summarized from the page using the models library. Never perform searches in a loop, if you need to make more research, create a new subtask."),
         "use_exactly_code_example": True,
+        "invocation_inputs": ["query"],
+        "cache": {"ttl": 86400},
         "code_example": """
 def web_search(previous_output, max_results=3, max_chars=10000):
     from duckduckgo_search import DDGS
@@ -371,6 +384,7 @@ def web_search(previous_output, max_results=3, max_chars=10000):
                          "Input prompt for browser navigation: go to Wikipedia, search for Elon Musk, extract all the information from the page, and analyze with your vision capability his image.\n"
                          "**Never forget important instructions on navigation and data extraction.**"),
         "use_exactly_code_example": True,
+        "invocation_inputs": ["prompt"],
         "code_example": """
 def browser_navigation_surf_ai(previous_output):
     import asyncio
@@ -399,6 +413,7 @@ def browser_navigation_surf_ai(previous_output):
                          "Input prompt for browser navigation: go to Wikipedia, search for Elon Musk, extract all the information from the page, and analyze with your vision capability his image.\n"
                          "**Never forget important instructions on navigation and data extraction.**"),
         "use_exactly_code_example": True,
+        "invocation_inputs": ["prompt"],
         "code_example": """
 def browser_navigation_cua(previous_output):   
     import asyncio
@@ -422,6 +437,7 @@ def browser_navigation_cua(previous_output):
         "lib_names": ["smtplib", "email"],
         "instructions": "Send an email to the user with the given email, subject and html content.",
         "use_exactly_code_example": True,
+        "invocation_inputs": ["email", "subject", "html"],
         "code_example": """
 def send_email(previous_output) -> dict:
     import smtplib
@@ -1,6 +1,9 @@
 import ast
 import builtins
 
+# Names put in the namespace the subtask code is executed in, usable without being defined.
+NAMESPACE_NAMES = ("logger", "session_id", "socketio", "get_langchain_tool")
+
 SAFE_BUILTIN_MODULES = [
     "math",
     "cmath",
@@ -237,6 +240,143 @@ class UpdatedDictGetVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
 
+class UpdatedDictSetVisitor(ast.NodeVisitor):
+    """
+    Collects the keys a function writes to its output dictionary, i.e.:
+        updated_dict["key"] = ...
+        updated_dict.update({"key": ...}) / updated_dict.update(key=...)
+        updated_dict.setdefault("key", ...)
+        updated_dict = {"key": ...}
+        return {"key": ...}
+    If a key cannot be resolved statically (non-literal keys, dict unpacking,
+    returning something other than updated_dict), the output is marked as open.
+    """
+    def __init__(self):
+        self.written_keys = set()
+        self.copies_previous_output = False
+        self.is_open = False
+
+    def _add_dict_literal(self, node):
+        for key in node.keys:
+            if isinstance(key, ast.Constant) and isinstance(key.value, str):
+                self.written_keys.add(key.value)
+            else:
+                # None key means '**other' unpacking.
+                self.is_open = True
+
+    def visit_Assign(self, node):
+        for target in node.targets:
+            if isinstance(target, ast.Subscript) and isinstance(target.value, ast.Name) and target.value.id == "updated_dict":
+                key = target.slice
+                if isinstance(key, ast.Constant) and isinstance(key.value, str):
+                    self.written_keys.add(key.value)
+                else:
+                    self.is_open = True
+            elif isinstance(target, ast.Name) and target.id == "updated_dict":
+                value = node.value
+                if isinstance(value, ast.Dict):
+                    self._add_dict_literal(value)
+                elif (isinstance(value, ast.Call) and isinstance(value.func, ast.Attribute)
+                      and value.func.attr == "copy" and isinstance(value.func.value, ast.Name)
+                      and value.func.value.id == "previous_output"):
+                    self.copies_previous_output = True
+                else:
+                    self.is_open = True
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if (isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name)
+                and node.func.value.id == "updated_dict"):
+            if node.func.attr == "update":
+                for arg in node.args:
+                    if isinstance(arg, ast.Dict):
+                        self._add_dict_literal(arg)
+                    else:
+                        self.is_open = True
+                for keyword in node.keywords:
+                    if keyword.arg is None:
+                        self.is_open = True
+                    else:
+                        self.written_keys.add(keyword.arg)
+            elif node.func.attr == "setdefault" and node.args:
+                key = node.args[0]
+                if isinstance(key, ast.Constant) and isinstance(key.value, str):
+                    self.written_keys.add(key.value)
+                else:
+                    self.is_open = True
+        self.generic_visit(node)
+
+    def visit_Return(self, node):
+        value = node.value
+        if isinstance(value, ast.Dict):
+            self._add_dict_literal(value)
+        elif isinstance(value, ast.Name) and value.id in ("updated_dict", "previous_output"):
+            pass
+        elif value is not None and not (isinstance(value, ast.Constant) and value.value is None):
+            self.is_open = True
+        self.generic_visit(node)
+
+
+class UpdatedDictReadVisitor:
+    """
+    Collects the keys a function reads from its input dictionary (previous_output, or its
+    updated_dict copy), i.e.:
+        updated_dict.get("key", ...) / .pop("key", ...) / .setdefault("key", ...)
+        updated_dict["key"]
+        "key" in updated_dict
+    Copying, writing a literal key and returning the dictionary are not reads. Any other use
+    (non-literal keys, iteration, passing the dictionary to a call...) may read any key, so the
+    input is marked as open.
+    """
+    DICT_NAMES = ("updated_dict", "previous_output")
+    READ_METHODS = ("get", "pop", "setdefault")
+
+    def __init__(self):
+        self.read_keys = set()
+        self.is_open = False
+
+    @staticmethod
+    def _literal_key(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            return node.value
+        return None
+
+    def visit(self, node):
+        parents = {}
+        for parent in ast.walk(node):
+            for child in ast.iter_child_nodes(parent):
+                parents[child] = parent
+
+        for name in ast.walk(node):
+            if not (isinstance(name, ast.Name) and name.id in self.DICT_NAMES) or isinstance(name.ctx, ast.Store):
+                continue
+            parent = parents.get(name)
+            if isinstance(parent, ast.Attribute) and isinstance(parents.get(parent), ast.Call):
+                call = parents[parent]
+                if parent.attr in ("copy", "update") and call.func is parent:
+                    continue
+                if parent.attr in self.READ_METHODS and call.func is parent and call.args:
+                    key = self._literal_key(call.args[0])
+                    if key is not None:
+                        self.read_keys.add(key)
+                        continue
+            elif isinstance(parent, ast.Subscript) and parent.value is name:
+                key = self._literal_key(parent.slice)
+                if key is not None:
+                    if isinstance(parent.ctx, ast.Load):
+                        self.read_keys.add(key)
+                    continue
+            elif (isinstance(parent, ast.Compare) and len(parent.ops) == 1
+                  and isinstance(parent.ops[0], (ast.In, ast.NotIn)) and parent.comparators[0] is name):
+                key = self._literal_key(parent.left)
+                if key is not None:
+                    self.read_keys.add(key)
+                    continue
+            elif isinstance(parent, ast.Return):
+                continue
+            self.is_open = True
+
+
 class FunctionNestingVisitor(ast.NodeVisitor):
     """
     Validates that function nesting is no deeper than one level.
@@ -291,6 +431,83 @@ class DangerousCallVisitor(ast.NodeVisitor):
         return ""  
       
   
+# -------------------------------
+# Plan-wide dataflow analysis
+# -------------------------------
+
+class PlanDataflowValidator:
+    """
+    Statically follows the cumulative updated_dict through the whole JSON plan, before any
+    subtask runs. For every subtask it computes the keys available in previous_output
+    (following input_from_subtask) and the keys it writes, then checks that the
+    updated_dict.get(...) keys of each subtask are produced upstream.
+    """
+    def __init__(self, subtasks: list):
+        self.subtasks = subtasks
+
+    @staticmethod
+    def _find_function_def(code_string: str):
+        try:
+            tree = ast.parse(code_string or "")
+        except SyntaxError:
+            return None
+        for node in ast.walk(tree):
+            if isinstance(node, ast.FunctionDef):
+                return node
+        return None
+
+    def analyze(self) -> dict:
+        """
+        :return: A dictionary {subtask_name: [errors]} containing only the subtasks with errors.
+        """
+        output_keys = {}  # subtask_name -> set of keys, or None if the output cannot be resolved statically
+        errors = {}
+
+        for index, subtask in enumerate(self.subtasks):
+            subtask_name = subtask.get("subtask_name", "")
+            subtask_errors = []
+            function_def = self._find_function_def(subtask.get("code", ""))
+
+            if index == 0:
+                available_keys = set()
+            else:
+                input_from = subtask.get("input_from_subtask", "")
+                if input_from not in output_keys:
+                    subtask_errors.append(
+                        f"input_from_subtask '{input_from}' does not refer to a subtask executed before '{subtask_name}'; "
+                        f"previous_output will be empty."
+                    )
+                    available_keys = set()
+                else:
+                    available_keys = output_keys[input_from]
+
+            if function_def is None:
+                # Syntax errors are reported by FunctionValidator.
+                output_keys[subtask_name] = None
+            else:
+                if index > 0 and available_keys is not None:
+                    get_visitor = UpdatedDictGetVisitor(available_keys)
+                    get_visitor.visit(function_def)
+                    for error in get_visitor.errors:
+                        subtask_errors.append(
+                            f"{error} Keys produced upstream of '{subtask_name}': {sorted(available_keys)}."
+                        )
+
+                set_visitor = UpdatedDictSetVisitor()
+                set_visitor.visit(function_def)
+                if set_visitor.is_open or (set_visitor.copies_previous_output and available_keys is None):
+                    output_keys[subtask_name] = None
+                elif set_visitor.copies_previous_output:
+                    output_keys[subtask_name] = available_keys | set_visitor.written_keys
+                else:
+                    output_keys[subtask_name] = set(set_visitor.written_keys)
+
+            if subtask_errors:
+                errors[subtask_name] = subtask_errors
+
+        return errors
+
+
 # -------------------------------
 # Main FunctionValidator Class  
 # -------------------------------
@@ -415,7 +632,7 @@ class FunctionValidator:
                         for alias in node.names:
                             allowed_names.add(alias.asname if alias.asname else alias.name)
 
-                allowed_names.update({"error", "logger", "session_id", "socketio"})
+                allowed_names.update({"error", *NAMESPACE_NAMES})
  
                 undefined_visitor = UndefinedNameVisitor(allowed_names)  
                 undefined_visitor.visit(function_def) 
@@ -0,0 +1,58 @@
+import json
+import threading
+from langchain_community.agent_toolkits.load_tools import load_tools
+
+
+class LangChainToolRegistry:
+    """
+    Process-level registry of loaded LangChain tool instances. Tools are loaded once by
+    generate_tools (to read their metadata) and the same instances are then used by the
+    subtask code, instead of re-initializing their clients on every subtask invocation.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.instances = {}
+
+    @staticmethod
+    def fingerprint(additional_parameters) -> str:
+        return json.dumps(additional_parameters or {}, sort_keys=True, default=str)
+
+    def load(self, langchain_tool_name, additional_parameters=None):
+        """
+        Returns the registered instance of the tool, loading it (again) only if it is not
+        registered yet or its additional parameters changed.
+
+        :return: The LangChain tool instance, or None if load_tools returned nothing.
+        """
+        fingerprint = self.fingerprint(additional_parameters)
+        with self.lock:
+            registered = self.instances.get(langchain_tool_name)
+            if registered and registered[0] == fingerprint:
+                return registered[1]
+            loaded_tools = load_tools([langchain_tool_name], **(additional_parameters or {}))
+            if not loaded_tools:
+                return None
+            self.instances[langchain_tool_name] = (fingerprint, loaded_tools[0])
+            return loaded_tools[0]
+
+    def get(self, langchain_tool_name):
+        """
+        Returns the registered instance of the tool, as used by the subtask code.
+
+        :raises KeyError: If the tool was not loaded by generate_tools in this process.
+        """
+        with self.lock:
+            registered = self.instances.get(langchain_tool_name)
+        if registered is None:
+            raise KeyError(f"LangChain tool '{langchain_tool_name}' is not loaded in this process.")
+        return registered[1]
+
+
+langchain_tool_registry = LangChainToolRegistry()
+
+
+def get_langchain_tool(langchain_tool_name):
+    """
+    Exposed to the subtask code to retrieve a shared LangChain tool instance.
+    """
+    return langchain_tool_registry.get(langchain_tool_name)
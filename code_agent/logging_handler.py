@@ -22,10 +22,19 @@ class ConsoleFilter(logging.Filter):
 
 class LoggingConfigurator:
     @staticmethod
-    def configure_logger(execution_logs: List[str]) -> logging.Logger:
+    def configure_logger(execution_logs: List[str], name: str = None) -> logging.Logger:
+        """
+        :param name: Optional suffix of the logger name (e.g. a session id), so that concurrent
+                     runs each log into their own execution_logs. Such a logger is private to the run.
+        """
 
         logging.basicConfig(level=logging.DEBUG)
-        logger = logging.getLogger(__name__)
+        if name:
+            # Not registered in the logging manager, so that the logger and its execution_logs
+            # are released with the run instead of being kept for the life of the process.
+            logger = logging.Logger(f"{__name__}.{name}", level=logging.DEBUG)
+        else:
+            logger = logging.getLogger(__name__)
         
         for logger_name in ["httpcore", "urllib3", "geopy", "llama_index", "fsspec", "httpx"]:
             logging.getLogger(logger_name).setLevel(logging.WARNING)
@@ -1,4 +1,31 @@
 from string import Template
+from textwrap import indent
+
+
+# Rules for the code of a subtask, shared by the planning and the regeneration prompts.
+SUBTASK_CODE_RULES = """- Function name must be the same as subtask_name.
+- The first subtask must not have previous_output as parameter, nor the only subtask of a plan with a single subtask.
+- Subsequent subtasks must define `def subtask_name(previous_output)`, where `previous_output` is the *entire dictionary* returned by the prior subtask, and start with `updated_dict = previous_output.copy()`.
+- Each function should merge new results into updated_dict, returning the updated dictionary so that all keys persist.
+- IMPORTANT: If use_exactly_code_example is True for the chosen tool, use EXACTLY the code_example as is and don't change it, otherwise use it as a guide to write the code.
+- Use only libraries from the specified tools. Never use relative imports.
+- Always declare a variable before using it. The only variables no need to declare are logger, session_id, socketio and get_langchain_tool because they are from the namespace.
+- Properly handle errors with try/except blocks and log them with logger.error. Log successful executions with logger.info("<executionLog>...</executionLog>") and data for the final answer with logger.info("<finalAnswerDataLog>...</finalAnswerDataLog>").
+- Add function type hints and docstrings for each function with proper escaping.
+- Ensure that boolean values in Python code are represented exactly as 'True' and 'False', not 'true' or 'false'.
+- Never use None in quotes "None", apply directly as None.
+- When performing arithmetic operations on numbers, ensure that they are not strings and always apply the conversion from string to number.
+- Indentation must be consistent.
+- Triple-quoted strings (docstrings) or other strings must be **properly escaped** so they do not break the JSON structure.
+- Only allow one level of function nesting: one primary function per subtask with optional helper functions inside, but no deeper nesting.
+- Never use async functions.
+- Never use the same name for a variable and a function.
+- Never use class definitions.
+- Never invent default parameters, only previous_output is allowed. The only exception is if the code_example has default parameters, then use them.
+- Never use API calls with third party endpoints generated by you, unless explicitly indicated in the code example.
+- Never use varargs or kwargs.
+- Never use keyword-only arguments without a default value.
+- Never use dangerous functions such as eval, exec, compile, __import__, or shell/OS execution functions like os.system, os.popen, subprocess.call, subprocess.Popen, or deserialization functions like pickle.loads."""
 
 
 CODE_SYSTEM_PROMPT = Template("""
@@ -9,7 +36,7 @@ Your goal is to:
 2. Generate a main task thought, a brief explanation of the reasoning behind the subtask or any considerations in implementing it—particularly why you chose these libraries and how you plan to use them.
 3. Break down the 'main_task' into a logical sequence of subtasks.
 4. **Tool Selection Before Coding Each Subtask:** 
-   - Carefully examine the available tools: <tools> $tools </tools>, which contains all the tools you are permitted to use.
+   - Carefully examine the available tools listed in the <tools> section at the end of this prompt, which contains all the tools you are permitted to use.
    - Decide which tool (or tools) from this list are required to accomplish the subtask.
    - Always select the tool while ensuring that adjacent tasks handle compatible data types. For example, if the current task outputs a string, avoid choosing a tool for the subsequent task that expects numeric input (e.g., one that uses numpy), as numpy only processes numerical values.
    - When analyzing a subtask's output that is an unstructured string, do not employ simple parsing or substring extraction. Instead, always utilize a helper_model tool to analyze and extract the necessary information or perform a summary.
@@ -35,34 +62,13 @@ Your goal is to:
     - **imports**: A list of Python libraries chosen *only* from tools under the key lib_names and actually needed for this subtask.
     - **thought**: A brief explanation of the reasoning behind this subtask or any considerations in implementing it—particularly why you chose these libraries and how you plan to use them.
     - **code**: The Python function implementing the subtask.  
-      - **The first subtask** should not have previous_output as parameter. 
-      - **Subsequent subtasks** must define `def subtask_name(previous_output)`, where `previous_output` is the *entire dictionary* returned by the prior tool. 
-        Use always updated_dict = previous_output.copy() at the beginning of the function to copy the previous dictionary, so you can update it with the new data.
-      - IMPORTANT: If use_exactly_code_example is True, use EXACTLY the code_example as is and don't change it, otherwise use it as a guide to write the code.
-      - If the json plan has only a subtask, dont put previous_output as parameter.
-      - Function name must be the same as subtask_name.
-      - Always declare a variable before using it.
-      - The only variables no need to declare are session_id and socketio because they are from the namespace.
-      - Each function should merge new results into the existing dictionary, returning the updated dictionary so that all keys persist.  
-      - Use only libraries from the specified tools.  
-      - Properly handle errors with try/except blocks and log messages using the indicated logging format.
-      - Add function type hints and docstrings for each function with proper escaping.
-      - Ensure that boolean values in Python code are represented exactly as 'True' and 'False', not 'true' or 'false'.
-      - Indentation must be consistent.
-      - Triple-quoted strings (docstrings) or other strings must be **properly escaped** so they do not break the JSON structure.
-      - never use None in quotes "None", apply directly as None  
-      - When performing arithmetic operations on numbers, ensure that they are not strings and always apply the conversion from string to number.
-      - Only allow one level of function nesting: one primary function per subtask with optional helper functions inside, but no deeper nesting.
-      - Never put previous_output as parameter if we have only one subtask.            
-      - Never use async functions. 
-      - Never use the same name for a variable and a function.
-      - Never use class definitions. 
-      - Never invent default parameters, only previous_output is allowed. The only exception is if the code_example has default parameters, then use them.
-      - Never use API calls with third party endpoints generated by you, unless explicitly indicated in the code example.
-      - Never use varargs or kwargs.
-      - Never use keyword-only arguments without a default value.
-      - Never use relative imports.
-      - Never use dangerous functions such as eval, exec, compile, __import__, or shell/OS execution functions like os.system, os.popen, subprocess.call, subprocess.Popen, or deserialization functions like pickle.loads.
+""" + indent(SUBTASK_CODE_RULES, "      ") + """
+    - **library_function_id** (optional, replaces code): The <proven_functions> section lists functions that already validated and ran successfully for similar subtasks. 
+      If one of them does exactly what the subtask needs, with the same input keys and without changing any value in its code, set library_function_id to its id instead of writing the code (it is renamed to subtask_name). 
+      If it needs changes, write the code using it as a proven starting point.
+    - **tool_invocation** (optional, replaces imports, thought and code): If the chosen tool has "invocation_inputs" and its code_example can be used exactly as is, don't write the code. 
+      Add instead "tool_invocation": {"tool_name": "<tool_name>", "inputs": {"<invocation input>": <value known now>}, "input_mapping": {"<invocation input>": "<key of previous_output>"}}.
+      Every invocation input must be set either in inputs (e.g. a search query taken from the user request) or in input_mapping (a value produced by a previous subtask). The tool's code_example is then executed directly.
 
                             
     **Guidelines for Handling Dictionary-Based Input and Output**:
@@ -144,6 +150,7 @@ def example_tool2(previous_output: dict) -> dict:
     - **lib_names**: An array of the names of the libraries to import for the function.
     - **instructions**: The instructions to use the library.
     - **code_example**: An example of how to use the library.
+    - **invocation_inputs**: If present, the keys of previous_output read by the code_example; the tool can be used with tool_invocation instead of code.
                               
 
 Additional requirement:
@@ -367,42 +374,85 @@ def search_vendor_info(previous_output):
 ---
 
 **Now, produce the JSON describing the subtasks for the main task you want to solve, following these strict guidelines and ensuring the code is valid, properly escaped, and free of syntax errors.** 
+
+<tools> $tools </tools>
+
+<proven_functions> $proven_functions </proven_functions>
+
 Estract the main task to solve from the conversation history:
 $conversation_history
-                              
 """)
 
 
-REGENERATE_SUBTASK_PROMPT = Template("""
-<agentInitialPrompt>
-$agent_initial_prompt
-</agentInitialPrompt>
+ADAPT_PLAN_PROMPT = Template("""
+You are adapting a JSON plan that already solved a very similar request successfully. Each subtask of the plan is a standalone Python function.
 
-Below is the conversation history that led to the current JSON plan:
-$conversation_history
+Rules:
+- Change only parameter values so that the plan solves the new request: literal strings and numbers in the code (search queries, locations, email addresses, subjects, amounts...), the values in tool_invocation inputs, and the main_task text.
+- Keep everything else identical: subtask names, order, chosen_tool, input_from_subtask, imports, tool_invocation input_mapping and the logic of the code.
+- If the new request cannot be solved by changing only parameter values, return {"reusable": false}.
+
+Output **only** a single JSON object: the complete adapted plan with the keys "main_task" and "subtasks", or {"reusable": false}.
 
-The following JSON plan represents the current set of subtasks:
+Previous plan:
 $json_plan
 
-The subtask_to_regenerate that generated errors is: $subtask_name
-And the errors are: $subtask_errors
+New request:
+$request
+""")
+
+
+# Added to EVALUATION_AGENT_PROMPT when the run budget allows no further iteration.
+FINAL_EVALUATION_INSTRUCTION = (
+    "This is the final evaluation: the run budget allows no further iteration. If the output is not satisfactory, "
+    "return max_iterations_reached as True with a final_answer built from the available data, and no new_json_plan."
+)
+
+
+SUMMARIZE_HISTORY_PROMPT = Template("""
+You maintain a running summary of the older part of a conversation between a user and an AI agent that solves tasks with Python tools.
+
+Rules:
+- Merge the new messages into the current summary and return the updated summary only, without commentary.
+- Keep every fact the agent may need later: the user's goals and preferences, names, numbers, dates, email addresses, URLs, file names, decisions taken and results already delivered.
+- Drop greetings, repetitions and formatting. Never exceed 300 words.
+
+Current summary:
+$summary
 
-Your task is to analyze these errors and produce a corrected version of the **subtask_to_regenerate**. Please output **only** a single JSON object with the following top-level keys:
+New messages to merge:
+$messages
+""")
+
+
+REGENERATE_SUBTASK_PROMPT = Template("""
+You are fixing a single subtask of a JSON plan in which each subtask is a standalone Python function.
+The output of each subtask is a cumulative dictionary that is fed to the next subtask as `previous_output`.
+
+**Rules for the subtask code:**
+""" + SUBTASK_CODE_RULES + """
+- The subtask is at position $subtask_position: read only keys that are present in the upstream output schema below, and import only the allowed libraries.
+
+**Output format:**
+Output **only** a single JSON object with the following top-level keys:
 - "reasoning": A detailed explanation of the corrective steps taken and why the new subtask was generated in the chosen manner.
-- "corrected_subtask": A JSON object representing the corrected subtask_to_regenerate. This JSON object must follow the exact format as specified in the original instructions, including the following fields:
-    - "subtask_name"
-    - "chosen_tool"
-    - "input_from_subtask"
-    - "description"
-    - "imports"
-    - "thought"
-    - "code"
-
-**Requirements:**
-- The new subtask must directly address the issues highlighted in `$subtask_errors`.
-- Ensure that the Python code in the "code" field is valid, adheres to proper error handling, logging conventions, and uses only the libraries allowed (as detailed in the original prompt).
-- Maintain consistency with the structure and style defined in the original `agentInitialPrompt`.
-- Output **only** the JSON object corresponding to the corrected subtask along with the overall reasoning, and nothing else.
+- "corrected_subtask": A JSON object representing the corrected subtask with the fields "subtask_name", "chosen_tool", "input_from_subtask", "description", "imports", "thought" and "code". Keep the same subtask_name.
+
+Main task of the plan: $main_task
+
+Subtask to regenerate (position $subtask_position of $total_subtasks):
+$subtask
+
+Upstream output schema (keys of previous_output with their types and a short preview):
+$upstream_schema
+
+Allowed libraries: $allowed_lib_names
+
+Relevant tools:
+$tools
+
+The errors to fix are:
+$subtask_errors
 """)
 
 
@@ -451,7 +501,7 @@ You are an evaluation assistant tasked with analyzing the output logs of an AI c
      - Modify the code of an existing subtask
 
 5. ***Maximun iterations reached***:
-   - You are evaluating the iteration nr $iteration of the json plan. If it has reached the maximum number of iterations $max_iterations, return max_iterations_reached as True and explain the context.
+   - You are evaluating the iteration nr given in **Iteration** below. If it has reached the maximum number of iterations, return max_iterations_reached as True and explain the context.
 
 Example output JSON with satisfactory is False:
 
@@ -484,6 +534,10 @@ Example of a max iterations reached:
 Original prompt:
 $original_prompt
 
+Iteration:
+You are evaluating the iteration nr $iteration of the json plan, the maximum number of iterations is $max_iterations.
+$final_evaluation_instruction
+
 Original json plan:
 $original_json_plan
 
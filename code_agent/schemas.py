@@ -0,0 +1,70 @@
+"""
+JSON schemas of the model outputs parsed by the agent, sent as structured output requests
+(see call_model's response_schema). They are not strict: optional keys described by the
+prompts stay allowed, and the parser remains tolerant of models that ignore the schema.
+"""
+
+SUBTASK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "subtask_name": {"type": "string"},
+        "chosen_tool": {"type": "string"},
+        "input_from_subtask": {"type": "string"},
+        "description": {"type": "string"},
+        "imports": {"type": "array", "items": {"type": "string"}},
+        "thought": {"type": "string"},
+        "code": {"type": "string"},
+        "library_function_id": {"type": "string"},
+        "tool_invocation": {
+            "type": "object",
+            "properties": {
+                "tool_name": {"type": "string"},
+                "inputs": {"type": "object"},
+                "input_mapping": {"type": "object", "additionalProperties": {"type": "string"}}
+            },
+            "required": ["tool_name"]
+        }
+    },
+    "required": ["subtask_name", "input_from_subtask", "description"]
+}
+
+JSON_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "main_task": {"type": "string"},
+        "main_task_thought": {"type": "string"},
+        "subtasks": {"type": "array", "items": SUBTASK_SCHEMA}
+    },
+    "required": ["main_task", "subtasks"]
+}
+
+JSON_PLAN_RESPONSE_SCHEMA = {"name": "json_plan", "schema": JSON_PLAN_SCHEMA, "strict": False}
+
+EVALUATION_RESPONSE_SCHEMA = {
+    "name": "plan_evaluation",
+    "strict": False,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "satisfactory": {"type": "boolean"},
+            "max_iterations_reached": {"type": "boolean"},
+            "thoughts": {"type": "string"},
+            "final_answer": {"type": "string"},
+            "new_json_plan": JSON_PLAN_SCHEMA
+        },
+        "required": ["satisfactory", "thoughts"]
+    }
+}
+
+REGENERATION_RESPONSE_SCHEMA = {
+    "name": "subtask_regeneration",
+    "strict": False,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "reasoning": {"type": "string"},
+            "corrected_subtask": dict(SUBTASK_SCHEMA, required=["subtask_name", "input_from_subtask", "description", "imports", "code"])
+        },
+        "required": ["reasoning", "corrected_subtask"]
+    }
+}
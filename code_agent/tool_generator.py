@@ -2,13 +2,25 @@ import copy
 import os
 import logging
 from string import Template
-from langchain_community.agent_toolkits.load_tools import load_tools
+from .langchain_tool_registry import langchain_tool_registry
 from .default_tools import DEFAULT_TOOLS, TOOLS_ACTIVATION
 from params import PARAMS
 
 
 logger = logging.getLogger(__name__)
 
+# Tool variables holding credentials, substituted into the code examples of the tools.
+SECRET_VARIABLES = ("GMAILUSER", "PASSGMAILAPP")
+
+
+def contains_secret(text) -> bool:
+    """
+    Whether the text holds the value of one of the SECRET_VARIABLES, e.g. tool code that must not be persisted.
+    """
+    text = str(text)
+    return any(value and value in text for value in (os.getenv(name, "") for name in SECRET_VARIABLES))
+
+
 def substitute_variables_in_value(value, variables):
     """Helper: substitutes variables in a string or list of strings."""
     if isinstance(value, str):
@@ -40,7 +52,8 @@ def generate_tools(user_tools, use_default_tools):
     Processes the list of tool dictionaries:
       - For non-LangChain tools, applies dynamic variable substitution using Python's string.Template.
       - For tools where "tool_name" is "load_langchain_tool", loads the LangChain tool using its
-        additional parameters and converts it into the default schema using LangChainToolConverter.
+        additional parameters into the shared registry and converts it into the default schema
+        using LangChainToolConverter.
     
     Args:
         tools (list): The list of tool dictionaries.
@@ -56,8 +69,7 @@ def generate_tools(user_tools, use_default_tools):
         "TOOL_HELPER_MODEL_WEB_SEARCH": PARAMS["TOOL_HELPER_MODEL_WEB_SEARCH"],
         "JSON_PLAN_MODEL": PARAMS["JSON_PLAN_MODEL"],
         "EVALUATION_MODEL": PARAMS["EVALUATION_MODEL"],
-        "GMAILUSER": os.getenv("GMAILUSER", ""),
-        "PASSGMAILAPP": os.getenv("PASSGMAILAPP", "")
+        **{name: os.getenv(name, "") for name in SECRET_VARIABLES}
     }
     
     for tool in tools:
@@ -65,9 +77,8 @@ def generate_tools(user_tools, use_default_tools):
             langchain_tool_name = tool.get("langchain_tool_name")
             additional_parameters = tool.get("additional_parameters", {})
             try:
-                loaded_tools = load_tools([langchain_tool_name], **additional_parameters)
-                if loaded_tools:
-                    langchain_tool_instance = loaded_tools[0]
+                langchain_tool_instance = langchain_tool_registry.load(langchain_tool_name, additional_parameters)
+                if langchain_tool_instance is not None:
                     converted_tool = LangChainToolConverter.from_langchain_tool(langchain_tool_name, langchain_tool_instance, additional_parameters)
                     updated_tools.append(converted_tool)
                 else:
@@ -128,7 +139,7 @@ class LangChainToolConverter:
 
         return {
             "tool_name": tool_name,
-            "lib_names": ["langchain_community.agent_toolkits.load_tools"],
+            "lib_names": [],
             "instructions": instructions,
             "use_exactly_code_example": True,
             "code_example": code_example
@@ -136,24 +147,19 @@ class LangChainToolConverter:
 
     @staticmethod
     def generate_code_example(langchain_tool_name: str, inputs: dict, output_type: str, tool_name: str, additional_parameters: dict) -> str:
-        additional_params_kwargs = ", ".join(
-            f'{key}="{value}"' if isinstance(value, str) else f"{key}={value}"
-            for key, value in additional_parameters.items()
-        )
         expected_inputs_comment = "\n".join(
             [f"    #   {key}: {val.get('description', 'No description provided')}" for key, val in inputs.items()]
         )
         code_example = f'''
 def {tool_name}(previous_output) -> dict:
-    from langchain_community.agent_toolkits.load_tools import load_tools
     try:
         updated_dict = previous_output.copy()
         # Expected inputs:
 {expected_inputs_comment}
         # Dynamically build the tool input based on expected inputs and the updated_dict
         tool_input = "<construct the tool input from updated_dict based on the expected inputs>"
-        # Load the tool with the provided additional parameters as kwargs
-        tool = load_tools(['{langchain_tool_name}'], {additional_params_kwargs})[0]
+        # Get the shared tool instance, already loaded with its additional parameters
+        tool = get_langchain_tool('{langchain_tool_name}')
         # output type is {output_type}
         output = tool.run(tool_input)
         updated_dict["{tool_name}_output"] = output
@@ -53,3 +53,22 @@ def sanitize_gpt_response(response_str: str) -> str:
     return response_str.strip()
 
 
+def estimate_tokens(text) -> int:
+    """
+    Rough token count of a prompt (about 4 characters per token for English text and code).
+    """
+    if not isinstance(text, str):
+        text = str(text)
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "head") -> str:
+    """
+    Truncates the text to approximately max_tokens tokens, keeping its head or its tail.
+    """
+    max_chars = max(0, max_tokens) * 4
+    if len(text) <= max_chars:
+        return text
+    if keep == "tail":
+        return "[truncated]... " + text[len(text) - max_chars:]
+    return text[:max_chars] + "... [truncated]"
@@ -1,5 +1,7 @@
 from typing import List, Dict    
-from neo4j import GraphDatabase, exceptions  
+from neo4j import GraphDatabase, Query, exceptions  
+from models.deadline import call_timeout
+from params import PARAMS
 
 
 class EGoTEngine:
@@ -7,7 +9,12 @@ class EGoTEngine:
         self.session_id = session_id  # Store session_id as a class attribute
         self.logger = logger
         try:
-            self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+            self.driver = GraphDatabase.driver(
+                neo4j_uri,
+                auth=(neo4j_user, neo4j_password),
+                connection_timeout=PARAMS["NEO4J_CONNECTION_TIMEOUT"],
+                connection_acquisition_timeout=PARAMS["NEO4J_CONNECTION_TIMEOUT"]
+            )
             self.logger.info("Successfully connected to Neo4j.")
         except exceptions.Neo4jError as e:
             self.logger.error(f"Failed to create the Neo4j driver: {e}")
@@ -17,6 +24,13 @@ class EGoTEngine:
         self.driver.close() 
         self.logger.info("Neo4j driver closed.")
 
+    @staticmethod
+    def timed_query(query: str, operation: str) -> Query:
+        """
+        Wraps the query with a server-side timeout, shortened to the current deadline.
+        """
+        return Query(query, timeout=call_timeout(PARAMS["NEO4J_QUERY_TIMEOUT"], operation))
+
     def create_node(self, agent_nickname: str, concept: str, thought: str, name: str, entity_type: str) -> int:
         """
         Creates a new node with a dynamic label based on the session_id.
@@ -29,7 +43,7 @@ class EGoTEngine:
         )
         try:
             with self.driver.session() as session:
-                result = session.run(query,
+                result = session.run(self.timed_query(query, "creating an EGoT node"),
                                      agent_nickname=agent_nickname,
                                      name=name,
                                      concept=concept,
@@ -55,7 +69,7 @@ class EGoTEngine:
         )
         try:
             with self.driver.session() as session:
-                session.run(query,
+                session.run(self.timed_query(query, "creating an EGoT edge"),
                             from_node_id=from_node_id,
                             to_node_id=to_node_id,
                             relation=relation)
@@ -82,7 +96,7 @@ class EGoTEngine:
         nodes = {}
         try:
             with self.driver.session() as session:
-                result = session.run(query)
+                result = session.run(self.timed_query(query, "reading the EGoT graph"))
                 for record in result:
                     n = record["n"]
                     node_id = n.id
@@ -120,7 +134,7 @@ class EGoTEngine:
         """
         try:
             with self.driver.session() as session:
-                session.run(query)
+                session.run(self.timed_query(query, "deleting the EGoT graph"))
             self.logger.info(f"Deleted all nodes with label {self.session_id}.")
         except exceptions.Neo4jError as e:
             self.logger.error(f"Error deleting nodes for {self.session_id}: {e}")
@@ -7,10 +7,13 @@ from .prompts import (
     DIPENDENT_AGENT_PROMPT,
     EGOT_GENERATION_PROMPT  
 )  
-from models.models import call_model
+from models.models import call_model, usage_tracker
+from models.json_repair import parse_json_response
+from models.deadline import deadline_scope
 from .agent_session_manager import AgentSessionManager
 from .agent_data_model import AgentDataModel
-from .utils import sanitize_gpt_response, remove_html_body_tags
+from .utils import remove_html_body_tags
+from .schemas import JSON_CHAIN_RESPONSE_SCHEMA
 from .logging_handler import LoggingConfigurator
 from .web_search import WebSearchAgent
 from .egot_engine import EGoTEngine 
@@ -27,7 +30,7 @@ class DeepSearchAgentPlanner:
 
         self.data = AgentDataModel(name="DeepSearchAgentPlanner")
         self.data.memory_logs = []
-        self.logger = LoggingConfigurator.configure_logger(self.data.memory_logs)
+        self.logger = LoggingConfigurator.configure_logger(self.data.memory_logs, f'planner-{session_id}')
         self.enrich_log = LoggingConfigurator.enrich_log
         self.deep_search_model = PARAMS["DEEP_SEARCH_MODEL"]
 
@@ -240,7 +243,7 @@ class DeepSearchAgentPlanner:
                 model=self.deep_search_model
             )
 
-            egot_agent_output = json.loads(sanitize_gpt_response(egot_agent_output))
+            egot_agent_output = parse_json_response(egot_agent_output)
             self.egot_engine.create_multiple_nodes_and_edges(egot_agent_output, agent['agent_nickname'])
             self.logger.info(
                 self.enrich_log(
@@ -278,9 +281,21 @@ class DeepSearchAgentPlanner:
             self.data.state = 'completed'
             self.reset_to_init_data_model()
             self.logger.info(self.enrich_log('✅ DeepSearchAgentPlanner process completed ✅', 'add_green_divider'), extra={'no_memory': True})
+            self.logger.info(
+                f"📊 Model token usage since process start (cached prompt tokens ratio: "
+                f"{usage_tracker.cached_token_ratio():.1%}):\n{usage_tracker.report()}",
+                extra={'no_memory': True}
+            )
             return
 
     def run_planner(self):
+        """
+        Runs the chain under the DEEP_SEARCH_DEADLINE_SECONDS deadline, which bounds every external call.
+        """
+        with deadline_scope(PARAMS["DEEP_SEARCH_DEADLINE_SECONDS"], "the deep search"):
+            self._run_planner()
+
+    def _run_planner(self):
         if self.data.state != 'waiting_for_user_answer':
             self.logger.info(self.enrich_log('🚀 ---> Starting DeepSearchAgentPlanner', 'add_green_divider'), extra={'no_memory': True})
             self.data.state = 'running_chain'
@@ -291,9 +306,10 @@ class DeepSearchAgentPlanner:
                     min_output_type_final=self.min_output_type_final,
                     min_output_type_functional=self.min_output_type_functional
                 )}], 
-                model=self.deep_search_model
+                model=self.deep_search_model,
+                response_schema=JSON_CHAIN_RESPONSE_SCHEMA
             )
-            self.data.json_chain = json.loads(sanitize_gpt_response(response))
+            self.data.json_chain = parse_json_response(response)
             if not self.data.is_interactive:
                 for agent in self.data.json_chain.get('agents', []):
                     agent['user_questions'] = []
@@ -27,13 +27,17 @@ Each will have the following attributes:
 3. **JSON Example**: Use the following JSON example as a reference for the output format:
 $json_chain_example
                                        
-4. **output_type "final" minimum number of agents**: agents with output_type "final" must be at least $min_output_type_final.
+4. **output_type "final" minimum number of agents**: agents with output_type "final" must be at least the minimum given in **Planning constraints** below.
                                        
-5. **output_type "functional" minimum number of agents**: agents with output_type "functional" must be at least $min_output_type_functional.
+5. **output_type "functional" minimum number of agents**: agents with output_type "functional" must be at least the minimum given in **Planning constraints** below.
                                        
 6. **input_from_agents type**: The input_from_agents come **EXCLUSIVELY** from agents with output_type "functional", never from those with output_type "final".
 
 7. **input_from_agents max number of agents**: In input_from_agents there can be a maximum of TWO inputs.                                      
+
+**Planning constraints:**
+- Minimum number of agents with output_type "final": $min_output_type_final
+- Minimum number of agents with output_type "functional": $min_output_type_functional
                                        
 User prompt to evaluate: $initial_message
 """)
@@ -114,17 +118,10 @@ You should generate a JSON chain like this:
 DIPENDENT_AGENT_PROMPT = Template("""
 You are an agent responsible for executing a single task within a chain planning strategy.
 Your objective is to generate an output that will help complete a complex task divided into subtasks.
-                                  
-**Your Specific Task Prompt:**
-$agent_llm_prompt
-
-**Context:**
-The operational context is provided by the following JSON chain, and your nickname is: $agent_nickname:
-$json_chain_without_useless_info
+Your specific task prompt, your nickname, the JSON chain and the other inputs of your task are provided in the **Task Context** section at the end of this prompt.
 
 **Understanding the JSON Chain:**
 The JSON chain was generated from an initial prompt that was broken down into subtasks.
-The initial user request is as follows: $initial_message
 The JSON chain is a structured blueprint that breaks down the user initial message task into multiple subtasks, each handled by a dedicated AI agent. Each agent in the chain has:
 - A unique **agent_nickname**.
 - An **agent_llm_prompt** that provides a detailed and context-rich task description.
@@ -142,7 +139,7 @@ This chain is organized in chronological order to ensure that each subtask build
     - functional: This type of output is plain text, used exclusively as support for another intermediate step. "functional" outputs do not constitute the final answer; instead, they provide information, processing, or data that will feed into the next step in the agent chain, helping to generate the necessary context or input for other agents.
     - final: This type of output is html, intended to generate a part of the final response. "final" outputs should be formatted in HTML, and at the end of the process, all outputs labeled as "final" will be concatenated to form the comprehensive final response to the user.
   **formatting rules for 'final' output:**
-    - The minimum number of tokens to produce in the output is $min_token_output_type_final. 
+    - The minimum number of tokens to produce in the output is given in the **Task Context** section. 
     - Never use html or body tags, the main level should be an div tag.
     - Construct the HTML using inline CSS styles and common tags to format the text in a clear, professional, and readable manner. Use shades of grey for text and background color.
     - Never use numbered paragraphs, only use bullet points. 
@@ -154,17 +151,10 @@ This chain is organized in chronological order to ensure that each subtask build
 - **Input Sources:**
   - Your input may come from one or more agents. If the JSON chain contains agents that have your nickname in their output_for_agents, then those agents will provide input to you.
   Your input will be the 'observation' attribute of the agent that has your nickname in its output_for_agents.
-  Here you can find the list of agents that have your nickname in their output_for_agents:
-  $connected_agents_str
+  The list of agents that have your nickname in their output_for_agents is given in the **Task Context** section.
 
   **User Questions and Answers:**
   - Sometimes you will also receive a list of user answers to planned questions. These are the answers to the user questions that have been planned by the Planner agent.
-  - Here is the list of user questions:
-  $user_questions
-  - Here is the list of user answers:
-  $user_answers
-                                  
-$search_results_block
 
 **Guidelines:**
 
@@ -180,6 +170,27 @@ $search_results_block
 **Final Note:**
 Your role is crucial in the chain planning strategy. Ensure that your contributions are precise and facilitate the seamless progression of the overall task.
 
+**Task Context:**
+
+The initial user request is as follows: $initial_message
+
+The minimum number of tokens to produce in a 'final' output is $min_token_output_type_final.
+
+The operational context is provided by the following JSON chain, and your nickname is: $agent_nickname:
+$json_chain_without_useless_info
+
+Agents from which your input comes:
+$connected_agents_str
+
+Here is the list of user questions:
+$user_questions
+Here is the list of user answers:
+$user_answers
+                                  
+$search_results_block
+
+**Your Specific Task Prompt:**
+$agent_llm_prompt
 """)
 
 EGOT_GENERATION_PROMPT = Template("""
@@ -357,13 +368,13 @@ Note: Do not be absolutely limited to entity types and relations examples; they
 ]
 
 
+Please generate the output strictly according to the specifications above, using the following input variables.
+
 **Input Variables:**
-- agent_subtask_output: $agent_subtask_output  
+- user_initial_message: $initial_message  
 - json_chain: $json_chain  
 - egot_graph: $egot_graph  
 - agent_nickname: $agent_nickname  
-- user_initial_message: $initial_message  
-
-Please generate the output strictly according to the specifications above.
+- agent_subtask_output: $agent_subtask_output  
 
 """)
\ No newline at end of file
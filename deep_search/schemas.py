@@ -0,0 +1,29 @@
+"""
+JSON schema of the agent chain generated by the planner, sent as a structured output request.
+"""
+
+JSON_CHAIN_RESPONSE_SCHEMA = {
+    "name": "json_chain",
+    "strict": False,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "agents": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "agent_nickname": {"type": "string"},
+                        "agent_llm_prompt": {"type": "string"},
+                        "input_from_agents": {"type": "array", "items": {"type": "string"}},
+                        "user_questions": {"type": "array", "items": {"type": "string"}},
+                        "external_search_query": {"type": "string"},
+                        "output_type": {"type": "string", "enum": ["functional", "final"]}
+                    },
+                    "required": ["agent_nickname", "agent_llm_prompt", "input_from_agents", "user_questions", "output_type"]
+                }
+            }
+        },
+        "required": ["agents"]
+    }
+}
@@ -3,6 +3,8 @@ import requests
 import json
 from requests.exceptions import RequestException
 from bs4 import BeautifulSoup
+from models.deadline import call_timeout
+from params import PARAMS
 
 def truncate_content(text: str, max_length: int) -> str:
     """Truncate text to a maximum length."""
@@ -47,7 +49,11 @@ class GoogleSearchTool:
         if filter_year is not None:
             params["tbs"] = f"cdr:1,cd_min:01/01/{filter_year},cd_max:12/31/{filter_year}"
 
-        response = requests.get(base_url, params=params)
+        timeout = call_timeout(PARAMS["WEB_SEARCH_TIMEOUT"], f"searching '{query}'")
+        try:
+            response = requests.get(base_url, params=params, timeout=timeout)
+        except requests.exceptions.Timeout as e:
+            raise TimeoutError(f"Web search for '{query}' timed out after {timeout:.1f}s.") from e
         if response.status_code == 200:
             results = response.json()
         else:
@@ -94,7 +100,7 @@ class VisitWebpageTool:
 
     def visit(self, url: str) -> str:
         try:
-            response = requests.get(url, timeout=20)
+            response = requests.get(url, timeout=call_timeout(20, f"visiting {url}"))
             response.raise_for_status()
             soup = BeautifulSoup(response.text, "html.parser")
             text_content = soup.get_text(separator='\n', strip=True)
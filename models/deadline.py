@@ -0,0 +1,88 @@
+import time
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+_local = threading.local()
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request-scoped deadline expires before an external call."""
+
+
+class Deadline:
+    def __init__(self, seconds: float, name: str = "request"):
+        """
+        Point in time by which a whole request (an agent run, a deep search...) must be done.
+
+        :param seconds: Seconds from now until the deadline.
+        :param name: Name of the request, used in the timeout errors.
+        """
+        self.seconds = seconds
+        self.name = name
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def timeout(self, default: float, operation: str) -> float:
+        """
+        Returns the timeout of a call: default, shortened to the time left before the deadline.
+
+        :raises DeadlineExceeded: If the deadline has already expired.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(
+                f"Deadline of {self.name} ({self.seconds:g}s) exceeded before {operation}."
+            )
+        return min(default, remaining) if default else remaining
+
+
+def current_deadline() -> Optional[Deadline]:
+    return getattr(_local, "deadline", None)
+
+
+def set_current_deadline(deadline: Optional[Deadline]):
+    """
+    Makes the current thread work under the given deadline, e.g. for a call sent on behalf of another thread.
+    """
+    _local.deadline = deadline
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float], name: str = "request"):
+    """
+    Runs the block under a deadline of the given seconds (no deadline if None). A deadline already
+    in place for the thread is kept if it expires earlier.
+    """
+    previous = current_deadline()
+    deadline = Deadline(seconds, name) if seconds else None
+    if previous is not None and (deadline is None or previous.remaining() < deadline.remaining()):
+        deadline = previous
+    set_current_deadline(deadline)
+    try:
+        yield deadline
+    finally:
+        set_current_deadline(previous)
+
+
+def call_timeout(default: float, operation: str) -> float:
+    """
+    Timeout of an external call made by the current thread: default, shortened to the time left
+    before the current deadline if there is one.
+
+    :raises DeadlineExceeded: If the current deadline has already expired.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return default
+    return deadline.timeout(default, operation)
+
+
+def check_deadline(operation: str):
+    """
+    For calls that can't be given a timeout (e.g. the embedded Chroma client): fails fast if the
+    current deadline has already expired.
+    """
+    call_timeout(None, operation)
@@ -0,0 +1,147 @@
+import re
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+CLOSING_BRACKETS = {"{": "}", "[": "]"}
+STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def parse_json_response(response_str: str, allow_truncated: bool = True):
+    """
+    Parses the JSON object returned by a model, repairing the usual defects instead of failing:
+    markdown fences, text around the JSON, Python literals (True/False/None), single-quoted strings,
+    raw newlines inside strings, trailing commas and a response truncated before its closing brackets.
+    A warning is logged whenever a response is repaired.
+
+    :param allow_truncated: Whether a truncated response is closed and accepted. Content may be
+                            missing from such a response (e.g. the last subtasks of a plan), so
+                            callers that need it complete pass False.
+    :return: The parsed JSON value.
+    :raises json.JSONDecodeError: If the response cannot be repaired, or is truncated and not allow_truncated.
+    """
+    text = re.sub(r'^```(?:json)?\s*', '', response_str.strip(), flags=re.MULTILINE)
+    text = re.sub(r'```\s*$', '', text, flags=re.MULTILINE).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as error:
+        original_error = error
+
+    start = min((i for i in (text.find("{"), text.find("[")) if i != -1), default=-1)
+    if start == -1:
+        raise original_error
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text[start:])
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    repaired, truncated = _repair_json(text[start:])
+    if truncated and not allow_truncated:
+        logger.warning("Rejected a JSON model response truncated before its end.")
+        raise json.JSONDecodeError("JSON response truncated before its end", text, len(text))
+    try:
+        value = json.loads(repaired)
+    except json.JSONDecodeError:
+        raise original_error
+    if truncated:
+        logger.warning("Repaired a JSON model response truncated before its end: its last members may be missing.")
+    else:
+        logger.warning("Repaired a malformed JSON model response.")
+    return value
+
+
+def repair_json(text: str) -> str:
+    """
+    Rewrites JSON-like text in a single pass, tracking strings and open brackets.
+    Stops at the end of the first complete top-level value.
+    """
+    return _repair_json(text)[0]
+
+
+def _repair_json(text: str):
+    """
+    :return: A tuple (repaired text, whether the text was truncated before the end of its top-level value).
+    """
+    output = []
+    stack = []
+    last_comma = []  # Per open bracket, the output length before its last separating comma.
+    quote = None
+    escaped = False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+                if char == "'":
+                    output[-1] = char  # \' is not a valid JSON escape.
+                else:
+                    output.append(char)
+            elif char == "\\":
+                escaped = True
+                output.append(char)
+            elif char == quote:
+                quote = None
+                output.append('"')
+            elif char == '"':
+                output.append('\\"')
+            else:
+                output.append(STRING_ESCAPES.get(char, char))
+            i += 1
+            continue
+
+        if char in ('"', "'"):
+            quote = char
+            output.append('"')
+        elif char in CLOSING_BRACKETS:
+            stack.append(CLOSING_BRACKETS[char])
+            last_comma.append(None)
+            output.append(char)
+        elif char in "}]":
+            _strip_trailing_comma(output)
+            if stack:
+                stack.pop()
+                last_comma.pop()
+            output.append(char)
+            if not stack:
+                break
+        elif char == ",":
+            if last_comma:
+                last_comma[-1] = len(output)
+            output.append(char)
+        elif char.isalpha():
+            word = re.match(r"[A-Za-z_]+", text[i:]).group(0)
+            output.append(PYTHON_LITERALS.get(word, word))
+            i += len(word)
+            continue
+        else:
+            output.append(char)
+        i += 1
+
+    if not stack:
+        return "".join(output), False
+
+    # The response was truncated: close the open string and brackets, dropping
+    # the last incomplete member if closing alone does not give valid JSON.
+    if quote:
+        output.append('"')
+    repaired = re.sub(r'[,:]\s*$', '', "".join(output).rstrip()) + "".join(reversed(stack))
+    try:
+        json.loads(repaired)
+        return repaired, True
+    except json.JSONDecodeError:
+        pass
+    for depth in range(len(stack) - 1, -1, -1):
+        if last_comma[depth] is not None:
+            return "".join(output[:last_comma[depth]]) + "".join(reversed(stack[:depth + 1])), True
+    return repaired, True
+
+
+def _strip_trailing_comma(output):
+    while output and output[-1].strip() == "":
+        output.pop()
+    if output and output[-1] == ",":
+        output.pop()
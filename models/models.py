@@ -1,11 +1,15 @@
 import logging
 import os
 import traceback
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable
 import requests
-from openai import OpenAI
+from openai import OpenAI, BadRequestError, APITimeoutError
 import time
+import queue
+import threading
+from collections import deque
 from models.models_options import local_ollama_options
+from models.deadline import call_timeout, current_deadline, set_current_deadline
 from params import PARAMS
 
 # Configure logging
@@ -23,10 +27,97 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY environment variable is not set")
 
+class UsageTracker:
+    """
+    Accumulates the token usage reported by the model APIs, per model, so that the
+    share of prompt tokens served from the provider prompt cache can be reported.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.usage = {}
+        self.local = threading.local()
+
+    def record(self, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0):
+        with self.lock:
+            model_usage = self.usage.setdefault(
+                model, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+            )
+            for usage in [model_usage] + getattr(self.local, "scopes", []):
+                usage["calls"] += 1
+                usage["prompt_tokens"] += prompt_tokens or 0
+                usage["completion_tokens"] += completion_tokens or 0
+                usage["cached_tokens"] += cached_tokens or 0
+
+    def begin_scope(self) -> Dict[str, int]:
+        """
+        Starts collecting the usage recorded by the current thread only (e.g. during one subtask),
+        so that concurrent sessions are not counted. Returns the dictionary that accumulates it.
+        """
+        scope = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+        if not hasattr(self.local, "scopes"):
+            self.local.scopes = []
+        self.local.scopes.append(scope)
+        return scope
+
+    def current_scopes(self) -> List[Dict[str, int]]:
+        return list(getattr(self.local, "scopes", []))
+
+    def adopt_scopes(self, scopes: List[Dict[str, int]]):
+        """
+        Makes the current thread record into the given scopes, e.g. for a request sent on behalf
+        of another thread.
+        """
+        self.local.scopes = list(scopes)
+
+    def end_scope(self, scope: Dict[str, int]) -> Dict[str, int]:
+        scopes = getattr(self.local, "scopes", [])
+        if any(s is scope for s in scopes):
+            self.local.scopes = [s for s in scopes if s is not scope]
+        return scope
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            return {model: dict(model_usage) for model, model_usage in self.usage.items()}
+
+    def cached_token_ratio(self, model: Optional[str] = None) -> float:
+        """
+        Returns cached_tokens / prompt_tokens for a model, or over all models if model is None.
+        """
+        usage = self.snapshot()
+        models_usage = [usage[model]] if model in usage else ([] if model else list(usage.values()))
+        prompt_tokens = sum(u["prompt_tokens"] for u in models_usage)
+        cached_tokens = sum(u["cached_tokens"] for u in models_usage)
+        return cached_tokens / prompt_tokens if prompt_tokens else 0.0
+
+    def report(self) -> str:
+        lines = []
+        for model, model_usage in self.snapshot().items():
+            lines.append(
+                f"{model}: {model_usage['calls']} calls, {model_usage['prompt_tokens']} prompt tokens "
+                f"({model_usage['cached_tokens']} cached, {self.cached_token_ratio(model):.1%}), "
+                f"{model_usage['completion_tokens']} completion tokens"
+            )
+        return "\n".join(lines)
+
+
+usage_tracker = UsageTracker()
+
+# Models that rejected a json_schema response format: they fall back to json_object.
+SCHEMA_UNSUPPORTED_MODELS = set()
+
+
 class CloudClient:
     """Client for cloud calls via OpenAI's API."""
     def __init__(self, api_key: str):
         self.client = OpenAI(api_key=api_key)
+        self.closed = False
+
+    def close(self):
+        """
+        Closes the HTTP connections of the client, aborting a request still in flight.
+        """
+        self.closed = True
+        self.client.close()
 
     def call(
         self,
@@ -35,8 +126,10 @@ class CloudClient:
         image_base64: Optional[str] = None,
         image_extension: Optional[str] = None,
         model: str = "gpt-4-turbo",
-        output_format: Optional[str] = None
+        output_format: Optional[str] = None,
+        response_schema: Optional[Dict] = None
     ) -> str:
+        timeout = call_timeout(PARAMS["MODEL_CALL_TIMEOUT"], f"calling {model}")
         try:
             content_list = []
 
@@ -72,18 +165,46 @@ class CloudClient:
 
             request_params = {
                 "model": model, 
-                "messages": chat_history
+                "messages": chat_history,
+                "timeout": timeout
             }
 
-            if output_format:
-                request_params["response_format"] = {"type": output_format}
+            if response_schema and model not in SCHEMA_UNSUPPORTED_MODELS:
+                request_params["response_format"] = {"type": "json_schema", "json_schema": response_schema}
+            elif output_format or response_schema:
+                request_params["response_format"] = {"type": output_format or "json_object"}
 
-            response = self.client.chat.completions.create(**request_params)
+            try:
+                response = self.client.chat.completions.create(**request_params)
+            except BadRequestError as e:
+                if request_params.get("response_format", {}).get("type") != "json_schema":
+                    raise
+                logger.warning(f"Model {model} rejected the JSON schema response format, using json_object: {e}")
+                SCHEMA_UNSUPPORTED_MODELS.add(model)
+                request_params["response_format"] = {"type": "json_object"}
+                response = self.client.chat.completions.create(**request_params)
+
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                prompt_tokens_details = getattr(usage, "prompt_tokens_details", None)
+                usage_tracker.record(
+                    model,
+                    usage.prompt_tokens,
+                    usage.completion_tokens,
+                    getattr(prompt_tokens_details, "cached_tokens", 0)
+                )
 
             answer = response.choices[0].message.content.strip()
             return answer
 
+        except APITimeoutError as e:
+            if self.closed:
+                raise
+            logger.error(f"⏰ OpenAI call to {model} timed out after {timeout:.1f}s.")
+            raise TimeoutError(f"OpenAI call to {model} timed out after {timeout:.1f}s.") from e
         except Exception as e:
+            if self.closed:
+                raise
             logger.error(f"OpenAI API error: {e}")
             logger.error(traceback.format_exc())
             raise e
@@ -98,20 +219,32 @@ class LocalClient:
         self.chat_url = f"{base_url}/chat"
         self.pull_url = f"{base_url}/pull"
 
-    def call(self, chat_history: List[Dict[str, any]], model: str, image_base64: Optional[str] = None) -> str:
+    def close(self):
+        """
+        A blocking requests.post can't be interrupted: the answer of a cancelled request is discarded.
+        """
+        pass
+
+    def call(self, chat_history: List[Dict[str, any]], model: str, image_base64: Optional[str] = None, response_schema: Optional[Dict] = None) -> str:
         payload = {
             "model": model,
             "messages": chat_history,
             "stream": False
         }
+        if response_schema:
+            payload["format"] = response_schema["schema"]
         if PARAMS["APPLY_MODEL_OPTIONS"]:
             payload.update(local_ollama_options)
             
+        timeout = call_timeout(PARAMS["LOCAL_MODEL_CALL_TIMEOUT"], f"calling local model {model}")
         try:
             if image_base64:
                 payload["images"] = [image_base64]
-            response = requests.post(self.chat_url, json=payload)
+            response = requests.post(self.chat_url, json=payload, timeout=timeout)
             response.raise_for_status()
+        except requests.exceptions.Timeout as e:
+            logger.error(f"⏰ Local model {model} timed out after {timeout:.1f}s.")
+            raise TimeoutError(f"Local model {model} timed out after {timeout:.1f}s.") from e
         except requests.exceptions.HTTPError as e:
             try:
                 error_data = response.json()
@@ -122,14 +255,20 @@ class LocalClient:
             if "try pulling it first" in error_message:
                 logger.info(f"Model '{model}' not found. Pulling the model using pull API...")
                 pull_payload = {"model": model}
-                pull_response = requests.post(self.pull_url, json=pull_payload)
+                pull_response = requests.post(
+                    self.pull_url, json=pull_payload,
+                    timeout=call_timeout(PARAMS["LOCAL_MODEL_PULL_TIMEOUT"], f"pulling local model {model}")
+                )
                 pull_response.raise_for_status()
 
                 pull_data = pull_response.json()
                 if pull_data.get("status") == "success":
                     logger.info(f"🤖🧠 Model '{model}' pulled successfully. Retrying chat call...")
                     time.sleep(2)
-                    response = requests.post(self.chat_url, json=payload)
+                    response = requests.post(
+                        self.chat_url, json=payload,
+                        timeout=call_timeout(PARAMS["LOCAL_MODEL_CALL_TIMEOUT"], f"calling local model {model}")
+                    )
                     response.raise_for_status()
                 else:
                     error_msg = f"Failed to pull model '{model}'. Pull API response: {pull_data}"
@@ -142,47 +281,254 @@ class LocalClient:
 
         data = response.json()
         logger.info(f"Local API response: {data}")
+        usage_tracker.record(model, data.get("prompt_eval_count", 0), data.get("eval_count", 0))
         answer = data["message"]["content"].strip()
         return answer
 
 
+class CascadeStats:
+    """
+    Counts, per call site, how often the cheap model of the cascade router was accepted
+    and how often the call was escalated to the configured model.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+
+    def record(self, call_site: str, escalated: bool):
+        with self.lock:
+            site_stats = self.stats.setdefault(call_site, {"calls": 0, "escalations": 0})
+            site_stats["calls"] += 1
+            site_stats["escalations"] += int(escalated)
+
+    def escalation_rate(self, call_site: str) -> float:
+        with self.lock:
+            site_stats = self.stats.get(call_site)
+            return site_stats["escalations"] / site_stats["calls"] if site_stats else 0.0
+
+    def report(self) -> str:
+        with self.lock:
+            snapshot = {call_site: dict(site_stats) for call_site, site_stats in self.stats.items()}
+        return "\n".join(
+            f"{call_site}: {site_stats['escalations']}/{site_stats['calls']} escalated "
+            f"({site_stats['escalations'] / site_stats['calls']:.1%})"
+            for call_site, site_stats in sorted(snapshot.items())
+        )
+
+
+cascade_stats = CascadeStats()
+
+
+class HedgeStats:
+    """
+    Keeps, per call site, a window of recent response latencies (used to compute the hedging delay)
+    and counts how often a backup request was fired and how often it answered first.
+    """
+    def __init__(self, window: int = 100):
+        self.lock = threading.Lock()
+        self.window = window
+        self.latencies = {}
+        self.stats = {}
+
+    def record_latency(self, call_site: str, seconds: float):
+        with self.lock:
+            self.latencies.setdefault(call_site, deque(maxlen=self.window)).append(seconds)
+
+    def delay(self, call_site: str, percentile: float, min_samples: int, default_delay: float) -> float:
+        """
+        Returns the given percentile of the recent latencies of the call site,
+        or default_delay until min_samples latencies have been observed.
+        """
+        with self.lock:
+            latencies = sorted(self.latencies.get(call_site, []))
+        if len(latencies) < min_samples:
+            return default_delay
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+    def record(self, call_site: str, hedged: bool, hedge_won: bool = False):
+        with self.lock:
+            site_stats = self.stats.setdefault(call_site, {"calls": 0, "hedges": 0, "hedge_wins": 0})
+            site_stats["calls"] += 1
+            site_stats["hedges"] += int(hedged)
+            site_stats["hedge_wins"] += int(hedge_won)
+
+    def report(self) -> str:
+        with self.lock:
+            snapshot = {call_site: dict(site_stats) for call_site, site_stats in self.stats.items()}
+        return "\n".join(
+            f"{call_site}: {site_stats['hedges']}/{site_stats['calls']} hedged, "
+            f"{site_stats['hedge_wins']} won by the backup request"
+            for call_site, site_stats in sorted(snapshot.items())
+        )
+
+
+hedge_stats = HedgeStats(window=PARAMS["HEDGING_LATENCY_WINDOW"])
+
+
 def call_model(
     chat_history: List[Dict[str, any]],
     image_url: Optional[str] = None,
     image_base64: Optional[str] = None,
     image_extension: Optional[str] = None,
     model: str = "gpt-4o",
-    output_format: Optional[str] = None
+    output_format: Optional[str] = None,
+    validate: Optional[Callable[[str], bool]] = None,
+    call_site: Optional[str] = None,
+    response_schema: Optional[Dict] = None
+) -> str:
+    """
+    Calls a cloud model, or a local Ollama model if the model name starts with "local_".
+
+    :param validate: Optional format check of the answer of classification and ranking calls. When given and cascade routing
+                     is enabled, the cheap model (CASCADE_CHEAP_MODEL) is tried first and the call is
+                     escalated to the requested model only if its answer does not pass the check.
+                     The check is not a confidence signal: a well-formed wrong answer of the cheap model is kept.
+    :param call_site: Name under which the escalations are counted (defaults to the model name).
+    :param response_schema: Optional {"name", "schema", "strict"} JSON schema the answer must follow,
+                            sent as a structured output request (json_object for models that reject it).
+
+    Calls whose call_site is listed in HEDGING_CALL_SITES are hedged: if the answer hasn't arrived
+    after the HEDGING_PERCENTILE latency of the call site, a backup request is sent (to
+    HEDGING_BACKUP_MODEL or the same model) and the first answer wins.
+    """
+    cheap_model = PARAMS["CASCADE_CHEAP_MODEL"]
+    if validate is not None and PARAMS["CASCADE_ROUTING_ENABLED"] and cheap_model and cheap_model != model:
+        call_site = call_site or model
+        try:
+            answer = _call_client(list(chat_history), image_url, image_base64, image_extension, cheap_model, output_format, response_schema)
+            accepted = validate(answer)
+        except Exception as e:
+            logger.warning(f"Cascade model {cheap_model} failed for {call_site}: {e}")
+            accepted = False
+        cascade_stats.record(call_site, escalated=not accepted)
+        if accepted:
+            return answer
+        logger.info(f"Escalating {call_site} from {cheap_model} to {model}.")
+
+    if PARAMS["HEDGING_ENABLED"] and call_site in PARAMS["HEDGING_CALL_SITES"]:
+        return _call_with_hedging(call_site, chat_history, image_url, image_base64, image_extension, model, output_format, response_schema)
+    return _call_client(chat_history, image_url, image_base64, image_extension, model, output_format, response_schema)
+
+
+def _call_with_hedging(
+    call_site: str,
+    chat_history: List[Dict[str, any]],
+    image_url: Optional[str],
+    image_base64: Optional[str],
+    image_extension: Optional[str],
+    model: str,
+    output_format: Optional[str],
+    response_schema: Optional[Dict] = None
+) -> str:
+    """
+    Sends the request and, if it is still pending after the hedging delay, a backup request.
+    The first successful answer is returned and the other request is cancelled; an error is
+    raised only if every request sent failed.
+    """
+    delay = hedge_stats.delay(
+        call_site, PARAMS["HEDGING_PERCENTILE"], PARAMS["HEDGING_MIN_SAMPLES"], PARAMS["HEDGING_DEFAULT_DELAY"]
+    )
+    answers = queue.Queue()
+    clients = []
+    # The requests are sent under the caller's deadline, and their tokens are counted by its scopes.
+    scopes = usage_tracker.current_scopes()
+    deadline = current_deadline()
+    start = time.perf_counter()
+
+    def send(attempt: int, attempt_model: str):
+        usage_tracker.adopt_scopes(scopes)
+        set_current_deadline(deadline)
+        try:
+            answer = _call_client(
+                list(chat_history), image_url, image_base64, image_extension, attempt_model, output_format,
+                response_schema, client=clients[attempt]
+            )
+            answers.put((attempt, answer, None))
+        except Exception as e:
+            answers.put((attempt, None, e))
+
+    def start_attempt(attempt_model: str):
+        clients.append(_create_client(attempt_model))
+        threading.Thread(target=send, args=(len(clients) - 1, attempt_model), daemon=True).start()
+
+    start_attempt(model)
+    try:
+        attempt, answer, error = answers.get(timeout=delay)
+        pending = 0
+    except queue.Empty:
+        backup_model = PARAMS["HEDGING_BACKUP_MODEL"] or model
+        logger.info(f"No answer from {model} for {call_site} after {delay:.1f}s, sending a backup request to {backup_model}.")
+        start_attempt(backup_model)
+        attempt, answer, error = answers.get()
+        pending = 1
+    if error is not None and pending:
+        # The first request to finish failed: wait for the other one.
+        attempt, answer, error = answers.get()
+        pending = 0
+
+    hedged = len(clients) > 1
+    hedge_stats.record(call_site, hedged=hedged, hedge_won=hedged and attempt == 1 and error is None)
+    if error is None:
+        # When the backup request wins, this is a lower bound of the primary request latency.
+        hedge_stats.record_latency(call_site, time.perf_counter() - start)
+    if pending:
+        clients[1 - attempt].close()
+    if error is not None:
+        raise error
+    return answer
+
+
+def _create_client(model: str):
+    if model.startswith("local_"):
+        return LocalClient()
+    return CloudClient(api_key=OPENAI_API_KEY)
+
+
+def _call_client(
+    chat_history: List[Dict[str, any]],
+    image_url: Optional[str],
+    image_base64: Optional[str],
+    image_extension: Optional[str],
+    model: str,
+    output_format: Optional[str],
+    response_schema: Optional[Dict] = None,
+    client=None
 ) -> str:
 
     client_type = "local" if model.startswith("local_") else "cloud"
+    client = client or _create_client(model)
 
     if client_type == "cloud":
-        client = CloudClient(api_key=OPENAI_API_KEY)
         return client.call(
             chat_history,
             image_url,
             image_base64,
             image_extension,
             model,
-            output_format
+            output_format,
+            response_schema
         )
     else:
         model = model.replace("local_", "")
-        client = LocalClient()
         return client.call(
             chat_history, 
             model,
-            image_base64)
+            image_base64,
+            response_schema)
 
 
 def create_embeddings(texts_to_embed: List[str], model: str = "text-embedding-ada-002") -> List[List[float]]:  
     client = OpenAI(api_key=OPENAI_API_KEY)  
+    timeout = call_timeout(PARAMS["EMBEDDING_CALL_TIMEOUT"], "creating embeddings")
     try:
         response = client.embeddings.create( 
             model=model,
-            input=texts_to_embed 
+            input=texts_to_embed,
+            timeout=timeout
         )
+    except APITimeoutError as e:
+        logger.error(f"⏰ Embeddings request to {model} timed out after {timeout:.1f}s.")
+        raise TimeoutError(f"Embeddings request to {model} timed out after {timeout:.1f}s.") from e
     except Exception as e:
         raise RuntimeError(f"Error while fetching embeddings from OpenAI: {e}")
 
@@ -10,6 +10,21 @@ PARAMS = {
     "HYBRID_VECTOR_GRAPH_RAG_SUMMARIZATION_GRAPH_NODE_LENGTH": 100,  # Length of summarized content in graph nodes
     "HYBRID_VECTOR_GRAPH_RAG_SIMILARITY_RETRIEVE_THRESHOLD": 0.9,  # Threshold for retrieving similar chunks
     "HYBRID_VECTOR_GRAPH_RAG_SIMILARITY_EDGE_THRESHOLD": 0.9,  # Threshold for creating edges between similar chunks
+    "HYBRID_VECTOR_GRAPH_RAG_EDGE_INDEX": "exact",  # Vector index used to find the similarity edges during ingestion: "exact", "hnsw" (approximate) or "auto" (measure with the similarity benchmark first: up to 100k chunks exact is faster)
+    "HYBRID_VECTOR_GRAPH_RAG_HNSW_MIN_NODES": 50000,  # Number of existing chunks from which "auto" uses the HNSW index
+    "HYBRID_VECTOR_GRAPH_RAG_HNSW_MAX_NEIGHBORS": 100,  # Maximum number of similarity edges per new chunk with the HNSW index
+    "HYBRID_VECTOR_GRAPH_RAG_HNSW_EF_CONSTRUCTION": 100,  # HNSW candidate list size when inserting chunks: higher gives better recall but slower builds
+    "HYBRID_VECTOR_GRAPH_RAG_HNSW_M": 16,  # HNSW links per chunk: higher gives better recall but more memory and slower builds
+    "HYBRID_VECTOR_GRAPH_RAG_SIMILARITY_BLOCK_SIZE": 256,  # New chunks compared at once with the existing ones (memory: block size x existing chunks floats)
+    "HYBRID_VECTOR_GRAPH_RAG_SUMMARY_WORKERS": 8,  # Chunk summaries requested concurrently during ingestion
+    "HYBRID_VECTOR_GRAPH_RAG_SPACY_BATCH_SIZE": 64,  # Texts per SpaCy nlp.pipe batch (lemmatization and sentence splitting)
+    "HYBRID_VECTOR_GRAPH_RAG_SPACY_N_PROCESS": 2,  # SpaCy processes used for large corpora
+    "HYBRID_VECTOR_GRAPH_RAG_SPACY_MULTIPROCESS_MIN_TEXTS": 2000,  # Minimum number of texts to process with HYBRID_VECTOR_GRAPH_RAG_SPACY_N_PROCESS processes
+    "HYBRID_VECTOR_GRAPH_RAG_SENTENCE_BLOCK_CHARS": 10000,  # Maximum characters of the corpus blocks split into sentences per SpaCy doc
+    "HYBRID_VECTOR_GRAPH_RAG_SENTENCE_SEGMENTER": "parser",  # Corpus sentence splitting: "parser" (same sentences as the full SpaCy pipeline) or "senter" (faster, boundaries can differ slightly)
+    "HYBRID_VECTOR_GRAPH_RAG_EMBEDDING_BATCH_SIZE": 100,  # Lemmatized summaries embedded per embeddings request
+    "HYBRID_VECTOR_GRAPH_RAG_WRITE_BATCH_SIZE": 1000,  # Chunk nodes or similarity edges written per Neo4j UNWIND query
+    "HYBRID_VECTOR_GRAPH_RAG_NEO4J_MAX_POOL_SIZE": 50,  # Connections of the Neo4j driver shared by all the Hybrid Vector Graph RAG instances
     "HYBRID_VECTOR_GRAPH_RAG_QUERY_MAX_DEPTH": 3,  # Maximum depth for graph traversal during queries
     "HYBRID_VECTOR_GRAPH_RAG_QUERY_TOP_K": 3,  # Number of top results to return in hybrid RAG queries
     "HYBRID_VECTOR_GRAPH_RAG_QUERY_MAX_CONTEXT_LENGTH": 10000,  # Maximum context length for hybrid RAG queries
@@ -53,7 +68,49 @@ PARAMS = {
     "TOOL_HELPER_MODEL": "gpt-4o",  # Model used for default tool helper_model
     "TOOL_HELPER_MODEL_WEB_SEARCH": "gpt-4o-search-preview",  # Model used for default tool helper_model_with_web_search, only 2 values are allowed: gpt-4o-search-preview or gpt-4o-mini-search-preview
     "JSON_PLAN_MODEL": "gpt-4o",  # Model used for JSON planning
+    "JSON_PLAN_MAX_ATTEMPTS": 2,  # Attempts at generating a JSON plan when the model returns a truncated or incomplete one
     "EVALUATION_MODEL": "gpt-4o",  # Model used for evaluation tasks
+    "CASCADE_ROUTING_ENABLED": False,  # Try CASCADE_CHEAP_MODEL first for classification and ranking calls and escalate only if its answer is malformed; a well-formed wrong answer is kept, there is no confidence check (off until its accuracy is measured)
+    "CASCADE_CHEAP_MODEL": "gpt-4o-mini",  # Cheap model of the cascade router, can be a local model (e.g. "local_llama3.2")
+    "HEDGING_ENABLED": False,  # Send a backup request when a model call of HEDGING_CALL_SITES is slower than usual, keeping the first answer
+    "HEDGING_CALL_SITES": ["json_plan", "plan_evaluator"],  # Call sites whose model calls are hedged
+    "HEDGING_PERCENTILE": 95,  # Latency percentile of the call site after which the backup request is sent
+    "HEDGING_MIN_SAMPLES": 20,  # Latencies observed before the percentile is used instead of HEDGING_DEFAULT_DELAY
+    "HEDGING_DEFAULT_DELAY": 30.0,  # Seconds before the backup request while too few latencies have been observed
+    "HEDGING_LATENCY_WINDOW": 100,  # Number of recent latencies per call site used to compute the percentile
+    "HEDGING_BACKUP_MODEL": None,  # Model of the backup request, None to use the same model
+    "CODE_AGENT_DEADLINE_SECONDS": 1800,  # Deadline of a CodeAgent run: every external call gets at most the time left, None for no deadline
+    "DEEP_SEARCH_DEADLINE_SECONDS": 3600,  # Deadline of a deep search request, None for no deadline
+    "MODEL_CALL_TIMEOUT": 180,  # Timeout in seconds of a cloud model call
+    "LOCAL_MODEL_CALL_TIMEOUT": 600,  # Timeout in seconds of a local (Ollama) model call
+    "LOCAL_MODEL_PULL_TIMEOUT": 1800,  # Timeout in seconds of the pull of a missing local model
+    "EMBEDDING_CALL_TIMEOUT": 60,  # Timeout in seconds of an embeddings request
+    "WEB_SEARCH_TIMEOUT": 30,  # Timeout in seconds of a SerpAPI / Serper search request
+    "NEO4J_CONNECTION_TIMEOUT": 15,  # Timeout in seconds to connect to Neo4j or acquire a pooled connection
+    "NEO4J_QUERY_TIMEOUT": 60,  # Server-side timeout in seconds of a Neo4j query
+    "REGENERATION_PROMPT_TOKEN_BUDGET": 6000,  # Approximate maximum number of tokens sent to regenerate a failing subtask
+    "CODE_AGENT_CHECKPOINT_ENABLED": True,  # Checkpoint the JSON plan and subtask results to Redis to resume interrupted runs
+    "CODE_AGENT_CHECKPOINT_TTL": 86400,  # Seconds after which an abandoned CodeAgent checkpoint expires
+    "FUNCTION_LIBRARY_ENABLED": False,  # Store successful subtask functions in Chroma and offer the closest ones of the same user (or session) to the planner for reuse
+    "FUNCTION_LIBRARY_TOP_K": 3,  # Maximum number of proven functions offered to the planner
+    "FUNCTION_LIBRARY_MAX_DISTANCE": 0.2,  # Maximum cosine distance between the request and an offered function
+    "PLAN_CACHE_ENABLED": False,  # Reuse the JSON plans of the same user's (or session's) past satisfactory runs for near-duplicate requests, adapting only parameter values
+    "PLAN_CACHE_SIMILARITY_THRESHOLD": 0.92,  # Minimum cosine similarity between two conversations for a cached plan to be adapted
+    "HISTORY_COMPACTION_ENABLED": True,  # Summarize the older messages of long conversations before planning
+    "HISTORY_TOKEN_BUDGET": 4000,  # Approximate maximum number of tokens of the conversation history sent to the planner
+    "HISTORY_RECENT_MESSAGES": 6,  # Number of most recent messages kept verbatim, budget permitting
+    "HISTORY_SUMMARY_MODEL": "gpt-4o-mini",  # Model used to summarize the older messages
+    "RUN_TIME_BUDGET_SECONDS": None,  # Default wall-clock budget of an agent run in seconds, None for no limit
+    "RUN_TOKEN_BUDGET": None,  # Default token budget (prompt + completion) of an agent run, None for no limit
+    "RUN_TIME_BUDGET_MAX_SECONDS": 3600,  # Largest time budget a client can request for an agent run
+    "RUN_TOKEN_BUDGET_MAX": 2000000,  # Largest token budget a client can request for an agent run
+    "RUN_BUDGET_DEGRADE_RATIO": 0.8,  # Fraction of the budget after which the run skips evaluation iterations and regenerations
+    "RUN_BUDGET_DEGRADED_TOP_K_RATIO": 0.5,  # Factor applied to the RAG top_k once the run budget is nearly exhausted
+    "SUBTASK_PROGRESS_MIN_INTERVAL": 1.0,  # Minimum seconds between two subtask progress messages sent to the UI
+    "SUBTASK_PROGRESS_PREVIEW_CHARS": 300,  # Maximum length of the subtask output preview sent to the UI
+    "SUBTASK_TRACEMALLOC_ENABLED": False,  # Measure the peak memory allocated by each subtask with tracemalloc (slows down every allocation of the process, approximate when runs are concurrent)
+    "TOOL_CACHE_BACKEND": "redis",  # Backend of the cross-session tool result cache: "redis", "disk" or None to disable it
+    "TOOL_CACHE_DIR": "/tmp/tool_cache",  # Directory of the tool result cache when TOOL_CACHE_BACKEND is "disk"
     "SURF_AI_JSON_TASK_MODEL": "gpt-4o",  # Model for SurfAI JSON tasks (requires multimodal capabilities)
 
     "CUA_FIRST_URL_MODEL": "gpt-4o",  # Model used to generate the first url for CUA 
@@ -12,6 +12,19 @@ document.addEventListener('DOMContentLoaded', () => {
     socket.on("reasoning_update", function(data) {
         appendReasoning(data.message);
     });  
+
+    socket.on("subtask_progress", function(data) {
+        if (data.session_id === sessionId) {
+            data.events.forEach(function(event) {
+                const position = `${event.index}/${event.total}`;
+                if (event.event === "subtask_started") {
+                    appendReasoning(`▶️ Subtask ${position} started: ${event.subtask_name}`);
+                } else if (event.event === "subtask_finished") {
+                    appendReasoning(`✅ Subtask ${position} finished in ${event.duration_seconds}s: ${event.subtask_name}\n${event.output_preview}`);
+                }
+            });
+        }
+    });
       
     socket.on("agent_response", function(data) {
         if (data.session_id === sessionId) {
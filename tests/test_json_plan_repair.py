@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from models.json_repair import parse_json_response
+
+
+PLAN = {
+    "main_task": "Answer",
+    "subtasks": [
+        {"subtask_name": "search", "input_from_subtask": [], "description": "Search", "code": "def search(previous_output):\n    return previous_output"},
+        {"subtask_name": "answer", "input_from_subtask": ["search"], "description": "Answer", "code": "def answer(previous_output):\n    return previous_output"}
+    ]
+}
+TRUNCATED_PLAN = json.dumps(PLAN)[:-60]
+
+
+def test_truncated_response_is_repaired_with_a_warning(caplog):
+    assert parse_json_response('{"a": [1, 2') == {"a": [1, 2]}
+    assert "truncated" in caplog.text
+
+
+def test_truncated_response_is_rejected_when_not_allowed():
+    with pytest.raises(json.JSONDecodeError):
+        parse_json_response(TRUNCATED_PLAN, allow_truncated=False)
+    assert parse_json_response("{'a': True,}", allow_truncated=False) == {"a": True}
+
+
+@pytest.fixture
+def agent_plan_generator():
+    pytest.importorskip("openai")
+    pytest.importorskip("chromadb")
+    from code_agent import agent_plan_generator
+    return agent_plan_generator
+
+
+def test_repaired_plan_with_incomplete_subtask_is_not_complete(agent_plan_generator):
+    is_complete_plan = agent_plan_generator.is_complete_plan
+    assert is_complete_plan(PLAN)
+    assert not is_complete_plan(parse_json_response(TRUNCATED_PLAN))
+    assert not is_complete_plan({"main_task": "Answer", "subtasks": []})
+
+
+def test_truncated_plan_is_regenerated(agent_plan_generator, monkeypatch):
+    responses = iter([TRUNCATED_PLAN, json.dumps(PLAN)])
+    monkeypatch.setattr(agent_plan_generator, "call_model", lambda **kwargs: next(responses))
+    generator = agent_plan_generator.PlanGenerator([{"role": "user", "content": "Question"}], [], "model")
+    json_plan, _ = generator.generate_plan()
+    assert json_plan == PLAN
+
+
+def test_no_complete_plan_raises(agent_plan_generator, monkeypatch):
+    monkeypatch.setattr(agent_plan_generator, "call_model", lambda **kwargs: TRUNCATED_PLAN)
+    generator = agent_plan_generator.PlanGenerator([{"role": "user", "content": "Question"}], [], "model")
+    with pytest.raises(ValueError):
+        generator.generate_plan()
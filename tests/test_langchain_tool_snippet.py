@@ -0,0 +1,51 @@
+import logging
+import sys
+import types
+
+import pytest
+
+# langchain_community is only needed to load tools, not to look up the registered ones.
+if "langchain_community" not in sys.modules:
+    try:
+        import langchain_community.agent_toolkits.load_tools  # noqa: F401
+    except ImportError:
+        for module_name in ("langchain_community", "langchain_community.agent_toolkits", "langchain_community.agent_toolkits.load_tools"):
+            sys.modules.setdefault(module_name, types.ModuleType(module_name))
+        sys.modules["langchain_community.agent_toolkits.load_tools"].load_tools = lambda *args, **kwargs: []
+
+from code_agent.function_validator import FunctionValidator, NAMESPACE_NAMES
+from code_agent.langchain_tool_registry import get_langchain_tool, langchain_tool_registry
+from code_agent.tool_generator import LangChainToolConverter
+
+
+class FakeLangChainTool:
+    def run(self, tool_input):
+        return f"ran with {tool_input}"
+
+
+@pytest.fixture
+def registered_tool():
+    langchain_tool_registry.instances["fake_tool"] = (langchain_tool_registry.fingerprint(None), FakeLangChainTool())
+    yield
+    langchain_tool_registry.instances.pop("fake_tool", None)
+
+
+def test_generated_langchain_tool_snippet_validates_and_runs(registered_tool):
+    code_string = LangChainToolConverter.generate_code_example(
+        "fake_tool", {"query": {"description": "The query"}}, "string", "langchain_tool_fake_tool", {}
+    )
+
+    result = FunctionValidator("langchain_tool_fake_tool", [], 1, 2, {"query": "q"}).validate(code_string)
+    assert result["errors_for_regeneration"] == []
+
+    # Same namespace as SubtaskExecutor._execute_subtask_code
+    namespace = {
+        "logger": logging.getLogger(__name__),
+        "session_id": "test-session",
+        "socketio": None,
+        "get_langchain_tool": get_langchain_tool
+    }
+    assert set(namespace) == set(NAMESPACE_NAMES)
+    exec(result["code_string"], namespace)
+    output = namespace["langchain_tool_fake_tool"]({"query": "q"})
+    assert output["langchain_tool_fake_tool_output"].startswith("ran with")
@@ -0,0 +1,23 @@
+from code_agent.function_validator import PlanDataflowValidator
+
+FIRST = {
+    "subtask_name": "first",
+    "input_from_subtask": "",
+    "code": "def first():\n    updated_dict = {\"query\": \"q\"}\n    return updated_dict"
+}
+
+
+def test_missing_upstream_key_is_reported():
+    second = {
+        "subtask_name": "second",
+        "input_from_subtask": "first",
+        "code": "def second(previous_output):\n    updated_dict = previous_output.copy()\n    updated_dict[\"answer\"] = updated_dict.get(\"results\")\n    return updated_dict"
+    }
+    errors = PlanDataflowValidator([FIRST, second]).analyze()
+    assert list(errors) == ["second"]
+
+
+def test_input_error_is_kept_when_the_code_does_not_parse():
+    broken = {"subtask_name": "broken", "input_from_subtask": "unknown", "code": "def broken(previous_output:\n"}
+    errors = PlanDataflowValidator([FIRST, broken]).analyze()
+    assert "input_from_subtask 'unknown'" in errors["broken"][0]
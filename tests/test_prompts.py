@@ -0,0 +1,13 @@
+from textwrap import indent
+
+from code_agent.function_validator import NAMESPACE_NAMES
+from code_agent.prompts import CODE_SYSTEM_PROMPT, REGENERATE_SUBTASK_PROMPT, SUBTASK_CODE_RULES
+
+
+def test_code_rules_are_shared_by_the_planning_and_regeneration_prompts():
+    assert indent(SUBTASK_CODE_RULES, "      ") in CODE_SYSTEM_PROMPT.template
+    assert SUBTASK_CODE_RULES in REGENERATE_SUBTASK_PROMPT.template
+
+
+def test_code_rules_list_the_namespace_variables():
+    assert all(name in SUBTASK_CODE_RULES for name in NAMESPACE_NAMES)
@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+spacy = pytest.importorskip("spacy")
+if not spacy.util.is_package("en_core_web_sm"):
+    pytest.skip("en_core_web_sm is not installed", allow_module_level=True)
+
+from params import PARAMS
+from tools.rag.hybrid_vector_graph_rag.ingest_corpus import load_and_normalize_file, split_into_blocks
+from tools.rag.hybrid_vector_graph_rag.resources import HybridVectorGraphRagResources, pipe
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "..", "tools", "rag", "hybrid_vector_graph_rag", "corpus")
+
+
+@pytest.fixture(scope="module")
+def full_nlp():
+    return spacy.load("en_core_web_sm")
+
+
+@pytest.fixture(scope="module")
+def corpus_blocks():
+    blocks = []
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        content = load_and_normalize_file(os.path.join(CORPUS_DIR, filename))
+        if content:
+            blocks.extend(split_into_blocks(content, PARAMS["HYBRID_VECTOR_GRAPH_RAG_SENTENCE_BLOCK_CHARS"]))
+    assert blocks
+    return blocks
+
+
+def test_sentence_pipeline_matches_full_pipeline(monkeypatch, full_nlp, corpus_blocks):
+    monkeypatch.setitem(PARAMS, "HYBRID_VECTOR_GRAPH_RAG_SENTENCE_SEGMENTER", "parser")
+    sentence_nlp = HybridVectorGraphRagResources().get_sentence_nlp()
+    assert "ner" not in sentence_nlp.pipe_names and "lemmatizer" not in sentence_nlp.pipe_names
+
+    expected = [[sent.text for sent in full_nlp(block).sents] for block in corpus_blocks]
+    actual = [[sent.text for sent in doc.sents] for doc in pipe(sentence_nlp, corpus_blocks)]
+    assert actual == expected
+
+
+def test_senter_pipeline_loads_and_splits(monkeypatch, corpus_blocks):
+    monkeypatch.setitem(PARAMS, "HYBRID_VECTOR_GRAPH_RAG_SENTENCE_SEGMENTER", "senter")
+    sentence_nlp = HybridVectorGraphRagResources().get_sentence_nlp()
+    assert sentence_nlp.pipe_names == ["senter"]
+
+    docs = list(pipe(sentence_nlp, corpus_blocks))
+    assert all(len(list(doc.sents)) > 1 for doc in docs if len(doc) > 200)
+
+
+def test_lemma_pipeline_matches_full_pipeline(full_nlp, corpus_blocks):
+    lemma_nlp = HybridVectorGraphRagResources().get_nlp()
+    summaries = [block for text in corpus_blocks[:3] for block in split_into_blocks(text, 300)]
+
+    def lemmas(doc):
+        return [token.lemma_ for token in doc if not token.is_punct and not token.is_stop]
+
+    assert [lemmas(doc) for doc in pipe(lemma_nlp, summaries)] == [lemmas(full_nlp(summary)) for summary in summaries]
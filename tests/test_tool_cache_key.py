@@ -0,0 +1,34 @@
+from code_agent.agent_tool_cache import ToolCache
+
+CODE = '''
+def search(previous_output):
+    updated_dict = previous_output.copy()
+    query = updated_dict.get("query")
+    if "search_results" in updated_dict:
+        query += updated_dict["search_results"]
+    updated_dict["answer"] = query
+    return updated_dict
+'''
+
+OPEN_CODE = '''
+def search(previous_output):
+    updated_dict = previous_output.copy()
+    updated_dict["answer"] = str(updated_dict)
+    return updated_dict
+'''
+
+
+def test_read_input_keys():
+    assert ToolCache.read_input_keys(CODE) == ["query", "search_results"]
+    assert ToolCache.read_input_keys(OPEN_CODE) is None
+
+
+def test_cache_key_covers_every_key_read():
+    key = ToolCache.get_cache_key("web_search", CODE, {"query": "q", "search_results": "a", "session": "1"})
+    assert key == ToolCache.get_cache_key("web_search", CODE, {"query": "q", "search_results": "a", "session": "2"})
+    assert key != ToolCache.get_cache_key("web_search", CODE, {"query": "q", "search_results": "b", "session": "1"})
+
+
+def test_cache_key_covers_whole_input_when_reads_are_unknown():
+    key = ToolCache.get_cache_key("web_search", OPEN_CODE, {"query": "q", "other": "a"})
+    assert key != ToolCache.get_cache_key("web_search", OPEN_CODE, {"query": "q", "other": "b"})
@@ -9,6 +9,7 @@ CUSTOM_TOOLS = [
                     "lib_names": ["geopy"], 
                     "type": "standard_custom",
                     "instructions": "A library to get the coordinates of a given location.",
+                    "cache": {"ttl": 604800},
                     "code_example": """
 def get_coordinates(previous_output):
     from geopy.geocoders import Nominatim
@@ -18,6 +18,21 @@ from params import PARAMS
 
 logger = logging.getLogger(__name__)
 
+# The answers AdaptiveRetriever routes: a bare category, or Contextual followed by its <context>.
+QUERY_CATEGORY_PATTERN = re.compile(r"Factual|Analytical|Opinion|Contextual(<context>.*</context>)?", re.DOTALL)
+
+
+def is_valid_category(response: str) -> bool:
+    return bool(QUERY_CATEGORY_PATTERN.fullmatch(response.strip()))
+
+
+def is_valid_rank(response: str) -> bool:
+    try:
+        return 1 <= float(response.strip()) <= 10
+    except ValueError:
+        return False
+
+
 class QueryClassifier:
     def __init__(self, model: str):
         self.model = model
@@ -26,7 +41,9 @@ class QueryClassifier:
         prompt = ADAPTIVE_QUERY_CLASSIFIER_PROMPT.substitute(query=query)
         category = call_model(
             chat_history=[{"role": "user", "content": prompt}],
-            model=self.model
+            model=self.model,
+            validate=is_valid_category,
+            call_site="adaptive_rag_classifier"
         )
         return category
 
@@ -59,7 +76,9 @@ class FactualRetrievalStrategy(BaseRetrievalStrategy):
             )
             rank_response = call_model(
                 chat_history=[{"role": "user", "content": rank_prompt}],
-                model=self.model
+                model=self.model,
+                validate=is_valid_rank,
+                call_site="adaptive_rag_rank"
             )
             logger.info("Adaptive RAG process: 📚 Ranked response: %s", rank_response)
             try:
@@ -177,7 +196,9 @@ class ContextualRetrievalStrategy(BaseRetrievalStrategy):
             )
             rank_response = call_model(
                 chat_history=[{"role": "user", "content": rank_prompt}],
-                model=self.model
+                model=self.model,
+                validate=is_valid_rank,
+                call_site="adaptive_rag_rank"
             )
             try:
                 score = float(rank_response)
@@ -200,7 +221,7 @@ class AdaptiveRetriever:
         }
     
     def get_relevant_documents(self, query: str, user_context: str = None):
-        classifier_output = self.classifier.classify(query)
+        classifier_output = self.classifier.classify(query).strip()
         logger.info("--- Adaptive RAG process --- 🎯 Selected strategy: %s", classifier_output)
         
         if classifier_output.startswith("Contextual"):
@@ -214,7 +235,7 @@ class AdaptiveRetriever:
             strategy = self.strategies.get("Contextual")
             return strategy.retrieve(query, user_context=extracted_context)
         else:
-            category = classifier_output.strip()
+            category = classifier_output
             strategy = self.strategies.get(category, FactualRetrievalStrategy(self.classifier.model))
             return strategy.retrieve(query)
 
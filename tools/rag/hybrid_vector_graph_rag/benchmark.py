@@ -0,0 +1,261 @@
+"""
+Benchmarks of the Hybrid Vector Graph RAG ingestion.
+
+    python -m tools.rag.hybrid_vector_graph_rag.benchmark similarity [--nodes 10000 100000] [--new-chunks 100] [--ef-construction 100 200]
+    python -m tools.rag.hybrid_vector_graph_rag.benchmark writes [--nodes 2000] [--batch-sizes 100 1000]
+    python -m tools.rag.hybrid_vector_graph_rag.benchmark spacy [--summary-chars 300]
+
+similarity: time to find the similarity edges of a batch of new chunks against an existing graph, with the
+per-pair cosine similarity used before (measured on a sample of pairs and extrapolated) and with the batched
+kernel of ChunkVectorIndex. Random normalized embeddings of the ada-002 dimension are used. With hnswlib
+installed, the HNSW index is also measured for each ef_construction: the time to build it over the existing
+chunks (paid once, the index being kept across ingestions), the time to link the new chunks, and the share
+of the exact edges it finds.
+
+writes: Neo4j write throughput of chunk nodes and SIMILAR_TO edges, with one transaction per node or
+edge as done before and with the UNWIND batches of HybridVectorGraphRag. It needs the NEO4J_URI,
+NEO4J_USER and NEO4J_PASSWORD environment variables; the nodes are written under a throwaway corpus
+label, deleted at the end.
+
+spacy: SpaCy time on the corpus directory of the ingestion, with the full en_core_web_sm pipeline run
+on one text at a time as done before and with the trimmed pipelines and nlp.pipe batches of the ingestion.
+Sentence splitting runs on the corpus files, lemmatization on corpus blocks of about the summary length.
+"""
+import argparse
+import os
+import time
+import uuid
+import numpy as np
+from .vector_index import ChunkVectorIndex
+
+EMBEDDING_DIM = 1536
+
+
+def per_pair_cosine_similarity(vec1, vec2):
+    """
+    The former HybridVectorGraphRag.compute_cosine_similarity, kept as the baseline.
+    """
+    vec1 = np.array(vec1, dtype=float)
+    vec2 = np.array(vec2, dtype=float)
+    dot_product = np.dot(vec1, vec2)
+    norm1 = np.linalg.norm(vec1)
+    norm2 = np.linalg.norm(vec2)
+    if norm1 == 0.0 or norm2 == 0.0:
+        return 0.0
+    return dot_product / (norm1 * norm2)
+
+
+def benchmark_similarity(node_counts, new_chunks, threshold=0.9, block_size=256, baseline_pairs=2000, seed=0,
+                         ef_constructions=(100, 200), max_neighbors=100, m=16):
+    try:
+        import hnswlib  # noqa: F401
+    except ImportError:
+        print("hnswlib is not installed, the HNSW index is not measured.")
+        ef_constructions = ()
+    rng = np.random.default_rng(seed)
+    hnsw_rows = []
+    print(f"{'nodes':>8} {'new':>5} {'per-pair (est.)':>16} {'batched':>10} {'speedup':>9} {'edges':>7}")
+    for node_count in node_counts:
+        existing = ChunkVectorIndex.normalize(rng.standard_normal(size=(node_count, EMBEDDING_DIM), dtype=np.float32))
+        new = rng.standard_normal(size=(new_chunks, EMBEDDING_DIM), dtype=np.float32)
+        # Make some new chunks near-duplicates of existing ones, so that edges are created.
+        new[: new_chunks // 10] = existing[: new_chunks // 10] + 0.01 * new[: new_chunks // 10]
+        new_lists = new.tolist()
+
+        # Baseline: per-pair similarities on Python lists, as read from Neo4j.
+        sample = min(baseline_pairs, node_count)
+        sample_lists = existing[:sample].tolist()
+        start = time.perf_counter()
+        for old_embedding in sample_lists:
+            per_pair_cosine_similarity(new_lists[0], old_embedding)
+        per_pair_seconds = (time.perf_counter() - start) / sample * node_count * new_chunks
+
+        index = ChunkVectorIndex(initial_capacity=node_count + new_chunks)
+        index.add([f"old-{i}" for i in range(node_count)], existing)
+        start = time.perf_counter()
+        edges = index.link_new([f"new-{i}" for i in range(new_chunks)], new_lists, threshold, block_size)
+        batched_seconds = time.perf_counter() - start
+
+        print(
+            f"{node_count:>8} {new_chunks:>5} {per_pair_seconds:>15.2f}s {batched_seconds:>9.3f}s "
+            f"{per_pair_seconds / batched_seconds:>8.0f}x {len(edges):>7}"
+        )
+
+        exact_edges = {(source, target) for source, target, _ in edges}
+        for ef_construction in ef_constructions:
+            index = ChunkVectorIndex(
+                mode="hnsw", max_neighbors=max_neighbors, initial_capacity=node_count + new_chunks,
+                ef_construction=ef_construction, m=m
+            )
+            start = time.perf_counter()
+            index.add([f"old-{i}" for i in range(node_count)], existing)
+            build_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            hnsw_edges = index.link_new([f"new-{i}" for i in range(new_chunks)], new_lists, threshold, block_size)
+            link_seconds = time.perf_counter() - start
+            found = len(exact_edges & {(source, target) for source, target, _ in hnsw_edges})
+            recall = found / len(exact_edges) if exact_edges else 1.0
+            hnsw_rows.append((node_count, ef_construction, build_seconds, link_seconds, batched_seconds, recall))
+
+    if hnsw_rows:
+        print(f"\nHNSW (M={m}, max_neighbors={max_neighbors})")
+        print(f"{'nodes':>8} {'ef_constr.':>10} {'build':>10} {'link':>10} {'batched':>10} {'edge recall':>12}")
+        for node_count, ef_construction, build_seconds, link_seconds, batched_seconds, recall in hnsw_rows:
+            print(
+                f"{node_count:>8} {ef_construction:>10} {build_seconds:>9.2f}s {link_seconds:>9.3f}s "
+                f"{batched_seconds:>9.3f}s {recall:>11.1%}"
+            )
+
+
+def create_node_per_transaction(tx, node, color, corpus_label):
+    """
+    The former HybridVectorGraphRag._create_node, kept as the baseline.
+    """
+    query = f"""
+    MERGE (c:Chunk:{corpus_label} {{id: $chunk_id}})
+    SET c.lemmatized_summary = $lemmatized_summary,
+        c.embedding = $lemma_embedding,
+        c.color = $color
+    """
+    tx.run(query, chunk_id=node["id"], lemmatized_summary=node["lemmatized_summary"], lemma_embedding=node["embedding"], color=color)
+
+
+def create_edge_per_transaction(tx, edge):
+    """
+    The former per-edge SIMILAR_TO write, kept as the baseline.
+    """
+    query = """
+    MATCH (source:Chunk {id: $source_id})
+    MATCH (target:Chunk {id: $target_id})
+    MERGE (source)-[rel:SIMILAR_TO]->(target)
+    SET rel.weight = $weight
+    """
+    tx.run(query, **edge)
+
+
+def benchmark_writes(node_count, batch_sizes, edges_per_node=5, seed=0):
+    from neo4j import GraphDatabase
+    from .engine import HybridVectorGraphRag
+
+    rng = np.random.default_rng(seed)
+    embeddings = ChunkVectorIndex.normalize(rng.standard_normal(size=(node_count, EMBEDDING_DIM), dtype=np.float32))
+    driver = GraphDatabase.driver(os.environ["NEO4J_URI"], auth=(os.environ["NEO4J_USER"], os.environ["NEO4J_PASSWORD"]))
+
+    def run(label, write_nodes, write_edges):
+        corpus_label = "Corpus_benchmark_" + uuid.uuid4().hex
+        nodes = [
+            {"id": f"{corpus_label}-{i}", "lemmatized_summary": "benchmark chunk", "embedding": embedding}
+            for i, embedding in enumerate(embeddings.tolist())
+        ]
+        targets = rng.integers(0, node_count, size=(node_count, edges_per_node))
+        edges = [
+            {"source_id": nodes[i]["id"], "target_id": nodes[j]["id"], "weight": 0.9}
+            for i in range(node_count) for j in targets[i]
+        ]
+        try:
+            with driver.session() as session:
+                start = time.perf_counter()
+                write_nodes(session, nodes, corpus_label)
+                node_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                write_edges(session, edges)
+                edge_seconds = time.perf_counter() - start
+        finally:
+            with driver.session() as session:
+                session.run(f"MATCH (c:{corpus_label}) DETACH DELETE c")
+        print(
+            f"{label:>16} {len(nodes) / node_seconds:>12.0f} {len(edges) / edge_seconds:>12.0f}"
+        )
+
+    print(f"{node_count} nodes, {node_count * edges_per_node} edges")
+    print(f"{'writes':>16} {'nodes/sec':>12} {'edges/sec':>12}")
+    try:
+        run(
+            "per transaction",
+            lambda session, nodes, corpus_label: [
+                session.write_transaction(create_node_per_transaction, node, "#ffffff", corpus_label) for node in nodes
+            ],
+            lambda session, edges: [session.write_transaction(create_edge_per_transaction, edge) for edge in edges]
+        )
+        for batch_size in batch_sizes:
+            run(
+                f"UNWIND x {batch_size}",
+                lambda session, nodes, corpus_label: [
+                    session.write_transaction(HybridVectorGraphRag._create_nodes, nodes[i:i + batch_size], "#ffffff", corpus_label)
+                    for i in range(0, len(nodes), batch_size)
+                ],
+                lambda session, edges: [
+                    session.write_transaction(HybridVectorGraphRag._create_edges, edges[i:i + batch_size])
+                    for i in range(0, len(edges), batch_size)
+                ]
+            )
+    finally:
+        driver.close()
+
+
+def benchmark_spacy(summary_chars):
+    import spacy
+    from .ingest_corpus import load_and_normalize_file, split_into_blocks, format_sentences
+    from .resources import HybridVectorGraphRagResources, pipe
+
+    corpus_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+    contents = [
+        content for content in (
+            load_and_normalize_file(os.path.join(corpus_dir, filename)) for filename in sorted(os.listdir(corpus_dir))
+        ) if content
+    ]
+    summaries = [block for content in contents for block in split_into_blocks(content, summary_chars)]
+    print(f"{len(contents)} corpus files ({sum(len(content) for content in contents)} chars), {len(summaries)} summary-sized texts")
+
+    full_nlp = spacy.load("en_core_web_sm")
+    resources = HybridVectorGraphRagResources()
+    sentence_nlp, lemma_nlp = resources.get_sentence_nlp(), resources.get_nlp()
+    print(f"sentence components: {sentence_nlp.pipe_names}, lemma components: {lemma_nlp.pipe_names}")
+
+    def timed(function):
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+
+    rows = [
+        (
+            "sentences",
+            timed(lambda: [list(full_nlp(content).sents) for content in contents]),
+            timed(lambda: format_sentences(contents, sentence_nlp))
+        ),
+        (
+            "lemmas",
+            timed(lambda: [[token.lemma_ for token in full_nlp(summary)] for summary in summaries]),
+            timed(lambda: [[token.lemma_ for token in doc] for doc in pipe(lemma_nlp, summaries)])
+        ),
+    ]
+    print(f"{'step':>10} {'full, one by one':>17} {'trimmed, piped':>15} {'speedup':>8}")
+    for step, full_seconds, trimmed_seconds in rows:
+        print(f"{step:>10} {full_seconds:>16.2f}s {trimmed_seconds:>14.2f}s {full_seconds / trimmed_seconds:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the Hybrid Vector Graph RAG ingestion.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    similarity = subparsers.add_parser("similarity", help="Similarity edge search, per-pair vs batched.")
+    similarity.add_argument("--nodes", type=int, nargs="+", default=[10000, 100000])
+    similarity.add_argument("--new-chunks", type=int, default=100)
+    similarity.add_argument("--block-size", type=int, default=256)
+    similarity.add_argument("--ef-construction", type=int, nargs="+", default=[100, 200])
+    writes = subparsers.add_parser("writes", help="Neo4j node and edge writes, per transaction vs UNWIND batches.")
+    writes.add_argument("--nodes", type=int, default=2000)
+    writes.add_argument("--batch-sizes", type=int, nargs="+", default=[100, 1000])
+    spacy_parser = subparsers.add_parser("spacy", help="Sentence splitting and lemmatization, full pipeline vs trimmed and piped.")
+    spacy_parser.add_argument("--summary-chars", type=int, default=300)
+    args = parser.parse_args()
+
+    if args.benchmark == "similarity":
+        benchmark_similarity(args.nodes, args.new_chunks, block_size=args.block_size, ef_constructions=args.ef_construction)
+    elif args.benchmark == "writes":
+        benchmark_writes(args.nodes, args.batch_sizes)
+    elif args.benchmark == "spacy":
+        benchmark_spacy(args.summary_chars)
+
+
+if __name__ == "__main__":
+    main()
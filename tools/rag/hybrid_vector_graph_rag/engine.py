@@ -1,16 +1,20 @@
-import os
-import re
+import time
 import uuid 
 import random  
 import json
 import logging
 import chromadb
 from uuid import uuid4
-from models.models import create_embeddings, call_model
-from neo4j import GraphDatabase, exceptions
-import spacy
+from concurrent.futures import ThreadPoolExecutor
+from models.models import create_embeddings, call_model, usage_tracker
+from models.json_repair import parse_json_response
+from models.deadline import call_timeout, check_deadline, current_deadline, set_current_deadline
+from neo4j import unit_of_work
 import numpy as np
 from params import PARAMS
+from code_agent.agent_run_budget import scaled_top_k
+from .vector_index import ChunkVectorIndex
+from .resources import hybrid_vector_graph_rag_resources, pipe
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -21,7 +25,7 @@ logger.setLevel(logging.DEBUG)
 class HybridVectorGraphRag:
     def __init__(self):
         """
-        Constructor: Initializes ChromaDB client, Neo4j driver, loads SpaCy, and sets up logging.
+        Constructor: Initializes ChromaDB client, gets the shared Neo4j driver and SpaCy model, and sets up logging.
         """
         self.logger = logging.getLogger(__name__)
         self.embedding_vector_model = PARAMS["HYBRID_VECTOR_GRAPH_RAG_EMBEDDING_VECTOR_MODEL"]
@@ -39,32 +43,28 @@ class HybridVectorGraphRag:
         except TypeError as e:
             raise RuntimeError(f"Error initializing Chroma client: {e}")
 
-        # Initialize Neo4j driver
-        neo4j_uri = os.getenv("NEO4J_URI")
-        neo4j_user = os.getenv("NEO4J_USER")
-        neo4j_password = os.getenv("NEO4J_PASSWORD")
-        if not all([neo4j_uri, neo4j_user, neo4j_password]):
-            raise EnvironmentError("Neo4j connection details are not fully set in environment variables.")
-
-        try:
-            self.neo4j_driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
-            self.logger.debug("Neo4j driver initialized successfully.")
-        except exceptions.Neo4jError as e:
-            raise RuntimeError(f"Error initializing Neo4j driver: {e}")
-
-        # Ensure Neo4j constraints and indexes are in place
-        self._setup_neo4j_constraints()
+        # Shared Neo4j driver (connection pool), with the constraints and indexes set up on first use
+        hybrid_vector_graph_rag_resources.get_neo4j_driver()
 
         # Create or get an existing collection in ChromaDB
         self.collection = self.client.get_or_create_collection(name=self.collection_name)
 
-        # Initialize SpaCy (choose a model that has vectors if you want to rely on built-in similarity)
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-            self.logger.debug("SpaCy model loaded successfully.")
-        except Exception as e:
-            self.logger.error(f"Error loading SpaCy model: {e}")
-            raise RuntimeError(f"SpaCy model loading failed: {e}")
+        # Shared SpaCy model, trimmed to the lemmatization components
+        self.nlp = hybrid_vector_graph_rag_resources.get_nlp()
+
+    @staticmethod
+    def timed(transaction_function, operation: str):
+        """
+        Gives a transaction function the NEO4J_QUERY_TIMEOUT, shortened to the time left before
+        the current deadline.
+
+        :raises DeadlineExceeded: If the current deadline has already expired.
+        """
+        return unit_of_work(timeout=call_timeout(PARAMS["NEO4J_QUERY_TIMEOUT"], operation))(transaction_function)
+
+    @property
+    def neo4j_driver(self):
+        return hybrid_vector_graph_rag_resources.get_neo4j_driver()
 
     @staticmethod
     def generate_random_hex_color():
@@ -80,31 +80,6 @@ class HybridVectorGraphRag:
         """
         return str(uuid.uuid4())
 
-    def _setup_neo4j_constraints(self):
-        """
-        Sets up necessary constraints and indexes in Neo4j to ensure data integrity and query performance.
-        """
-        with self.neo4j_driver.session() as session:
-            try:
-                # Ensure the 'id' property is unique for Chunk nodes
-                session.run("""
-                CREATE CONSTRAINT chunk_id_unique_constraint IF NOT EXISTS
-                FOR (c:Chunk)
-                REQUIRE c.id IS UNIQUE
-                """)
-                self.logger.debug("Ensured unique constraint on Chunk.id.")
-
-                # Ensure an index on the 'id' property for faster lookups
-                session.run("""
-                CREATE INDEX chunk_id_index IF NOT EXISTS
-                FOR (c:Chunk)
-                ON (c.id)
-                """)
-                self.logger.debug("Ensured index on Chunk.id.")
-            except exceptions.Neo4jError as e:
-                self.logger.error(f"Error setting up Neo4j constraints/indexes: {e}")
-                raise RuntimeError(f"Neo4j constraints/indexes setup failed: {e}")
-
     def split_text_into_chunks(self, text, max_chars, overlap):
         """
         Splits a large text into smaller chunks with a specified max length and optional overlap.
@@ -143,29 +118,70 @@ class HybridVectorGraphRag:
             self.logger.error(f"Error during summarization: {e}")
             raise RuntimeError(f"Summarization failed: {e}")
 
+    def summarize_texts(self, texts: list[str]) -> list[str]:
+        """
+        Summarizes the texts concurrently, with at most HYBRID_VECTOR_GRAPH_RAG_SUMMARY_WORKERS
+        model calls in flight. The summaries are returned in the order of the texts.
+        """
+        # The workers make their calls under the caller's deadline and count their tokens in its scopes.
+        scopes = usage_tracker.current_scopes()
+        deadline = current_deadline()
+
+        def summarize(text):
+            usage_tracker.adopt_scopes(scopes)
+            set_current_deadline(deadline)
+            return self.summarize_text(text)
+
+        with ThreadPoolExecutor(max_workers=PARAMS["HYBRID_VECTOR_GRAPH_RAG_SUMMARY_WORKERS"]) as executor:
+            return list(executor.map(summarize, texts))
+
     def lemmatize_text(self, text: str) -> str:
         """
         Lemmatizes the given text using SpaCy.
         """
-        doc = self.nlp(text)
-        lemmatized = ' '.join([token.lemma_ for token in doc if not token.is_punct and not token.is_stop])
-        return lemmatized
+        return self.lemmatize_texts([text])[0]
+
+    def lemmatize_texts(self, texts: list[str]) -> list[str]:
+        """
+        Lemmatizes the texts in batches with SpaCy's nlp.pipe (in several processes for large corpora).
+        """
+        return [
+            ' '.join([token.lemma_ for token in doc if not token.is_punct and not token.is_stop])
+            for doc in pipe(self.nlp, texts)
+        ]
+
+    def embed_texts(self, texts: list[str]) -> list:
+        """
+        Creates the embeddings of the texts with one request per HYBRID_VECTOR_GRAPH_RAG_EMBEDDING_BATCH_SIZE texts.
+        The embeddings of a failed batch are None.
+        """
+        batch_size = PARAMS["HYBRID_VECTOR_GRAPH_RAG_EMBEDDING_BATCH_SIZE"]
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            try:
+                embeddings.extend(create_embeddings(batch, model=self.embedding_vector_model))
+            except Exception as e:
+                self.logger.error(f"Error creating embeddings for lemmatized summaries {start}-{start + len(batch) - 1}: {e}")
+                embeddings.extend([None] * len(batch))
+        return embeddings
 
     def ingest(self, texts: list[str]):
         """
         Main method to:
           1) Split text into chunks,
           2) Create embeddings of full chunks for ChromaDB,
-          3) Summarize & lemmatize each chunk,
-          4) Create embeddings of the lemmatized summary,
+          3) Summarize (concurrently) & lemmatize (in batches) each chunk,
+          4) Create embeddings of the lemmatized summaries, in batches,
           5) Create a node for each chunk in Neo4j storing summary + embedding + color + Corpus_<id> label,
-          6) Create similarity edges to existing nodes in Neo4j.
+          6) Create similarity edges to existing nodes in Neo4j, found with an in-process vector index.
         """
         max_chars = PARAMS["HYBRID_VECTOR_GRAPH_RAG_CHUNK_SIZE"]
         overlap = PARAMS["HYBRID_VECTOR_GRAPH_RAG_OVERLAP"]
 
         if not texts:
             raise ValueError("No texts provided for ingestion.")
+        ingest_start = time.perf_counter()
 
         # 1) Split text into chunks
         all_chunks = []
@@ -228,159 +244,265 @@ class HybridVectorGraphRag:
             self.logger.error(f"Error adding documents to ChromaDB: {e}")
             raise RuntimeError(f"ChromaDB ingestion failed: {e}")
 
-        # 4) Summarize & lemmatize each chunk, create lemma embeddings, store in Neo4j
-        with self.neo4j_driver.session() as session:
-            for doc, chunk_embedding in zip(docs, embeddings):
-                chunk_id = doc['id']
-                text = doc['text']
+        # Vector index of the existing chunks, built on the first ingestion and updated on the next ones
+        try:
+            with hybrid_vector_graph_rag_resources.edge_index_lock:
+                self.sync_edge_index()
+        except Exception as e:
+            self.logger.error(f"Error retrieving existing chunks from Neo4j: {e}")
+            raise RuntimeError(f"Edge index loading failed: {e}")
+
+        # 4) Summarize & lemmatize each chunk, create lemma embeddings
+        summaries = self.summarize_texts([doc['text'] for doc in docs])
+        lemmatized_summaries = self.lemmatize_texts(summaries)
+        lemma_embeddings = self.embed_texts(lemmatized_summaries)
+
+        # 5) Create nodes in Neo4j with summary + lemma embedding + color + Corpus_<id> label
+        nodes = []
+        for doc, lemmatized_summary, lemma_embedding in zip(docs, lemmatized_summaries, lemma_embeddings):
+            if lemma_embedding is None:
+                continue  # Skip this chunk
+            nodes.append({
+                "id": doc['id'],
+                "lemmatized_summary": lemmatized_summary,
+                # Stored pre-normalized, so that cosine similarities are plain dot products
+                "embedding": ChunkVectorIndex.normalize(lemma_embedding)[0].tolist()
+            })
+        new_chunks = self.write_nodes(nodes, color, corpus_label)
 
-                # Summarize
-                summary = self.summarize_text(text)
+        # 6) Create similarity edges with existing nodes and between the new ones
+        try:
+            self.create_similarity_edges(new_chunks)
+        except Exception as e:
+            self.logger.error(f"Error creating similarity edges: {e}")
 
-                # Lemmatize summary
-                lemmatized_summary = self.lemmatize_text(summary)
+        elapsed = time.perf_counter() - ingest_start
+        chunks_per_second = len(docs) / elapsed if elapsed else 0.0
+        self.logger.info(f"Ingested {len(docs)} chunks in {elapsed:.1f}s ({chunks_per_second:.2f} chunks/sec).")
 
-                # 4b) Create an embedding of the lemmatized summary
-                try:
-                    lemma_embedding = create_embeddings(
-                        [lemmatized_summary],
-                        model=self.embedding_vector_model
-                    )[0]  # returns a list of embeddings, take the first
-                except Exception as e:
-                    self.logger.error(f"Error creating embedding for lemmatized summary: {e}")
-                    continue  # Skip this chunk
+        return {
+            "status": "success",
+            "message": f"Successfully ingested {len(docs)} documents into ChromaDB and Neo4j graph.",
+            "chunks_per_second": chunks_per_second
+        }
 
-                # 5) Create node in Neo4j with summary + lemma embedding + color + Corpus_<id> label
-                try:
-                    session.write_transaction(
-                        self._create_node,
-                        chunk_id,
-                        lemmatized_summary,
-                        lemma_embedding,
-                        color,        # Pass the assigned color
-                        corpus_label  # Pass the corpus label
-                    )
-                    self.logger.debug(f"Created Neo4j node for chunk ID: {chunk_id} with color {color} and label {corpus_label}")
-                except Exception as e:
-                    self.logger.error(f"Error creating node in Neo4j for chunk ID {chunk_id}: {e}")
-                    continue  # Skip creating edges for this chunk
+    def write_nodes(self, nodes: list[dict], color: str, corpus_label: str) -> list[tuple]:
+        """
+        Creates the Chunk nodes with one UNWIND query per HYBRID_VECTOR_GRAPH_RAG_WRITE_BATCH_SIZE nodes.
+        The nodes of a failed batch are skipped.
 
-                # 6) Create similarity edges with existing nodes
+        :param nodes: List of {id, lemmatized_summary, embedding} of the chunks.
+        :return: List of (chunk_id, lemma_embedding) of the nodes created.
+        """
+        batch_size = PARAMS["HYBRID_VECTOR_GRAPH_RAG_WRITE_BATCH_SIZE"]
+        written = []
+        with self.neo4j_driver.session() as session:
+            for start in range(0, len(nodes), batch_size):
+                batch = nodes[start:start + batch_size]
+                create_nodes = self.timed(self._create_nodes, "creating chunk nodes")
                 try:
-                    self.create_similarity_edges_for_new_chunk(chunk_id, lemma_embedding)
+                    session.write_transaction(create_nodes, batch, color, corpus_label)
+                    self.logger.debug(f"Created {len(batch)} Neo4j nodes with color {color} and label {corpus_label}")
                 except Exception as e:
-                    self.logger.error(f"Error creating similarity edges for chunk ID {chunk_id}: {e}")
-                    continue  # Proceed with next chunk
-
-        self.close_neo4j_driver()
-
-        return {
-            "status": "success",
-            "message": f"Successfully ingested {len(docs)} documents into ChromaDB and Neo4j graph."
-        }
+                    self.logger.error(f"Error creating nodes in Neo4j for chunks {start}-{start + len(batch) - 1}: {e}")
+                    continue  # Skip creating edges for these chunks
+                written.extend((node["id"], node["embedding"]) for node in batch)
+        return written
 
     @staticmethod
-    def _create_node(tx, chunk_id, lemmatized_summary, lemma_embedding, color, corpus_label):
+    def _create_nodes(tx, nodes: list[dict], color, corpus_label):
         """
-        Creates or merges a Chunk node with a static label and a dynamic corpus label,
-        storing the lemmatized summary, embedding, and color.
+        Creates or merges a Chunk node with a static label and a dynamic corpus label for each
+        {id, lemmatized_summary, embedding} of nodes, in a single query, storing the lemmatized
+        summary, embedding, and color.
         """
         # Construct the Cypher query with both static and dynamic labels
         query = f"""
-        MERGE (c:Chunk:{corpus_label} {{id: $chunk_id}})
-        SET c.lemmatized_summary = $lemmatized_summary,
-            c.embedding = $lemma_embedding,
+        UNWIND $nodes AS node
+        MERGE (c:Chunk:{corpus_label} {{id: node.id}})
+        SET c.lemmatized_summary = node.lemmatized_summary,
+            c.embedding = node.embedding,
             c.color = $color
         """
-        tx.run(query, chunk_id=chunk_id, lemmatized_summary=lemmatized_summary, lemma_embedding=lemma_embedding, color=color)
+        tx.run(query, nodes=nodes, color=color)
 
-    def create_similarity_edges_for_new_chunk(self, new_chunk_id: str, new_lemma_embedding: list[float]):
+    def sync_edge_index(self, exclude_ids=frozenset()) -> ChunkVectorIndex:
         """
-        Creates new 'SIMILAR_TO' edges from the newly created chunk node to all
-        existing chunks in Neo4j if the cosine similarity of embeddings > threshold.
+        Brings the shared vector index of the chunk embeddings up to date with the Chunk nodes of Neo4j.
+        The first call reads all the embeddings. The next ones only read the chunk ids, then the embeddings
+        of the chunks not indexed yet (e.g. ingested by another process); the index is read again in full
+        only if indexed chunks were deleted. Must be called with the edge_index_lock of the resources held.
+
+        :param exclude_ids: Ids of chunks not to index, the new chunks about to be linked.
+        :return: The shared edge index.
         """
+        resources = hybrid_vector_graph_rag_resources
+        edge_index = resources.edge_index
+        if edge_index is not None:
+            with self.neo4j_driver.session() as session:
+                chunk_ids = set(session.read_transaction(self.timed(self._get_all_chunk_ids, "reading the chunk ids")))
+            if not edge_index.id_set <= chunk_ids:
+                self.logger.info("Indexed chunks were deleted from Neo4j, rebuilding the edge index.")
+                edge_index = None
+            else:
+                missing_ids = [chunk_id for chunk_id in chunk_ids if chunk_id not in edge_index and chunk_id not in exclude_ids]
+                if missing_ids:
+                    edge_index.add(*self.read_chunk_embeddings(missing_ids))
+                mode = self.get_edge_index_mode(len(edge_index))
+                if mode != edge_index.requested_mode:
+                    edge_index = edge_index.with_mode(mode)
+        if edge_index is None:
+            edge_index = self.load_edge_index(exclude_ids)
+        resources.edge_index = edge_index
+        return edge_index
 
-        threshold = PARAMS["HYBRID_VECTOR_GRAPH_RAG_SIMILARITY_EDGE_THRESHOLD"]
+    @staticmethod
+    def get_edge_index_mode(chunk_count: int) -> str:
+        mode = PARAMS["HYBRID_VECTOR_GRAPH_RAG_EDGE_INDEX"]
+        if mode == "auto":
+            mode = "hnsw" if chunk_count >= PARAMS["HYBRID_VECTOR_GRAPH_RAG_HNSW_MIN_NODES"] else "exact"
+        return mode
+
+    def load_edge_index(self, exclude_ids=frozenset()) -> ChunkVectorIndex:
+        """
+        Builds the in-process vector index of the lemma embeddings of all the Chunk nodes,
+        read from Neo4j with a single query.
+        """
+        ids, embeddings = self.read_chunk_embeddings(exclude_ids=exclude_ids)
+        edge_index = ChunkVectorIndex(
+            mode=self.get_edge_index_mode(len(ids)),
+            max_neighbors=PARAMS["HYBRID_VECTOR_GRAPH_RAG_HNSW_MAX_NEIGHBORS"],
+            ef_construction=PARAMS["HYBRID_VECTOR_GRAPH_RAG_HNSW_EF_CONSTRUCTION"],
+            m=PARAMS["HYBRID_VECTOR_GRAPH_RAG_HNSW_M"]
+        )
+        edge_index.add(ids, embeddings)
+        self.logger.debug(f"Loaded {len(edge_index)} chunk embeddings into the {edge_index.mode} edge index.")
+        return edge_index
 
-        with self.neo4j_driver.session() as session:
-            try:
-                # 1) Get all other chunks (id, embedding) except the new one
-                existing_chunks = session.read_transaction(self._get_all_other_chunks, new_chunk_id)
-            except Exception as e:
-                self.logger.error(f"Error retrieving existing chunks from Neo4j: {e}")
-                return  # Exit the method
+    def read_chunk_embeddings(self, chunk_ids: list[str] = None, exclude_ids=frozenset()):
+        """
+        Reads the lemma embeddings of the given Chunk nodes, or of all of them, skipping the invalid ones.
 
+        :return: A tuple (ids, embeddings).
+        """
+        with self.neo4j_driver.session() as session:
+            if chunk_ids is None:
+                existing_chunks = session.read_transaction(self.timed(self._get_all_chunk_embeddings, "reading the chunk embeddings"))
+            else:
+                existing_chunks = []
+                batch_size = PARAMS["HYBRID_VECTOR_GRAPH_RAG_WRITE_BATCH_SIZE"]
+                for start in range(0, len(chunk_ids), batch_size):
+                    existing_chunks.extend(session.read_transaction(
+                        self.timed(self._get_chunk_embeddings, "reading the chunk embeddings"), chunk_ids[start:start + batch_size]
+                    ))
+
+        ids, embeddings = [], []
         for chunk_record in existing_chunks:
-            old_chunk_id = chunk_record["id"]
-            old_embedding = chunk_record["embedding"] or []
-
-            # Validate that old_chunk_id is a string and old_embedding is a list
-            if not isinstance(old_chunk_id, str):
-                self.logger.warning(f"Skipping chunk with invalid id type: {old_chunk_id}")
+            chunk_id = chunk_record["id"]
+            embedding = chunk_record["embedding"] or []
+            # Validate that chunk_id is a string and embedding is a non-empty list of numbers
+            if not isinstance(chunk_id, str):
+                self.logger.warning(f"Skipping chunk with invalid id type: {chunk_id}")
                 continue
-            if not isinstance(old_embedding, list) or not all(isinstance(x, (int, float)) for x in old_embedding):
-                self.logger.warning(f"Skipping chunk with invalid embedding: {old_chunk_id}")
+            # The values themselves are checked by the numpy conversion of the index
+            if not embedding or not isinstance(embedding, list) or (embeddings and len(embedding) != len(embeddings[0])):
+                self.logger.warning(f"Skipping chunk with invalid embedding: {chunk_id}")
                 continue
+            if chunk_id in exclude_ids:
+                continue
+            ids.append(chunk_id)
+            embeddings.append(embedding)
+        return ids, embeddings
+
+    def create_similarity_edges(self, new_chunks: list[tuple]):
+        """
+        Creates new 'SIMILAR_TO' edges from each newly created chunk node to the existing chunks
+        (and the new chunks created before it) if the cosine similarity of embeddings >= threshold.
+        The similarities are computed in blocks against the shared edge index, which the new chunks
+        are then added to, and the edges are written with one query per HYBRID_VECTOR_GRAPH_RAG_WRITE_BATCH_SIZE edges.
+
+        :param new_chunks: List of (chunk_id, lemma_embedding) of the new chunk nodes.
+        """
 
-            if old_embedding:  # ensure we have an embedding to compare
-                sim_score = self.compute_cosine_similarity(new_lemma_embedding, old_embedding)
-
-                # 2) If similarity is above threshold, create or merge a relationship
-                if sim_score >= threshold:
-                    try:
-                        with self.neo4j_driver.session() as session:
-                            session.write_transaction(
-                                self._create_edge,
-                                new_chunk_id,
-                                old_chunk_id,
-                                sim_score
-                            )
-                        self.logger.debug(
-                            f"Created SIMILAR_TO edge from {new_chunk_id} --> {old_chunk_id} with weight={sim_score:.3f}"
-                        )
-                    except Exception as e:
-                        self.logger.error(f"Error creating SIMILAR_TO edge between {new_chunk_id} and {old_chunk_id}: {e}")
-                        continue  # Proceed with next chunk
+        threshold = PARAMS["HYBRID_VECTOR_GRAPH_RAG_SIMILARITY_EDGE_THRESHOLD"]
+        new_ids = [chunk_id for chunk_id, _ in new_chunks]
+
+        # Concurrent ingestions link their chunks one after the other, each against the chunks of the previous ones.
+        with hybrid_vector_graph_rag_resources.edge_index_lock:
+            edge_index = self.sync_edge_index(exclude_ids=set(new_ids))
+            edges = edge_index.link_new(
+                new_ids,
+                [lemma_embedding for _, lemma_embedding in new_chunks],
+                threshold,
+                block_size=PARAMS["HYBRID_VECTOR_GRAPH_RAG_SIMILARITY_BLOCK_SIZE"]
+            )
+        if not edges:
+            return
+
+        self.write_edges([
+            {"source_id": source_id, "target_id": target_id, "weight": weight}
+            for source_id, target_id, weight in edges
+        ])
+        self.logger.debug(f"Created {len(edges)} SIMILAR_TO edges for {len(new_chunks)} new chunks.")
+
+    def write_edges(self, edges: list[dict]):
+        """
+        Creates the SIMILAR_TO edges with one UNWIND query per HYBRID_VECTOR_GRAPH_RAG_WRITE_BATCH_SIZE edges.
+
+        :param edges: List of {source_id, target_id, weight} of the edges.
+        """
+        batch_size = PARAMS["HYBRID_VECTOR_GRAPH_RAG_WRITE_BATCH_SIZE"]
+        with self.neo4j_driver.session() as session:
+            for start in range(0, len(edges), batch_size):
+                session.write_transaction(self.timed(self._create_edges, "creating similarity edges"), edges[start:start + batch_size])
 
     @staticmethod
-    def _get_all_other_chunks(tx, new_chunk_id: str):
+    def _get_all_chunk_ids(tx):
+        """
+        Retrieves the id of all existing Chunk nodes.
         """
-        Retrieves the id and embedding of all existing Chunk nodes except the newly added chunk.
+        result = tx.run("MATCH (c:Chunk) RETURN c.id as id")
+        return [record["id"] for record in result]
+
+    @staticmethod
+    def _get_chunk_embeddings(tx, chunk_ids: list[str]):
+        """
+        Retrieves the id and embedding of the given Chunk nodes.
         """
         query = """
-        MATCH (c:Chunk)
-        WHERE c.id <> $new_chunk_id
+        UNWIND $chunk_ids AS chunk_id
+        MATCH (c:Chunk {id: chunk_id})
         RETURN c.id as id, c.embedding as embedding
         """
-        result = tx.run(query, new_chunk_id=new_chunk_id)
+        result = tx.run(query, chunk_ids=chunk_ids)
         return [record for record in result]
 
     @staticmethod
-    def compute_cosine_similarity(vec1, vec2):
+    def _get_all_chunk_embeddings(tx):
         """
-        Computes the cosine similarity between two vectors (lists or np.ndarrays).
+        Retrieves the id and embedding of all existing Chunk nodes.
         """
-        vec1 = np.array(vec1, dtype=float)
-        vec2 = np.array(vec2, dtype=float)
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
-        if norm1 == 0.0 or norm2 == 0.0:
-            return 0.0
-        return dot_product / (norm1 * norm2) 
+        query = """
+        MATCH (c:Chunk)
+        RETURN c.id as id, c.embedding as embedding
+        """
+        result = tx.run(query)
+        return [record for record in result]
 
     @staticmethod
-    def _create_edge(tx, source_id: str, target_id: str, weight: float):
+    def _create_edges(tx, edges: list[dict]):
         """
-        Creates or merges a 'SIMILAR_TO' relationship with a 'weight' property.
+        Creates or merges the 'SIMILAR_TO' relationships (with a 'weight' property) of each
+        {source_id, target_id, weight} of edges, in a single query.
         """
         query = """
-        MATCH (source:Chunk {id: $source_id})
-        MATCH (target:Chunk {id: $target_id})
+        UNWIND $edges AS edge
+        MATCH (source:Chunk {id: edge.source_id})
+        MATCH (target:Chunk {id: edge.target_id})
         MERGE (source)-[rel:SIMILAR_TO]->(target)
-        SET rel.weight = $weight
+        SET rel.weight = edge.weight
         """
-        tx.run(query, source_id=source_id, target_id=target_id, weight=weight)
+        tx.run(query, edges=edges)
 
     def retrieve(
         self, 
@@ -398,7 +520,7 @@ class HybridVectorGraphRag:
 
         threshold = PARAMS["HYBRID_VECTOR_GRAPH_RAG_SIMILARITY_RETRIEVE_THRESHOLD"]
         max_depth = PARAMS["HYBRID_VECTOR_GRAPH_RAG_QUERY_MAX_DEPTH"]
-        top_k = PARAMS["HYBRID_VECTOR_GRAPH_RAG_QUERY_TOP_K"]
+        top_k = scaled_top_k(PARAMS["HYBRID_VECTOR_GRAPH_RAG_QUERY_TOP_K"])
         max_context_length = PARAMS["HYBRID_VECTOR_GRAPH_RAG_QUERY_MAX_CONTEXT_LENGTH"]
 
         # ----------------------------------------------------------------------------
@@ -413,6 +535,7 @@ class HybridVectorGraphRag:
             self.logger.error(f"Error creating embedding for user query: {e}")
             raise RuntimeError("Query embedding failed") from e
 
+        check_deadline("querying ChromaDB")
         try:
             results = self.collection.query(query_embeddings=[query_embedding], n_results=top_k)
             self.logger.info(f"Retrieved top {top_k} chunks from ChromaDB based on query similarity.")
@@ -425,64 +548,34 @@ class HybridVectorGraphRag:
         initial_texts = results["documents"][0]  # list of retrieved doc texts
 
         # ----------------------------------------------------------------------------
-        # Step 2) Initialize BFS queue with the retrieved chunk IDs
+        # Step 2) Initialize the BFS frontier and the context buffer with the retrieved chunks
         # ----------------------------------------------------------------------------
-        visited = set()
-        queue = []
+        frontier = list(dict.fromkeys(initial_ids))
+        visited = set(frontier)
 
-        # Each element in queue: (chunk_id, depth)
-        for chunk_id in initial_ids:
-            queue.append((chunk_id, 0))
-        visited.update(initial_ids)
+        # Texts of the discovered chunks, in discovery order. Only the texts of newly
+        # discovered chunks are fetched from ChromaDB.
+        context_texts = dict(zip(initial_ids, initial_texts))
 
-        # Keep track of *all* discovered chunk IDs
-        all_related_chunk_ids = set(initial_ids)
-
-        self.logger.info(f"Initialized BFS queue with {len(initial_ids)} chunks from initial retrieval.")
+        self.logger.info(f"Initialized BFS frontier with {len(frontier)} chunks from initial retrieval.")
 
         # ----------------------------------------------------------------------------
         # Step 3) BFS loop with iterative LLM check after each “layer”
         # ----------------------------------------------------------------------------
         current_depth = 0
 
-        while current_depth <= max_depth and queue:
-            # Gather all chunk IDs at this depth
-            current_layer_ids = []
-            while queue and queue[0][1] == current_depth:
-                node_id, depth = queue.pop(0)
-                if depth == current_depth:
-                    current_layer_ids.append(node_id)
-
-            if not current_layer_ids:
-                # No nodes at this depth, so we can break early.
-                break
-
-            self.logger.info(f"Processing BFS depth {current_depth}, with {len(current_layer_ids)} node(s) at this level.")
+        while current_depth <= max_depth and frontier:
+            self.logger.info(f"Processing BFS depth {current_depth}, with {len(frontier)} node(s) at this level.")
 
             # ------------------------------------------------------------------------
-            # (a) Retrieve the text from ChromaDB for all nodes visited so far
+            # (a) Add the text of the chunks of this layer to the context
             # ------------------------------------------------------------------------
-            all_related_chunk_ids.update(current_layer_ids)
-            all_related_chunk_ids_list = list(all_related_chunk_ids)
-
-            # Retrieve from ChromaDB
-            try:
-                retrieved_context = self.collection.get(ids=all_related_chunk_ids_list)
-                self.logger.debug(f"Retrieved context for {len(all_related_chunk_ids_list)} total chunks so far.")
-            except Exception as e:
-                self.logger.error(f"Error retrieving chunks by ID: {e}")
-                retrieved_context = None
-
-            if not retrieved_context or "documents" not in retrieved_context:
-                self.logger.warning("No context found or missing 'documents' in retrieval.")
-                combined_context_texts = initial_texts  # fallback
-            else:
-                combined_context_texts = retrieved_context["documents"]
+            self._fetch_context_texts(frontier, context_texts)
 
             # ------------------------------------------------------------------------
             # (b) Check if the context so far is enough using an LLM meta-prompt
             # ------------------------------------------------------------------------
-            full_context = "\n\n".join(combined_context_texts)
+            full_context = "\n\n".join(context_texts.values())
             if len(full_context) > max_context_length:
                 full_context = full_context[:max_context_length] + "...[truncated]"
 
@@ -493,24 +586,18 @@ class HybridVectorGraphRag:
                 break
 
             # ------------------------------------------------------------------------
-            # (c) If not enough, expand BFS to the next depth level
+            # (c) If not enough, expand the whole layer to the next depth level with one query
             # ------------------------------------------------------------------------
             self.logger.info(f"Context not yet sufficient, expanding to BFS depth {current_depth + 1}.")
             with self.neo4j_driver.session() as session:
-                for node_id in current_layer_ids:
-                    # Read neighbors
-                    neighbors = session.read_transaction(
-                        self._get_neighbors_above_threshold, 
-                        node_id, 
-                        threshold
-                    )
-                    for neighbor_record in neighbors:
-                        neighbor_id = neighbor_record["id"]
-                        if neighbor_id not in visited:
-                            visited.add(neighbor_id)
-                            all_related_chunk_ids.add(neighbor_id)
-                            queue.append((neighbor_id, current_depth + 1))
-            
+                neighbors = session.read_transaction(
+                    self.timed(self._get_layer_neighbors_above_threshold, "expanding the graph context"),
+                    frontier,
+                    threshold
+                )
+            frontier = [record["id"] for record in neighbors if record["id"] not in visited]
+            visited.update(frontier)
+
             # Move to the next BFS depth
             current_depth += 1
 
@@ -520,20 +607,10 @@ class HybridVectorGraphRag:
         # ----------------------------------------------------------------------------
         self.logger.info(f"BFS completed at depth {current_depth}. Now retrieving final context for all discovered chunks.")
 
-        all_related_chunk_ids_list = list(all_related_chunk_ids)
-        try:
-            retrieved_context = self.collection.get(ids=all_related_chunk_ids_list)
-        except Exception as e:
-            self.logger.error(f"Error retrieving chunks by ID for final context: {e}")
-            retrieved_context = None
-
-        if not retrieved_context or "documents" not in retrieved_context:
-            self.logger.warning("No final context found or missing 'documents'.")
-            final_context_texts = []
-        else:
-            final_context_texts = retrieved_context["documents"]
+        # The last layer discovered, if the BFS stopped at max_depth
+        self._fetch_context_texts(frontier, context_texts)
 
-        full_context = "\n\n".join(final_context_texts)
+        full_context = "\n\n".join(context_texts.values())
         if len(full_context) > max_context_length:
             full_context = full_context[:max_context_length] + "...[truncated]"
 
@@ -557,13 +634,32 @@ class HybridVectorGraphRag:
             self.logger.error(f"Error calling the model for final answer: {e}")  
             raise RuntimeError("Failed to generate an answer from the model.") from e
 
-        self.logger.info(f"related_chunk_ids: {list(all_related_chunk_ids)}")
+        self.logger.info(f"related_chunk_ids: {list(visited)}")
         self.logger.info(f"visited_depth: {current_depth}")
         self.logger.info(f"Final answer: {final_answer}")
 
         return final_answer
 
 
+    def _fetch_context_texts(self, chunk_ids: list[str], context_texts: dict):
+        """
+        Adds to context_texts the texts, retrieved from ChromaDB, of the chunk_ids not already in it.
+        """
+        new_ids = [chunk_id for chunk_id in chunk_ids if chunk_id not in context_texts]
+        if not new_ids:
+            return
+        check_deadline("querying ChromaDB")
+        try:
+            retrieved_context = self.collection.get(ids=new_ids)
+        except Exception as e:
+            self.logger.error(f"Error retrieving chunks by ID: {e}")
+            return
+        if not retrieved_context or "documents" not in retrieved_context:
+            self.logger.warning("No context found or missing 'documents' in retrieval.")
+            return
+        context_texts.update(zip(retrieved_context["ids"], retrieved_context["documents"]))
+        self.logger.debug(f"Retrieved context for {len(new_ids)} new chunks, {len(context_texts)} total chunks so far.")
+
     def _check_if_enough_context(self, question: str, context: str) -> bool:
         """
         Calls an LLM with a simple meta-prompt to see if the context is 
@@ -589,7 +685,8 @@ class HybridVectorGraphRag:
         try:
             response = call_model(
                 chat_history=[{"role": "user", "content": check_prompt}],
-                model=self.summarization_graph_node_model
+                model=self.summarization_graph_node_model,
+                call_site="hybrid_rag_context_check"
             )
         except Exception as e:
             self.logger.error(f"Error calling LLM for context check: {e}")
@@ -597,7 +694,7 @@ class HybridVectorGraphRag:
             return False
 
         try:
-            parsed = json.loads(self.sanitize_gpt_json_response(response))
+            parsed = parse_json_response(response)
             enough = bool(parsed.get("enough_context", False))
             self.logger.info(f"LLM context check response: {parsed}")
             return enough
@@ -608,31 +705,24 @@ class HybridVectorGraphRag:
 
 
     @staticmethod
-    def _get_neighbors_above_threshold(tx, chunk_id: str, threshold: float):
+    def _get_layer_neighbors_above_threshold(tx, chunk_ids: list[str], threshold: float):
         """
-        Fetch neighbors connected via :SIMILAR_TO edges with weight >= threshold.
+        Fetch the neighbors of all the given chunks, connected via :SIMILAR_TO edges with
+        weight >= threshold, in a single query.
         Returns a list of records, each with { 'id': some_neighbor_id }.
         """
         query = """
-        MATCH (c:Chunk {id: $chunk_id})-[r:SIMILAR_TO]->(neighbor:Chunk)
+        UNWIND $chunk_ids AS chunk_id
+        MATCH (c:Chunk {id: chunk_id})-[r:SIMILAR_TO]->(neighbor:Chunk)
         WHERE r.weight >= $threshold
-        RETURN neighbor.id as id
+        RETURN DISTINCT neighbor.id as id
         """
-        result = tx.run(query, chunk_id=chunk_id, threshold=threshold)
+        result = tx.run(query, chunk_ids=chunk_ids, threshold=threshold)
         return [record for record in result]
-    
-    @staticmethod
-    def sanitize_gpt_json_response(response_str: str) -> str:
-        response_str = re.sub(r'^```json\s*', '', response_str, flags=re.MULTILINE)
-        response_str = re.sub(r'```$', '', response_str, flags=re.MULTILINE)
-        return response_str.strip()
 
     def close_neo4j_driver(self):
         """
-        Closes the Neo4j driver connection.
+        Closes the shared Neo4j driver connection, e.g. at shutdown. It is closed at exit anyway,
+        and re-created if another instance needs it.
         """
-        try:
-            self.neo4j_driver.close()
-            self.logger.debug("Neo4j driver connection closed.")
-        except exceptions.Neo4jError as e:
-            self.logger.error(f"Error closing Neo4j driver: {e}")
+        hybrid_vector_graph_rag_resources.close()
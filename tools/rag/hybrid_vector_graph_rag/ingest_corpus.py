@@ -1,8 +1,10 @@
 import os
 import re
-import spacy
+import time
 from PyPDF2 import PdfReader 
+from params import PARAMS
 from .engine import HybridVectorGraphRag 
+from .resources import hybrid_vector_graph_rag_resources, pipe
 
 def extract_text_from_pdf(pdf_path):
     """
@@ -38,13 +40,12 @@ def extract_text_from_txt(txt_path):
         print(f"Failed to read TXT file {txt_path}: {e}")
         return ''
 
-def load_and_process_file(file_path, nlp):
+def load_and_normalize_file(file_path):
     """
-    Load and process a single file (TXT or PDF).
+    Load a single file (TXT or PDF) and normalize its whitespace.
 
     :param file_path: Path to the file.
-    :param nlp: SpaCy language model.
-    :return: Processed text as a string or None if failed.
+    :return: Normalized text as a string or None if failed.
     """
     _, ext = os.path.splitext(file_path)
     ext = ext.lower()
@@ -67,15 +68,65 @@ def load_and_process_file(file_path, nlp):
     # Step 2: Normalize whitespace (replace multiple spaces/tabs with a single space)
     content = re.sub(r'\s+', ' ', content)
     content = re.sub(r'\.([A-ZÀ-ÿ])', r'. \1', content)
+    return content
+
+def split_into_blocks(content, max_chars):
+    """
+    Split a text into blocks of at most about max_chars, cut after a period when possible,
+    so that large documents are processed by SpaCy in batches.
+
+    :param content: Text to split.
+    :param max_chars: Maximum length of a block.
+    :return: List of blocks.
+    """
+    blocks = []
+    start = 0
+    while len(content) - start > max_chars:
+        end = content.rfind('. ', start, start + max_chars)
+        end = end + 2 if end > start else start + max_chars
+        blocks.append(content[start:end])
+        start = end
+    blocks.append(content[start:])
+    return blocks
+
+def format_sentences(contents, nlp):
+    """
+    Split the texts into sentences with SpaCy, processing the blocks of all the texts
+    with nlp.pipe, and join the sentences of each text with single spaces.
 
+    :param contents: List of normalized texts.
+    :param nlp: SpaCy pipeline with a sentence segmenter.
+    :return: List of formatted texts, in the order of contents.
+    """
+    max_chars = PARAMS["HYBRID_VECTOR_GRAPH_RAG_SENTENCE_BLOCK_CHARS"]
+    blocks, owners = [], []
+    for index, content in enumerate(contents):
+        content_blocks = split_into_blocks(content, max_chars)
+        blocks.extend(content_blocks)
+        owners.extend([index] * len(content_blocks))
+
+    sentences = [[] for _ in contents]
     try:
-        doc = nlp(content)
-        sentences = [sent.text.strip() for sent in doc.sents]
-        formatted_content = ' '.join(sentences)
+        for owner, doc in zip(owners, pipe(nlp, blocks)):
+            sentences[owner].extend(sent.text.strip() for sent in doc.sents)
     except Exception as e:
-        print(f"SpaCy processing failed for {file_path}: {e}")
-        formatted_content = content
+        print(f"SpaCy processing failed: {e}")
+        return list(contents)
+    return [' '.join(content_sentences) for content_sentences in sentences]
+
+def load_and_process_file(file_path, nlp):
+    """
+    Load and process a single file (TXT or PDF).
+
+    :param file_path: Path to the file.
+    :param nlp: SpaCy pipeline with a sentence segmenter.
+    :return: Processed text as a string or None if failed.
+    """
+    content = load_and_normalize_file(file_path)
+    if content is None:
+        return None
 
+    formatted_content = format_sentences([content], nlp)[0]
     print(f"Successfully loaded and formatted corpus from {file_path}.")
     return formatted_content
 
@@ -91,31 +142,33 @@ def hybrid_vector_graph_rag_ingest_corpus():
         print(f"Corpus directory {corpus_dir} does not exist.")
         exit(1)
 
-    # Initialize SpaCy outside the loop for efficiency
-    try:
-        nlp = spacy.load("en_core_web_sm")
-    except Exception as e:
-        print(f"Failed to load SpaCy model: {e}")
-        exit(1)
-
     rag = HybridVectorGraphRag()
 
+    filenames, contents = [], []
     for filename in os.listdir(corpus_dir):
         file_path = os.path.join(corpus_dir, filename)
         
         if os.path.isfile(file_path):
-            print(f"Processing file: {filename}")
-            processed_text = load_and_process_file(file_path, nlp)
-            
-            if processed_text:
-                texts = [processed_text] 
-                
-                try:
-                    result = rag.ingest(texts)
-                    print(f"Ingestion Result for {filename}:")
-                    print(result)
-                except Exception as e:
-                    print(f"An error occurred during ingestion of {filename}: {e}")
+            print(f"Loading file: {filename}")
+            content = load_and_normalize_file(file_path)
+            if content:
+                filenames.append(filename)
+                contents.append(content)
         else:
             print(f"Skipping {filename} as it is not a file.")
 
+    # The sentences of all the files are split at once, with the shared sentence segmentation pipeline
+    start = time.perf_counter()
+    processed_texts = format_sentences(contents, hybrid_vector_graph_rag_resources.get_sentence_nlp())
+    print(f"Split the sentences of {len(contents)} files in {time.perf_counter() - start:.2f}s.")
+
+    for filename, processed_text in zip(filenames, processed_texts):
+        print(f"Processing file: {filename}")
+        texts = [processed_text] 
+        
+        try:
+            result = rag.ingest(texts)
+            print(f"Ingestion Result for {filename}:")
+            print(result)
+        except Exception as e:
+            print(f"An error occurred during ingestion of {filename}: {e}")
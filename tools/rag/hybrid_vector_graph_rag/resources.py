@@ -0,0 +1,156 @@
+import os
+import atexit
+import logging
+import threading
+import spacy
+from neo4j import GraphDatabase, exceptions
+from params import PARAMS
+
+logger = logging.getLogger(__name__)
+
+
+class HybridVectorGraphRagResources:
+    """
+    Process-wide resources shared by all the HybridVectorGraphRag instances: the Neo4j driver,
+    whose connection pool is reused by every ingest and retrieve, the SpaCy pipelines and the
+    vector index of the chunk embeddings used to create the similarity edges. All are created on
+    first use, and the Neo4j constraints and indexes are set up once per driver.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.neo4j_driver = None
+        self.schema_ready = False
+        self.nlp = None
+        self.sentence_nlp = None
+        # Kept across ingestions and updated with the new chunks, under edge_index_lock.
+        self.edge_index = None
+        self.edge_index_lock = threading.Lock()
+
+    def get_neo4j_driver(self):
+        """
+        Returns the shared Neo4j driver, creating it and setting up the schema on first use.
+        """
+        with self.lock:
+            if self.neo4j_driver is None:
+                neo4j_uri = os.getenv("NEO4J_URI")
+                neo4j_user = os.getenv("NEO4J_USER")
+                neo4j_password = os.getenv("NEO4J_PASSWORD")
+                if not all([neo4j_uri, neo4j_user, neo4j_password]):
+                    raise EnvironmentError("Neo4j connection details are not fully set in environment variables.")
+                try:
+                    self.neo4j_driver = GraphDatabase.driver(
+                        neo4j_uri,
+                        auth=(neo4j_user, neo4j_password),
+                        max_connection_pool_size=PARAMS["HYBRID_VECTOR_GRAPH_RAG_NEO4J_MAX_POOL_SIZE"],
+                        connection_timeout=PARAMS["NEO4J_CONNECTION_TIMEOUT"],
+                        connection_acquisition_timeout=PARAMS["NEO4J_CONNECTION_TIMEOUT"]
+                    )
+                    logger.debug("Neo4j driver initialized successfully.")
+                except exceptions.Neo4jError as e:
+                    raise RuntimeError(f"Error initializing Neo4j driver: {e}")
+            if not self.schema_ready:
+                self._setup_neo4j_constraints(self.neo4j_driver)
+                self.schema_ready = True
+            return self.neo4j_driver
+
+    @staticmethod
+    def _setup_neo4j_constraints(neo4j_driver):
+        """
+        Sets up necessary constraints and indexes in Neo4j to ensure data integrity and query performance.
+        """
+        with neo4j_driver.session() as session:
+            try:
+                # Ensure the 'id' property is unique for Chunk nodes
+                session.run("""
+                CREATE CONSTRAINT chunk_id_unique_constraint IF NOT EXISTS
+                FOR (c:Chunk)
+                REQUIRE c.id IS UNIQUE
+                """)
+                logger.debug("Ensured unique constraint on Chunk.id.")
+
+                # Ensure an index on the 'id' property for faster lookups
+                session.run("""
+                CREATE INDEX chunk_id_index IF NOT EXISTS
+                FOR (c:Chunk)
+                ON (c.id)
+                """)
+                logger.debug("Ensured index on Chunk.id.")
+            except exceptions.Neo4jError as e:
+                logger.error(f"Error setting up Neo4j constraints/indexes: {e}")
+                raise RuntimeError(f"Neo4j constraints/indexes setup failed: {e}")
+
+    def get_nlp(self):
+        """
+        Returns the shared SpaCy pipeline used for lemmatization, loading it on first use.
+        The dependency parser and the named entity recognizer, not needed for lemmas, are disabled.
+        """
+        with self.lock:
+            if self.nlp is None:
+                try:
+                    self.nlp = spacy.load("en_core_web_sm", disable=["parser", "ner"])
+                    logger.debug(f"SpaCy model loaded successfully with components {self.nlp.pipe_names}.")
+                except Exception as e:
+                    logger.error(f"Error loading SpaCy model: {e}")
+                    raise RuntimeError(f"SpaCy model loading failed: {e}")
+            return self.nlp
+
+    def get_sentence_nlp(self):
+        """
+        Returns the shared SpaCy pipeline used for sentence splitting, loading it on first use.
+        With HYBRID_VECTOR_GRAPH_RAG_SENTENCE_SEGMENTER "parser", only tok2vec and the dependency parser
+        run, giving the same sentences as the full pipeline. With "senter", only the faster statistical
+        sentence segmenter runs, whose sentence boundaries can differ slightly from the parser's.
+        """
+        with self.lock:
+            if self.sentence_nlp is None:
+                try:
+                    if PARAMS["HYBRID_VECTOR_GRAPH_RAG_SENTENCE_SEGMENTER"] == "senter":
+                        # The senter of en_core_web_sm has its own embedding layer, tok2vec is not needed.
+                        self.sentence_nlp = spacy.load(
+                            "en_core_web_sm",
+                            exclude=["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner"]
+                        )
+                        self.sentence_nlp.enable_pipe("senter")
+                    else:
+                        self.sentence_nlp = spacy.load(
+                            "en_core_web_sm",
+                            exclude=["tagger", "attribute_ruler", "lemmatizer", "ner"]
+                        )
+                    logger.debug(f"SpaCy sentence model loaded successfully with components {self.sentence_nlp.pipe_names}.")
+                except Exception as e:
+                    logger.error(f"Error loading SpaCy sentence model: {e}")
+                    raise RuntimeError(f"SpaCy model loading failed: {e}")
+            return self.sentence_nlp
+
+    def close(self):
+        """
+        Closes the shared Neo4j driver. A new one is created by the next get_neo4j_driver.
+        """
+        with self.lock:
+            if self.neo4j_driver is None:
+                return
+            try:
+                self.neo4j_driver.close()
+                logger.debug("Neo4j driver connection closed.")
+            except exceptions.Neo4jError as e:
+                logger.error(f"Error closing Neo4j driver: {e}")
+            self.neo4j_driver = None
+            self.schema_ready = False
+
+
+def pipe(nlp, texts: list[str]):
+    """
+    Processes the texts with nlp.pipe in batches of HYBRID_VECTOR_GRAPH_RAG_SPACY_BATCH_SIZE, using
+    HYBRID_VECTOR_GRAPH_RAG_SPACY_N_PROCESS processes for HYBRID_VECTOR_GRAPH_RAG_SPACY_MULTIPROCESS_MIN_TEXTS
+    texts or more, where the worker start-up cost pays off.
+
+    :return: A generator of the processed docs, in the order of the texts.
+    """
+    n_process = 1
+    if len(texts) >= PARAMS["HYBRID_VECTOR_GRAPH_RAG_SPACY_MULTIPROCESS_MIN_TEXTS"]:
+        n_process = PARAMS["HYBRID_VECTOR_GRAPH_RAG_SPACY_N_PROCESS"]
+    return nlp.pipe(texts, batch_size=PARAMS["HYBRID_VECTOR_GRAPH_RAG_SPACY_BATCH_SIZE"], n_process=n_process)
+
+
+hybrid_vector_graph_rag_resources = HybridVectorGraphRagResources()
+atexit.register(hybrid_vector_graph_rag_resources.close)
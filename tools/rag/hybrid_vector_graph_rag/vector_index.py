@@ -0,0 +1,157 @@
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkVectorIndex:
+    """
+    In-process vector index of the lemma embeddings of the Chunk nodes, used to find the chunks
+    similar enough to a new one to be linked by a SIMILAR_TO edge, instead of reading every
+    embedding back from Neo4j for each new chunk.
+
+    The embeddings are kept L2-normalized in a float32 matrix, so that the cosine similarities
+    of a block of new chunks against all the indexed ones are a single matrix multiply ("exact" mode). For large graphs the "hnsw" mode uses an
+    approximate HNSW index (hnswlib, installed with chromadb), which returns at most
+    max_neighbors neighbors per query.
+
+    The index is meant to be kept across ingestions and updated with the new chunks only.
+    """
+    def __init__(self, dim: int = None, mode: str = "exact", max_neighbors: int = 100, initial_capacity: int = 1024,
+                 ef_construction: int = 100, m: int = 16):
+        """
+        :param dim: Dimension of the embeddings, inferred from the first ones added if None.
+        :param mode: "exact" or "hnsw".
+        :param max_neighbors: Maximum number of neighbors returned per query in "hnsw" mode.
+        :param ef_construction: Size of the candidate list when inserting into the HNSW graph (build time vs recall).
+        :param m: Number of links per node of the HNSW graph.
+        """
+        self.dim = dim
+        self.mode = mode
+        self.requested_mode = mode  # mode falls back to "exact" without hnswlib
+        self.max_neighbors = max_neighbors
+        self.ef_construction = ef_construction
+        self.m = m
+        self.ids = []
+        self.id_set = set()
+        self.matrix = None  # Normalized embeddings, the first len(self.ids) rows are used.
+        self.hnsw = None
+        self.initial_capacity = initial_capacity
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, chunk_id):
+        return chunk_id in self.id_set
+
+    def with_mode(self, mode: str) -> "ChunkVectorIndex":
+        """
+        :return: A copy of the index in the given mode, built from the stored embeddings.
+        """
+        index = ChunkVectorIndex(
+            self.dim, mode, self.max_neighbors, max(len(self.ids), self.initial_capacity), self.ef_construction, self.m
+        )
+        if self.ids:
+            index.add(list(self.ids), self.matrix[:len(self.ids)])
+        return index
+
+    @staticmethod
+    def normalize(embeddings) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0.0] = 1.0  # Zero vectors stay zero: their similarity to anything is 0.
+        return vectors / norms
+
+    def _init_storage(self, dim):
+        self.dim = dim
+        self.matrix = np.empty((self.initial_capacity, dim), dtype=np.float32)
+        if self.mode == "hnsw":
+            try:
+                import hnswlib
+            except ImportError:
+                logger.warning("hnswlib is not installed, using the exact vector index.")
+                self.mode = "exact"
+                return
+            self.hnsw = hnswlib.Index(space="ip", dim=dim)
+            self.hnsw.init_index(max_elements=self.initial_capacity, ef_construction=self.ef_construction, M=self.m)
+            self.hnsw.set_ef(max(self.max_neighbors * 2, 50))
+
+    def add(self, ids, embeddings):
+        """
+        Adds the embeddings of the given chunk ids. Embeddings of another dimension are skipped.
+        """
+        if not ids:
+            return
+        vectors = self.normalize(embeddings)
+        if self.matrix is None:
+            self._init_storage(vectors.shape[1])
+        if vectors.shape[1] != self.dim:
+            logger.warning(f"Skipping {len(ids)} embeddings of dimension {vectors.shape[1]} instead of {self.dim}.")
+            return
+
+        start = len(self.ids)
+        end = start + len(ids)
+        if end > self.matrix.shape[0]:
+            capacity = max(end, self.matrix.shape[0] * 2)
+            matrix = np.empty((capacity, self.dim), dtype=np.float32)
+            matrix[:start] = self.matrix[:start]
+            self.matrix = matrix
+            if self.hnsw is not None:
+                self.hnsw.resize_index(capacity)
+        self.matrix[start:end] = vectors
+        if self.hnsw is not None:
+            self.hnsw.add_items(vectors, np.arange(start, end))
+        self.ids.extend(ids)
+        self.id_set.update(ids)
+
+    def link_new(self, ids, embeddings, threshold: float, block_size: int = 256):
+        """
+        Finds, for each new chunk, the indexed chunks and the new chunks before it whose cosine
+        similarity is >= threshold, then adds the new chunks to the index.
+
+        :return: A list of (source_id, target_id, similarity) edges.
+        """
+        if not ids:
+            return []
+        vectors = self.normalize(embeddings)
+        if self.matrix is None:
+            self._init_storage(vectors.shape[1])
+        if vectors.shape[1] != self.dim:
+            logger.warning(f"Skipping {len(ids)} embeddings of dimension {vectors.shape[1]} instead of {self.dim}.")
+            return []
+
+        edges = []
+        existing_count = len(self.ids)
+        if existing_count and self.hnsw is not None:
+            k = min(self.max_neighbors, existing_count)
+            labels, distances = self.hnsw.knn_query(vectors, k=k)
+            # The "ip" space distance is 1 - inner product.
+            for row, (row_labels, row_distances) in enumerate(zip(labels, distances)):
+                edges.extend(
+                    (ids[row], self.ids[label], float(1.0 - distance))
+                    for label, distance in zip(row_labels, row_distances) if 1.0 - distance >= threshold
+                )
+        elif existing_count:
+            for rows, cols, similarities in similarities_above(vectors, self.matrix[:existing_count], threshold, block_size):
+                edges.extend((ids[row], self.ids[col], float(sim)) for row, col, sim in zip(rows, cols, similarities))
+
+        # New chunks are linked to the new chunks ingested before them, as if added one at a time.
+        for rows, cols, similarities in similarities_above(vectors, vectors, threshold, block_size):
+            edges.extend((ids[row], ids[col], float(sim)) for row, col, sim in zip(rows, cols, similarities) if col < row)
+
+        self.add(ids, vectors)
+        return edges
+
+
+def similarities_above(queries: np.ndarray, matrix: np.ndarray, threshold: float, block_size: int = 256):
+    """
+    Batched cosine similarity kernel over L2-normalized vectors: computes the similarities of a block
+    of queries against the whole matrix with one matrix multiply and keeps those >= threshold.
+    Blocks bound the memory used to block_size x len(matrix) floats.
+
+    :return: A generator of (query_indices, matrix_indices, similarities) arrays, one per block.
+    """
+    for start in range(0, len(queries), block_size):
+        block = queries[start:start + block_size] @ matrix.T
+        rows, cols = np.nonzero(block >= threshold)
+        yield rows + start, cols, block[rows, cols]
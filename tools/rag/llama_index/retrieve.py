@@ -2,6 +2,7 @@ from llama_index.core import StorageContext, load_index_from_storage
 from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.core.postprocessor import SimilarityPostprocessor
 from params import PARAMS
+from code_agent.agent_run_budget import scaled_top_k
 
 
 def retrieve_documents(query, similarity_cutoff=None, similarity_top_k=None):
@@ -27,6 +28,7 @@ def retrieve_documents(query, similarity_cutoff=None, similarity_top_k=None):
     """
     if similarity_top_k is None:
       similarity_top_k = PARAMS["LLAMA_INDEX_TOP_K_RAG_RETRIEVE"]
+    similarity_top_k = scaled_top_k(similarity_top_k)
     persist_dir = PARAMS["LLAMA_INDEX_DB_PATH"]
     storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
     index = load_index_from_storage(storage_context)
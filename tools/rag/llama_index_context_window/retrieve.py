@@ -3,6 +3,7 @@ import os
 from llama_index.core import StorageContext, load_index_from_storage
 from llama_index.core.postprocessor import SimilarityPostprocessor, MetadataReplacementPostProcessor
 from params import PARAMS
+from code_agent.agent_run_budget import scaled_top_k
 
 logger = logging.getLogger(__name__)
 
@@ -44,7 +45,7 @@ class CustomMetadataReplacementPostProcessor(MetadataReplacementPostProcessor):
         return full_text
 
 def retrieve_documents(query, similarity_cutoff=None):
-    similarity_top_k = PARAMS["LLAMA_INDEX_CONTEXT_WINDOW_TOP_K_RAG_RETRIEVE"]
+    similarity_top_k = scaled_top_k(PARAMS["LLAMA_INDEX_CONTEXT_WINDOW_TOP_K_RAG_RETRIEVE"])
     persist_dir = PARAMS["LLAMA_INDEX_CONTEXT_WINDOW_DB_PATH"]
     storage_context = StorageContext.from_defaults(persist_dir=persist_dir)
     index = load_index_from_storage(storage_context)
@@ -7,6 +7,7 @@ from params import PARAMS
 from .prompts import EXTRACT_QUERY_FEATS_PROMPT, SUGGEST_ACTION_PROMPT, RAG_ANSWER_PROMPT
 from models.models import call_model
 from code_agent.utils import sanitize_gpt_response
+from models.json_repair import parse_json_response
 
 # Helper function to extract categories from prompt template
 def _extract_categories_from_prompt(prompt_template, feature_name):
@@ -97,7 +98,7 @@ class RlMetaRag:
         features_str = sanitize_gpt_response(features_str)
         try:
             # Expecting a list: [question_type, domain, has_entities, complexity, ambiguity, query_length, specificity, formality, urgency]
-            features = json.loads(features_str)
+            features = parse_json_response(features_str)
 
             # Basic validation
             if not isinstance(features, list) or len(features) != 9:
@@ -1,6 +1,8 @@
 import chromadb
 from models.models import create_embeddings
+from models.deadline import check_deadline
 from params import PARAMS
+from code_agent.agent_run_budget import scaled_top_k
 
 def retrieve_documents(query, k=5):
     """
@@ -35,9 +37,10 @@ def retrieve_documents(query, k=5):
     query_embedding = [query_embedding[0]]
 
     # Query the collection for similar documents
+    check_deadline("querying the simple RAG collection")
     results = collection.query(
         query_embeddings=query_embedding,
-        n_results=k,
+        n_results=scaled_top_k(k),
         include=["documents", "metadatas"]
     )
 
@@ -1,6 +1,7 @@
 import asyncio
 import json
 from models.models import call_model
+from models.json_repair import parse_json_response
 from .browser_manager import BrowserManager
 from .command_executor import CommandExecutor
 from .element_highlighter import ElementHighlighter
@@ -39,7 +40,9 @@ class SurfAiEngine:
         """
         Helper method that wraps the call_model function in a retry loop.
         It retries if the response is None, if it doesn't have the expected attribute,
-        or if the JSON cannot be parsed. 
+        or if the JSON cannot be parsed even after repair.
+
+        :return: The parsed JSON response.
         """
         attempts = 0 
         while attempts <= self.max_retries:      
@@ -52,9 +55,7 @@ class SurfAiEngine:
                 )
                 if response is None:
                     raise ValueError("Received None as response from call_model")
-                sanitized = JsonResponseHandler.sanitize_response(response)
-                json.loads(sanitized)
-                return response
+                return parse_json_response(response)
             except (AttributeError, ValueError, json.JSONDecodeError) as e: 
                 attempts += 1
                 self.logger.warning( 
@@ -73,7 +74,7 @@ class SurfAiEngine:
             chat_history=[{"role": "user", "content": json_task_prompt}],
             model=self.json_task_model
         )
-        self.json_task = json.loads(JsonResponseHandler.sanitize_response(response))
+        self.json_task = response
         self.logger.debug( 
             "🔵 Initial JSON response: %s", 
             json.dumps(self.json_task, indent=4), 
@@ -139,7 +140,7 @@ class SurfAiEngine:
         
         self.json_task = JsonResponseHandler.update_task_structure(
             self.json_task,
-            json.loads(JsonResponseHandler.sanitize_response(response)) 
+            response
         )
 
         self.logger.debug(
@@ -72,22 +72,16 @@ Output example:
   ]
 }
 
-Now, please generate the JSON following the above format and guidelines, considering this user message:
-$user_message
-                                
 Ensure strict JSON format with proper escaping. 
 
+Now, please generate the JSON following the above format and guidelines, considering this user message:
+$user_message
 """) 
  
 
 GEN_JSON_TASK_LOOP_PROMPT = Template(""" 
 You are an AI Web Automation controller that generates sequential Playwright commands. Use execution logs, task progress, and Current Page Structure to determine the next logical action while pursuing the user's goal.
-
-**Context**:
-- Objective: $user_message
-- Progress Snapshot: $json_task 
-- Execution Logs: $execution_logs 
-- Current Page Structure: $scraped_page 
+The Objective, Progress Snapshot, Execution Logs and Current Page Structure are provided in the **Context** section at the end of this prompt.
 
 **Operational Protocol**:  
                                       
@@ -177,7 +171,7 @@ You are an AI Web Automation controller that generates sequential Playwright com
                                      
 6. **Special Instructions for Data Extraction (data_extraction)**:
 - When the user's objective involves extracting specific data from the page (e.g., flight details, prices, dates, URLs, etc.), **do not generate interactive extraction commands** such as `page.inner_text()` or `page.get_attribute()`.
-- Instead, directly populate the **data_extraction** field by parsing the HTML content available in the provided Execution Logs ($execution_logs) and the Current Page Structure ($scraped_page).
+- Instead, directly populate the **data_extraction** field by parsing the HTML content available in the provided Execution Logs and the Current Page Structure (see **Context**).
 - For example, if the user asks:  
   "Go to wikipedia, search information about the moon landing. Get the information about it",  
   once information is visible, generate a task that directly extracts these details from the HTML and populates the **data_extraction**.
@@ -241,20 +235,25 @@ Only after these validations should the date be selected.
 - Escape backslashes with double backslash: `\\`
 - Use single quotes for outer string wrapping in Playwright commands
 - Example: `page.click('button[title=\"Accetta\"]')`
-                                                                   
+
+**Context**:
+- Objective: $user_message
+- Progress Snapshot: $json_task 
+- Execution Logs: $execution_logs 
+- Current Page Structure: $scraped_page 
 """)
 
 
 FINAL_ANSWER_PROMPT = Template("""
 You are tasked to generate the final answer message for the user.
 
-**Context**:
-- Objective: $user_message
-- Progress Snapshot: $json_task
-
-Using all of the above information—and especially taking into account the user's objective as well as all the data_extraction values accumulated across the tasks—produce a single, clear, and concise plain text message that:
+Using all of the information in the **Context** section below—and especially taking into account the user's objective as well as all the data_extraction values accumulated across the tasks—produce a single, clear, and concise plain text message that:
 1. Summarizes the data_extraction values from the tasks. If there are no data_extraction values, add the next point 2.
 2. Clearly confirms that the automated web navigation has been completed successfully.
 
 Your final answer must be a straightforward message that directly addresses the user's initial request and informs them of the successful completion of the automation process.
+
+**Context**:
+- Objective: $user_message
+- Progress Snapshot: $json_task
 """)
\ No newline at end of file